@@ -1,9 +1,12 @@
 """LOF Model apapter - Working with custom implementation of LOF"""
 import logging
-from sklearn.preprocessing import MinMaxScaler
+import numpy as np
 from anomaly_detector.decorator.utils import latency_logger
 from anomaly_detector.adapters.base_model_adapter import BaseModelAdapter
-from anomaly_detector.model import W2VModel, LOFModel, AutoEncoderModel
+from anomaly_detector.exception import ModelLoadException, ModelSaveException
+from anomaly_detector.model import W2VModel, LOFModel, AutoEncoderInference, TemplateMiner, LogAggregator
+from anomaly_detector.storage.tokenizer import is_tokenized
+
 
 class LOFModelAdapter(BaseModelAdapter):
     """Local outlier factor custom logic to train model. Includes logic to train and predict anomalies in logs."""
@@ -12,41 +15,95 @@ class LOFModelAdapter(BaseModelAdapter):
         self.storage_adapter = storage_adapter
         self.model = LOFModel(config=storage_adapter.config)
         self.w2v_model = W2VModel(config=storage_adapter.config)
+        self.ae_model = None
+        self.template_miner = None
+        if self.storage_adapter.TEMPLATE_MINER:
+            self.template_miner = TemplateMiner(config=storage_adapter.config)
+            self.template_miner.load(self.storage_adapter.TEMPLATE_MODEL_PATH)
+        self.aggregator = None
+        if self.storage_adapter.AGGR_INFERENCE:
+            self.aggregator = LogAggregator(config=storage_adapter.config)
 
     def load_w2v_model(self):
         """Load in w2v model."""
         try:
+            # Word ids handed out so far are not used any more, the vocabulary starts over with the model
+            self.w2v_model.reset_vocabulary()
             self.w2v_model.load(self.storage_adapter.W2V_MODEL_PATH)
         except ModelLoadException as ex:
             logging.error("Failed to load W2V model: %s" % ex)
             raise
 
     def load_lof_model(self):
+        """Load in LOF model together with the autoencoder it is ensembled with."""
         try:
             self.model.load(self.storage_adapter.LOF_MODEL_PATH)
+            self.ae_model = AutoEncoderInference.load(self.storage_adapter.LOF_AE_MODEL_PATH)
         except ModelLoadException as ex:
             logging.error("Failed to load LOF model: %s" % ex)
             raise
 
+    def save_lof_model(self):
+        """Save LOF model and the exported autoencoder next to each other."""
+        try:
+            self.model.save(self.storage_adapter.LOF_MODEL_PATH)
+            self.ae_model.save(self.storage_adapter.LOF_AE_MODEL_PATH)
+        except ModelSaveException as ex:
+            logging.error("Failed to save LOF model: %s" % ex)
+            raise
+
     @latency_logger("LOFModelAdapter")
     def preprocess(self, config_type, recreate_model):
         """Load data and train."""
+        if recreate_model:
+            self.w2v_model.reset_vocabulary()
         dataframe, raw_data = self.storage_adapter.load_data(config_type)
         if dataframe is not None:
-            if not recreate_model:
-                self.w2v_model.update(dataframe)
-            else:
-                self.w2v_model.create(dataframe,
-                                      self.storage_adapter.TRAIN_VECTOR_LENGTH,
-                                      self.storage_adapter.TRAIN_WINDOW)
-            try:
-                self.w2v_model.save(self.storage_adapter.W2V_MODEL_PATH)
-            except ModelSaveException as ex:
-                logging.error("Failed to save W2V model: %s" % ex)
-                raise
+            dataframe = self._apply_templates(dataframe, raw_data)
+            self._fit_w2v(dataframe, recreate_model, train=config_type == "train")
+            self._save_w2v()
 
         return dataframe, raw_data
 
+    def preprocess_batches(self, config_type, recreate_model):
+        """Load data batch by batch as storage streams it, keeping the w2v model up to date with every batch."""
+        # No log of the previous loop is in use any more, a vocabulary grown too large can start over
+        self.w2v_model.reset_vocabulary(self.storage_adapter.TOKENIZER_MAX_WORDS)
+        fitted = False
+        for dataframe, raw_data in self.storage_adapter.iter_data(config_type):
+            dataframe = self._apply_templates(dataframe, raw_data)
+            self._fit_w2v(dataframe, recreate_model and not fitted, train=config_type == "train")
+            fitted = True
+            yield dataframe, raw_data
+        if fitted:
+            self._save_w2v()
+
+    def _fit_w2v(self, dataframe, recreate_model, train):
+        """Create the w2v model from the logs or extend its vocabulary with them, training on them if train."""
+        if not recreate_model:
+            self.w2v_model.update(dataframe, train=train)
+        else:
+            self.w2v_model.create(dataframe,
+                                  self.storage_adapter.TRAIN_VECTOR_LENGTH,
+                                  self.storage_adapter.TRAIN_WINDOW)
+
+    def _apply_templates(self, dataframe, raw_data):
+        """Replace messages with the tokens of their templates, when templates are mined."""
+        if self.template_miner is None:
+            return dataframe
+        return self.template_miner.transform(raw_data)
+
+    def _save_w2v(self):
+        """Save w2v model when its word vectors changed, along with the templates its words come from."""
+        try:
+            if self.w2v_model.unsaved:
+                self.w2v_model.save(self.storage_adapter.W2V_MODEL_PATH)
+            if self.template_miner is not None:
+                self.template_miner.save(self.storage_adapter.TEMPLATE_MODEL_PATH)
+        except ModelSaveException as ex:
+            logging.error("Failed to save W2V model: %s" % ex)
+            raise
+
     @latency_logger("LOFModelAdapter")
     def train(self, data, json_logs):
         """Train LOF model after creating vectors from words using w2v model."""
@@ -54,52 +111,73 @@ class LOFModelAdapter(BaseModelAdapter):
         # The model is always recreated
         self.model.train(vectors, self.storage_adapter.LOF_NEIGHBORS,
                          self.storage_adapter.LOF_METRIC,
-                         self.storage_adapter.PARALLELISM)
+                         self.storage_adapter.PARALLELISM,
+                         algorithm=self.storage_adapter.LOF_ALGORITHM,
+                         ivf_cells=self.storage_adapter.LOF_IVF_CELLS,
+                         ivf_probes=self.storage_adapter.LOF_IVF_PROBES)
 
-        # AutoEncoder for model Ensebmling
-        min_max_scaler = MinMaxScaler(feature_range=(0, 1))
-        self.scaled_data = min_max_scaler.fit_transform(vectors.copy())
-        self.ae_model = AutoEncoderModel(output_units=self.scaled_data.shape[1])
-        self.ae_model.train(self.scaled_data)
+        # AutoEncoder for model Ensebmling, TensorFlow is only needed to train it
+        from anomaly_detector.model import AutoEncoderModel
+        from sklearn.preprocessing import MinMaxScaler
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        scaled_data = scaler.fit_transform(vectors.copy())
+        ae_model = AutoEncoderModel(output_units=scaled_data.shape[1])
+        ae_model.train(scaled_data)
+        self.ae_model = AutoEncoderInference.from_model(ae_model, scaler, threshold=0.0)
+        # Training logs are scored once, the threshold and the predictions share the same errors
+        errors = self.ae_model.reconstruction_errors(vectors)
+        self.ae_model.threshold = float(np.mean(errors) + np.std(errors))
+        scores = [(pred, score, float(error))
+                  for (pred, score), error in zip(self.model.training_scores(), errors)]
 
-        score_pairs = self.predict(vectors, json_logs)
-        try:
-            self.model.save(self.storage_adapter.LOF_MODEL_PATH)
-        except ModelSaveException as ex:
-            logging.error("Failed to save LOF model: %s" % ex)
-            raise
+        score_pairs = self._flag_anomalies(scores, json_logs)
+        self.save_lof_model()
         return score_pairs
 
     @latency_logger(name="LOFModelAdapter")
     def predict(self, data, json_logs):
         """Predict from provided data and flag it an anomaly or not."""
-        scores = self.process_scores(data)
-
-        ae_threshold = self.ae_model.find_threshold(self.scaled_data)
-        ae_pred, ae_errors = self.ae_model.get_predictions(self.scaled_data, ae_threshold)
-        ae_errors = list(map(float, ae_errors))
+        if self.aggregator is None:
+            return self._flag_anomalies(self.process_scores(data), json_logs)
+        # Only the representative of every cluster of similar logs is scored
+        aggregation = self.aggregator.aggregate(self.w2v_model.one_vector(data))
+        aggregation.label(json_logs)
+        scores = aggregation.expand(self.process_scores([data[i] for i in aggregation.representatives]))
+        results = self._flag_anomalies(scores, json_logs)
+        if self.storage_adapter.AGGR_COLLAPSE:
+            results = aggregation.collapse(results)
+        return results
 
+    def _flag_anomalies(self, scores, json_logs):
+        """Flag logs as anomalies when both the LOF score and the autoencoder error are high."""
         f = []
         hist_count = 0
         logging.info("Max score: %f" % max([x[1] for x in scores]))
 
-        for i in range(len(data)):
+        for i in range(len(scores)):
             s = json_logs[i]
-            if ae_errors[i] > ae_threshold and scores[i][1] > 1:
+            if scores[i][2] > self.ae_model.threshold and scores[i][1] > 1:
                 s["anomaly"] = 1
-                s["anomaly_score"] = 0.5*(scores[i][1] + ae_errors[i])
+                s["anomaly_score"] = 0.5*(scores[i][1] + scores[i][2])
                 logging.warning("Anomaly found (score: %f): %s" % (s["anomaly_score"],
                                                                    s["message"]))
                 hist_count += 1
             else:
                 s["anomaly"] = 0
             f.append(s)
-        logging.info("Anomaly percentage: %f percents", 100*hist_count/len(data))
+        logging.info("Anomaly percentage: %f percents", 100*hist_count/len(scores))
         return f
 
     def process_scores(self, vectors):
-        """Generate scores from some. To be used for inference."""
-        if isinstance(vectors[0][0], str):
-            vectors = self.w2v_model.one_vector(vectors)
-        scores = self.model.predict(vectors)
-        return scores
+        """Generate LOF prediction, LOF score and autoencoder error of every log. To be used for inference."""
+        # Logs without words are skipped, vectors never have an empty row
+        first = next((log for log in vectors if len(log)), None)
+        if is_tokenized(vectors) or first is None or isinstance(first[0], str):
+            return self.w2v_model.score_messages(vectors, self.model.version, self._score_vectors)
+        return self._score_vectors(vectors)
+
+    def _score_vectors(self, vectors):
+        """Score a batch of log vectors with both models of the ensemble."""
+        lof_scores = self.model.predict(vectors)
+        ae_errors = self.ae_model.reconstruction_errors(vectors)
+        return [(pred, score, float(error)) for (pred, score), error in zip(lof_scores, ae_errors)]
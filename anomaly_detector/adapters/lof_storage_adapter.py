@@ -13,10 +13,11 @@ class LOFStorageAdapter(StorageProxy):
         self.config = config
         self.storage = StorageProxy(config)
 
-    def retrieve_data(self, timespan, max_entry):
+    def retrieve_data(self, timespan, max_entry, incremental=False):
         """Fatch data from storage system"""
         data, raw = self.storage.retrieve(MGStorageAttribute(timespan,
-                                                            max_entry))
+                                                            max_entry,
+                                                            incremental=incremental))
         if len(data) == 0:
             logging.info("There are no logs in last %s seconds", timespan)
             return None, None
@@ -24,24 +25,41 @@ class LOFStorageAdapter(StorageProxy):
         return data, raw
 
 
-    @latency_logger(name="LOFStorageAdapter")
-    def load_data(self, config_type):
-        """Load data from storage class depending on training vs inference."""
+    def _storage_attribute(self, config_type):
+        """Build the query attributes for training vs inference."""
         if config_type == "train":
-            return self.retrieve_data(timespan=self.config.TRAIN_TIME_SPAN,
-                                      max_entry=self.config.TRAIN_MAX_ENTRIES)
+            return MGStorageAttribute(self.config.TRAIN_TIME_SPAN,
+                                      self.config.TRAIN_MAX_ENTRIES)
         elif config_type == "infer":
-            return self.retrieve_data(timespan=self.config.INFER_TIME_SPAN,
-                                      max_entry=self.config.INFER_MAX_ENTRIES)
+            return MGStorageAttribute(self.config.INFER_TIME_SPAN,
+                                      self.config.INFER_MAX_ENTRIES,
+                                      incremental=self.config.INFER_INCREMENTAL)
         else:
             raise Exception("Not Supported option, %s not in ['infer','train']"
                             % config_type)
 
+    @latency_logger(name="LOFStorageAdapter")
+    def load_data(self, config_type):
+        """Load data from storage class depending on training vs inference."""
+        storage_attribute = self._storage_attribute(config_type)
+        return self.retrieve_data(timespan=storage_attribute.time_range,
+                                  max_entry=storage_attribute.number_of_entries,
+                                  incremental=storage_attribute.incremental)
+
+    def iter_data(self, config_type):
+        """Stream data from storage batch by batch, depending on training vs inference."""
+        for data, raw in self.storage.iter_batches(self._storage_attribute(config_type)):
+            yield list(data[self.config.MESSAGE_INDEX]), raw
+
     @latency_logger(name="LOFStorageadapter")
     def persist_data(self, df):
         """Abstraction around storage persistence class."""
         self.storage.store_results(df)
 
+    def flush(self):
+        """Wait for the results persisted in the background to be stored."""
+        self.storage.flush()
+
     def __getattr__(self, name):
         """Delegate all methods from config as a passthrough proxy into configurations."""
         return getattr(self.config, name)
@@ -5,7 +5,7 @@ import numpy as np
 from anomaly_detector.adapters import BaseModelAdapter
 from anomaly_detector.decorator.utils import latency_logger
 from anomaly_detector.exception import ModelLoadException, ModelSaveException
-from anomaly_detector.model import SOMPYModel, W2VModel
+from anomaly_detector.model import LogAggregator, SOMModel, SOMPYModel, TemplateMiner, W2VModel
 import os
 from prometheus_client import Gauge, Counter, Histogram
 from urllib.parse import quote
@@ -28,12 +28,25 @@ class SomModelAdapter(BaseModelAdapter):
         self.update_model = os.path.isfile(self.storage_adapter.MODEL_PATH) and update_model
         self.update_w2v_model = os.path.isfile(self.storage_adapter.W2V_MODEL_PATH) and update_model
         self.recreate_models = False
-        self.model = SOMPYModel(config=storage_adapter.config)
+        if SOMPYModel.is_available():
+            self.model = SOMPYModel(config=storage_adapter.config)
+        else:
+            logging.warning("sompy is not installed, falling back to the numpy SOM implementation")
+            self.model = SOMModel(config=storage_adapter.config)
         self.w2v_model = W2VModel(config=storage_adapter.config)
+        self.template_miner = None
+        if self.storage_adapter.TEMPLATE_MINER:
+            self.template_miner = TemplateMiner(config=storage_adapter.config)
+            self.template_miner.load(self.storage_adapter.TEMPLATE_MODEL_PATH)
+        self.aggregator = None
+        if self.storage_adapter.AGGR_INFERENCE:
+            self.aggregator = LogAggregator(config=storage_adapter.config)
 
     def load_w2v_model(self):
         """Load in w2v model."""
         try:
+            # Word ids handed out so far are not used any more, the vocabulary starts over with the model
+            self.w2v_model.reset_vocabulary()
             self.w2v_model.load(self.storage_adapter.W2V_MODEL_PATH)
         except ModelLoadException as ex:
             logging.error("Failed to load W2V model: %s" % ex)
@@ -70,23 +83,56 @@ class SomModelAdapter(BaseModelAdapter):
     @latency_logger(name="SomModelAdapter")
     def preprocess(self, config_type, recreate_model):
         """Load data and train."""
+        if recreate_model:
+            self.w2v_model.reset_vocabulary()
         dataframe, raw_data = self.storage_adapter.load_data(config_type)
         if dataframe is not None:
-            LOG_LINES_COUNT.set(len(dataframe))
-            if not recreate_model:
-                self.w2v_model.update(dataframe)
-            else:
-                self.w2v_model.create(dataframe,
-                                      self.storage_adapter.TRAIN_VECTOR_LENGTH,
-                                      self.storage_adapter.TRAIN_WINDOW)
-            try:
-                self.w2v_model.save(self.storage_adapter.W2V_MODEL_PATH)
-            except ModelSaveException as ex:
-                logging.error("Failed to save W2V model: %s" % ex)
-                raise
+            dataframe = self._apply_templates(dataframe, raw_data)
+            self._fit_w2v(dataframe, recreate_model, train=config_type == "train")
+            self._save_w2v()
 
         return dataframe, raw_data
 
+    def preprocess_batches(self, config_type, recreate_model):
+        """Load data batch by batch as storage streams it, keeping the w2v model up to date with every batch."""
+        # No log of the previous loop is in use any more, a vocabulary grown too large can start over
+        self.w2v_model.reset_vocabulary(self.storage_adapter.TOKENIZER_MAX_WORDS)
+        fitted = False
+        for dataframe, raw_data in self.storage_adapter.iter_data(config_type):
+            dataframe = self._apply_templates(dataframe, raw_data)
+            self._fit_w2v(dataframe, recreate_model and not fitted, train=config_type == "train")
+            fitted = True
+            yield dataframe, raw_data
+        if fitted:
+            self._save_w2v()
+
+    def _fit_w2v(self, dataframe, recreate_model, train):
+        """Create the w2v model from the logs or extend its vocabulary with them, training on them if train."""
+        LOG_LINES_COUNT.set(len(dataframe))
+        if not recreate_model:
+            self.w2v_model.update(dataframe, train=train)
+        else:
+            self.w2v_model.create(dataframe,
+                                  self.storage_adapter.TRAIN_VECTOR_LENGTH,
+                                  self.storage_adapter.TRAIN_WINDOW)
+
+    def _apply_templates(self, dataframe, raw_data):
+        """Replace messages with the tokens of their templates, when templates are mined."""
+        if self.template_miner is None:
+            return dataframe
+        return self.template_miner.transform(raw_data)
+
+    def _save_w2v(self):
+        """Save w2v model when its word vectors changed, along with the templates its words come from."""
+        try:
+            if self.w2v_model.unsaved:
+                self.w2v_model.save(self.storage_adapter.W2V_MODEL_PATH)
+            if self.template_miner is not None:
+                self.template_miner.save(self.storage_adapter.TEMPLATE_MODEL_PATH)
+        except ModelSaveException as ex:
+            logging.error("Failed to save W2V model: %s" % ex)
+            raise
+
     @latency_logger(name="SomModelAdapter")
     def predict(self, data, json_logs, threshold):
         """Prediction from data provided and if it hits threshold it flags it an anomaly."""
@@ -96,7 +142,14 @@ class SomModelAdapter(BaseModelAdapter):
         if feedback_strategy is not None:
             false_positives = feedback_strategy.execute()
         logging.info("False Positive: {} ".format(false_positives))
-        dist = self.process_anomaly_score(data)
+        aggregation = None
+        if self.aggregator is not None:
+            # Only the representative of every cluster of similar logs is scored
+            aggregation = self.aggregator.aggregate(self.w2v_model.one_vector(data))
+            aggregation.label(json_logs)
+            dist = aggregation.expand(self.process_anomaly_score([data[i] for i in aggregation.representatives]))
+        else:
+            dist = self.process_anomaly_score(data)
         f = []
         hist_count = 0
         logging.info("Max anomaly score: %f" % max(dist))
@@ -130,6 +183,8 @@ class SomModelAdapter(BaseModelAdapter):
             ANOMALY_HIST.observe(hist_count)
             f.append(s)
         print("ANOMALY PERCENTAGE:", 100*hist_count/len(data), "%")
+        if aggregation is not None and self.storage_adapter.AGGR_COLLAPSE:
+            f = aggregation.collapse(f)
         return f
 
     @latency_logger(name="SomModelAdapter")
@@ -137,10 +192,10 @@ class SomModelAdapter(BaseModelAdapter):
         """Generate scores from some. To be used for inference."""
         meta_data = self.model.get_metadata()
         max_dist = meta_data[2]
-        v = self.w2v_model.one_vector(data)
-        dist = []
-        dist = self.model.get_anomaly_score(v, self.storage_adapter.PARALLELISM)
-        dist = dist / max_dist
+        dist = self.w2v_model.score_messages(
+            data, self.model.version,
+            lambda v: self.model.get_anomaly_score(v, self.storage_adapter.PARALLELISM))
+        dist = np.array(dist) / max_dist
         return dist
 
     def set_threshold(self):
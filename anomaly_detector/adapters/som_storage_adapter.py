@@ -15,11 +15,12 @@ class SomStorageAdapter(BaseStorageAdapter):
         self.feedback_strategy = feedback_strategy
         self.storage = StorageProxy(config)
 
-    def retrieve_data(self, timespan, max_entry, false_positive):
+    def retrieve_data(self, timespan, max_entry, false_positive, incremental=False):
         """Fetch data from storage system."""
         data, raw = self.storage.retrieve(ESStorageAttribute(timespan,
                                                              max_entry,
-                                                             false_positive))
+                                                             false_positive,
+                                                             incremental=incremental))
         if len(data) == 0:
             logging.info("There are no logs in last %s seconds", timespan)
             return None, None
@@ -27,29 +28,47 @@ class SomStorageAdapter(BaseStorageAdapter):
             data = list(data.message)
             return data, raw
 
-    @latency_logger(name="SomStorageAdapter")
-    def load_data(self, config_type):
-        """Load data from storage class depending on training vs inference."""
+    def _storage_attribute(self, config_type):
+        """Build the query attributes for training vs inference."""
         false_data = None
         if self.feedback_strategy is not None:
             false_data = self.feedback_strategy.execute()
 
         if config_type == "train":
-            return self.retrieve_data(timespan=self.config.TRAIN_TIME_SPAN,
-                                      max_entry=self.config.TRAIN_MAX_ENTRIES,
-                                      false_positive=false_data)
+            return ESStorageAttribute(self.config.TRAIN_TIME_SPAN,
+                                      self.config.TRAIN_MAX_ENTRIES,
+                                      false_data)
         elif config_type == "infer":
-            return self.retrieve_data(timespan=self.config.INFER_TIME_SPAN,
-                                      max_entry=self.config.INFER_MAX_ENTRIES,
-                                      false_positive=false_data)
+            return ESStorageAttribute(self.config.INFER_TIME_SPAN,
+                                      self.config.INFER_MAX_ENTRIES,
+                                      false_data,
+                                      incremental=self.config.INFER_INCREMENTAL)
         else:
             raise Exception("Not Supported option . config_type not in ['infer','train']")
 
+    @latency_logger(name="SomStorageAdapter")
+    def load_data(self, config_type):
+        """Load data from storage class depending on training vs inference."""
+        storage_attribute = self._storage_attribute(config_type)
+        return self.retrieve_data(timespan=storage_attribute.time_range,
+                                  max_entry=storage_attribute.number_of_entries,
+                                  false_positive=storage_attribute.false_data,
+                                  incremental=storage_attribute.incremental)
+
+    def iter_data(self, config_type):
+        """Stream data from storage batch by batch, depending on training vs inference."""
+        for data, raw in self.storage.iter_batches(self._storage_attribute(config_type)):
+            yield list(data.message), raw
+
     @latency_logger(name="SomStorageAdapter")
     def persist_data(self, df):
         """Abstraction around storage persistence class."""
         self.storage.store_results(df)
 
+    def flush(self):
+        """Wait for the results persisted in the background to be stored."""
+        self.storage.flush()
+
     def __getattr__(self, name):
         """Delegate all methods from config as a passthrough proxy into configurations."""
         return getattr(self.config, name)
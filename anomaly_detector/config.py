@@ -23,6 +23,16 @@ def join_lof_model_path(config):
     config.LOF_MODEL_PATH = os.path.join(config.MODEL_DIR, config.LOF_MODEL_FILE)
 
 
+def join_lof_ae_model_path(config):
+    """Construct path of the autoencoder ensembled with the LOF model."""
+    config.LOF_AE_MODEL_PATH = os.path.join(config.MODEL_DIR, config.LOF_AE_MODEL_FILE)
+
+
+def join_template_model_path(config):
+    """Construct path of the log templates."""
+    config.TEMPLATE_MODEL_PATH = os.path.join(config.MODEL_DIR, config.TEMPLATE_MODEL_FILE)
+
+
 def check_or_create_model_dir(config):
     """Check if model dir exists and create if not."""
     if not os.path.exists(config.MODEL_DIR):
@@ -37,6 +47,10 @@ class Configuration:
     # One of the storage backends available in storage/ dir
     STORAGE_DATASOURCE = "local"
     STORAGE_DATASINK = "local"
+    # Retrieve the next batch and store the previous results in background threads while scoring
+    STORAGE_PIPELINE = False
+    # Number of batches retrieved ahead and of results waiting to be stored in pipelined mode
+    STORAGE_PIPELINE_DEPTH = 2
 
     # Process logs from specific host
     LOGSOURCE_HOSTNAME = "localhost"
@@ -51,6 +65,10 @@ class Configuration:
     # LOF model
     LOF_MODEL_FILE = "LOF.model"
     LOF_MODEL_PATH_CALLABLE = join_lof_model_path
+    # AutoEncoder weights, fitted scaler and anomaly threshold used together with the LOF model
+    LOF_AE_MODEL_FILE = "AE.npz"
+    LOF_AE_MODEL_PATH_CALLABLE = join_lof_ae_model_path
+    LOF_AE_MODEL_PATH = ""
     # Name of the file where W2V model will be stored
     W2V_MODEL_FILE = "W2V.model"
     MODEL_PATH_CALLABLE = join_model_path
@@ -63,11 +81,39 @@ class Configuration:
     W2V_COMPUTE_LOSS = False
     W2V_SEED = 1
     W2V_WORKERS = 3
+    # Passes over the logs of a new training window when the w2v model is updated, 0 only extends its vocabulary.
+    # Inference windows only ever extend the vocabulary
+    W2V_UPDATE_EPOCHS = 1
+    # Encode logs with a single gather from the embedding matrix instead of per word lookups
+    W2V_MATRIX_ENCODER = True
+    # Maximum number of distinct log messages whose vectors and scores are cached, 0 disables the cache
+    W2V_CACHE_SIZE = 100000
+    # Maximum number of distinct words the tokenizer gives ids to, its vocabulary starts over before the next
+    # inference loop once it holds more
+    TOKENIZER_MAX_WORDS = 1000000
+    # Group logs into templates before encoding them, every template is then encoded and scored once
+    TEMPLATE_MINER = False
+    # Depth of the template parse tree, lines are routed by their number of tokens and first DEPTH - 3 tokens
+    TEMPLATE_DEPTH = 4
+    # Share of tokens a line must have in common with a template to join it
+    TEMPLATE_SIMILARITY = 0.4
+    # Maximum number of children of a node of the template parse tree
+    TEMPLATE_MAX_CHILDREN = 100
+    # Name of the file where log templates will be stored
+    TEMPLATE_MODEL_FILE = "templates.json"
+    TEMPLATE_MODEL_PATH_CALLABLE = join_template_model_path
+    TEMPLATE_MODEL_PATH = ""
     # Custom parameters for SOM
     SOMPY_TRAIN_ROUGH_LEN = 100
     SOMPY_TRAIN_FINETUNE_LEN = 5
     SOMPY_NODE_MAP = 24
     SOMPY_INIT = "pca"
+    # Megabytes of memory used for the distance matrix when scoring a batch of logs against the SOM
+    SCORING_MEMORY_BUDGET = 256
+    # Training of the numpy SOM used when sompy is not installed, either "online" or "batch"
+    SOM_TRAIN_MODE = "online"
+    # Number of passes over the training data in batch mode
+    SOM_BATCH_EPOCHS = 20
 
     MODEL_STORE = ""
     MODEL_STORE_PATH = "anomaly-detection/models/"
@@ -93,6 +139,12 @@ class Configuration:
 
     LOF_NEIGHBORS = 100
     LOF_METRIC = "euclidean"
+    # Neighbour search of LOF: exact "auto", "brute", "kd_tree", "ball_tree" or approximate "ivf"
+    LOF_ALGORITHM = "auto"
+    # Number of k-means cells of the approximate index, 0 uses the square root of the number of logs
+    LOF_IVF_CELLS = 0
+    # Number of closest cells searched for the neighbours of a log, more is slower and more accurate
+    LOF_IVF_PROBES = 8
 
     # Threshold used to decide whether an entry is an anomaly
     INFER_ANOMALY_THRESHOLD = 3.1
@@ -102,6 +154,8 @@ class Configuration:
     INFER_LOOPS = 10
     # Maximum number of entries to be loaded for inference
     INFER_MAX_ENTRIES = 78862
+    # Resume inference after the last stored log instead of re-reading the last INFER_TIME_SPAN seconds
+    INFER_INCREMENTAL = True
 
     # S3 credentials for storing model up to s3 post training.
     S3_KEY = ""
@@ -110,9 +164,25 @@ class Configuration:
     S3_BUCKET = ""
     # local test dataset
     LS_INPUT_PATH = ""
+    # Number of logs read from local files per batch
+    LS_BATCH_SIZE = 5000
     # Name of local results data
     LS_OUTPUT_PATH = ""
     LS_OUTPUT_RWA_MODE = "w"
+    # Parquet file or directory of parquet files read by the parquet source
+    PQ_INPUT_PATH = ""
+    # Directory the parquet sink writes a file of results to on every store
+    PQ_OUTPUT_PATH = ""
+    # Comma separated columns read from parquet along with the message
+    PQ_COLUMNS = ""
+    # Only read parquet logs from this time on, ISO 8601, empty for no bound
+    PQ_START_TIME = ""
+    # Only read parquet logs before this time, ISO 8601, empty for no bound
+    PQ_END_TIME = ""
+    # Number of rows read from parquet per batch
+    PQ_BATCH_SIZE = 65536
+    # Compression codec of the parquet files written
+    PQ_COMPRESSION = "snappy"
     # ElasticSearch endpoint URL
     ES_ENDPOINT = ""
     # Path to a directory where cert and key (es.crt and es.key) are stored for authentication
@@ -130,11 +200,47 @@ class Configuration:
     # When customer has custom log format. We will need to perform custom processing.
     ES_QUERY = ""
     ES_VERSION = 5
+    # Number of log entries fetched from ElasticSearch per scroll page
+    ES_PAGE_SIZE = 5000
+    # How long ElasticSearch keeps the scroll context alive between two pages
+    ES_SCROLL_TIMEOUT = "2m"
+    # Number of pages fetched ahead while the previous ones are processed
+    ES_PREFETCH_PAGES = 2
+    # Comma separated fields of the log documents to fetch, empty fetches whole documents
+    ES_SOURCE_FIELDS = ""
+    # What the ElasticSearch sink writes: "document" every result, "anomaly" only anomalies, or "update"
+    # the prediction fields into the source documents
+    ES_SINK_MODE = "document"
+    # Maximum number of results per bulk request
+    ES_BULK_CHUNK_SIZE = 1000
+    # Maximum size in bytes of a bulk request
+    ES_BULK_MAX_BYTES = 5242880
+    # Number of threads sending bulk requests in parallel
+    ES_BULK_THREADS = 4
     KF_BOOTSTRAP_SERVER = ""
     KF_TOPIC = ""
     KF_CACERT = None
     KF_SECURITY_PROTOCOL = 'PLAINTEXT'
     KF_AUTO_TIMEOUT = 30000
+    # What the kafka sink sends: "batch" all results as one message, "record" one message per log
+    # or "anomaly" one message per anomaly
+    KF_SINK_MODE = "batch"
+    # Milliseconds the kafka producer waits to group records in a request
+    KF_LINGER_MS = 5
+    # Maximum size in bytes of a kafka producer batch per partition
+    KF_PRODUCER_BATCH_SIZE = 16384
+    # Compression of kafka producer batches, "gzip", "snappy", "lz4" or empty for none
+    KF_COMPRESSION_TYPE = ""
+    # Topic the kafka source consumes log lines from
+    KF_INPUT_TOPIC = ""
+    # Consumer group of the kafka source, offsets are committed once results are stored
+    KF_GROUP_ID = "lad"
+    # Where a new consumer group starts reading the input topic, "latest" or "earliest"
+    KF_AUTO_OFFSET_RESET = "latest"
+    # Maximum number of log lines in a micro-batch
+    KF_BATCH_SIZE = 1000
+    # Maximum number of seconds spent collecting a micro-batch
+    KF_BATCH_TIMEOUT = 1.0
     ES_ELAST_ALERT = 1
     OS_NAMESPACE = os.getenv("OPENSHIFT_BUILD_NAMESPACE", "localhost")
     prefix = "LAD"
@@ -153,6 +259,12 @@ class Configuration:
     MG_INPUT_COL = ""
     MG_TARGET_DB = ""
     MG_TARGET_COL = ""
+    # Connections kept open by the MongoDB client shared by the process.
+    MG_MAX_POOL_SIZE = 10
+    # Updates sent to MongoDB in one bulk write.
+    MG_BULK_SIZE = 1000
+    # Number of log entries fetched from MongoDB per cursor batch
+    MG_BATCH_SIZE = 5000
 
     # MySQL config
     MYSQL_INPUT_HOST = "localhost"
@@ -167,18 +279,30 @@ class Configuration:
     MYSQL_INPUT_PASSWORD = ""
     MYSQL_TARGET_USER = ""
     MYSQL_TARGET_PASSWORD = ""
+    # Number of rows fetched from MySQL per query
+    MYSQL_BATCH_SIZE = 5000
 
     HOSTNAME_INDEX = ""
     DATETIME_INDEX = ""
     MESSAGE_INDEX = ""
+    # Unique, increasing column breaking ties between MySQL rows with the same timestamp, tables without it
+    # are read with a single query
+    MYSQL_ID_INDEX = "id"
 
     # Aggregation
     AGGR_TIME_SPAN = 86400
     AGGR_MAX_ENTRIES = 315448
     AGGR_VECTOR_LENGTH = 25
     AGGR_WINDOW = 5
+    # Maximum distance between the vectors of two logs of a cluster
     AGGR_EPS = 0.5
+    # Minimum number of logs around a log for DBSCAN to start a cluster from it
     AGGR_MIN_SAMPLES = 5
+    # Cluster logs during inference and only score one representative log per cluster
+    AGGR_INFERENCE = False
+    # Store one result per cluster, counting the logs it stands for, instead of one result per log.
+    # Sinks updating the source documents then only label one document per cluster
+    AGGR_COLLAPSE = False
 
     def __init__(self, prefix=None, config_yaml=None, config_dict=None):
         """Initialize configuration."""
@@ -1,7 +1,7 @@
 """DetectorPipeline class for processing a workflow of tasks to train an ML model."""
 from anomaly_detector.core import AbstractCommand
-from anomaly_detector.adapters import FeedbackStrategy, SomStorageAdapter, SomModelAdapter, LOFStorageAdapter, LOFModelAdapter
 from anomaly_detector.core import SomTrainJob, SomInferenceJob, LOFTrainJob, LOFInferenceJob
+from anomaly_detector.storage.storage_catalog import StorageCatalog
 from prometheus_client import Counter
 
 
@@ -73,9 +73,15 @@ class DetectorPipelineCatalog(object):
         else:
             raise ValueError("Unsupported job used {}".format(job))
 
+    @classmethod
+    def _is_streaming(cls, config):
+        """Inference runs continuously over streaming sources."""
+        return StorageCatalog.is_streaming(config.STORAGE_DATASOURCE + ".source")
+
     @classmethod
     def create_sompy_modeladapter(cls, config, feedback_strategy):
         """Setup sompy model adapter which provides functionality required to train SOMPY Model with W2V encoding."""
+        from anomaly_detector.adapters import FeedbackStrategy, SomStorageAdapter, SomModelAdapter
         if feedback_strategy is None:
             feedback_strategy = FeedbackStrategy(config=config)
         storage_adapter = SomStorageAdapter(config, feedback_strategy)
@@ -98,7 +104,8 @@ class DetectorPipelineCatalog(object):
         model_adapter = cls.create_sompy_modeladapter(config, feedback_strategy)
         pipeline.add_steps(SomTrainJob(node_map=config.SOMPY_NODE_MAP,
                                        model_adapter=model_adapter))
-        pipeline.add_steps(SomInferenceJob(model_adapter=model_adapter))
+        pipeline.add_steps(SomInferenceJob(model_adapter=model_adapter,
+                                           continuous=cls._is_streaming(config)))
         return pipeline
 
     @classmethod
@@ -114,6 +121,7 @@ class DetectorPipelineCatalog(object):
     @classmethod
     def create_lof_modeladapter(cls, config):
         """Setup lof model which provides functionality required to train LOF Model with W2V encoding."""
+        from anomaly_detector.adapters import LOFStorageAdapter, LOFModelAdapter
         storage_adapter = LOFStorageAdapter(config)
         model_adapter = LOFModelAdapter(storage_adapter)
         return model_adapter
@@ -133,7 +141,7 @@ class DetectorPipelineCatalog(object):
         pipeline = DetectorPipeline()
         model_adapter = cls.create_lof_modeladapter(config)
         pipeline.add_steps(LOFTrainJob(model_adapter))
-        pipeline.add_steps(LOFInferenceJob(model_adapter))
+        pipeline.add_steps(LOFInferenceJob(model_adapter, continuous=cls._is_streaming(config)))
         return pipeline
 
     @classmethod
@@ -141,9 +149,7 @@ class DetectorPipelineCatalog(object):
         """Perform inference of LOF Model."""
         pipeline = DetectorPipeline()
         model_adapter = cls.create_lof_modeladapter(config)
-        #pipeline.add_steps(LOFInferenceJob(model_adapter))
-        train = LOFTrainJob(model_adapter=model_adapter)
-        pipeline.add_steps(train)
+        pipeline.add_steps(LOFInferenceJob(model_adapter, continuous=cls._is_streaming(config)))
         return pipeline
 
 
@@ -55,11 +55,16 @@ class SomTrainJob(AbstractCommand):
 class SomInferenceJob(AbstractCommand):
     """Som Inference implementation."""
 
-    def __init__(self, model_adapter=None, sleep=True, recreate_model=False):
-        """Initialize inference job with fields to perform model inference."""
+    def __init__(self, model_adapter=None, sleep=True, recreate_model=False, continuous=False):
+        """Initialize inference job with fields to perform model inference.
+
+        A continuous job scores the micro-batches of a streaming source as they come, without
+        waiting between loops nor stopping after INFER_LOOPS.
+        """
         self.model_adapter = model_adapter
         self.sleep = sleep
         self.recreate_model = recreate_model
+        self.continuous = continuous
 
     def execute_with_tracing(self, tracer):
         """Will wrap execution of inference with tracer to measure latency."""
@@ -73,20 +78,27 @@ class SomInferenceJob(AbstractCommand):
         self.model_adapter.load_som_model()
         mean, threshold = self.model_adapter.set_threshold()
         infer_loops = 0
-        while infer_loops < self.model_adapter.storage_adapter.INFER_LOOPS:
+        while self.continuous or infer_loops < self.model_adapter.storage_adapter.INFER_LOOPS:
             then = time.time()
             INFER_COUNT.inc()
-            # Get data for inference
-            data, json_logs = self.model_adapter.preprocess(config_type="infer",
-                                                            recreate_model=self.recreate_model)
-            if data is None:
+            # Get data for inference, batches are scored as they arrive from storage
+            loaded = 0
+            for data, json_logs in self.model_adapter.preprocess_batches(config_type="infer",
+                                                                         recreate_model=self.recreate_model):
+                loaded += len(data)
+                results = self.model_adapter.predict(data, json_logs, threshold)
+                self.model_adapter.storage_adapter.persist_data(results)
+            # Every loop ends with its results stored, continuous jobs and loops without logs included
+            self.model_adapter.storage_adapter.flush()
+            if self.continuous:
+                # Streaming sources block while waiting for logs, no need to wait in between
+                continue
+            if not loaded:
                 time.sleep(5)
                 continue
 
-            logging.info("%d logs loaded from the last %d seconds", len(data),
+            logging.info("%d logs loaded from the last %d seconds", loaded,
                          self.model_adapter.storage_adapter.INFER_TIME_SPAN)
-            results = self.model_adapter.predict(data, json_logs, threshold)
-            self.model_adapter.storage_adapter.persist_data(results)
             # Inference done, increase counter
             infer_loops += 1
             now = time.time()
@@ -126,11 +138,12 @@ class LOFTrainJob(AbstractCommand):
 class LOFInferenceJob(AbstractCommand):
     """LOF Inference implementation."""
 
-    def __init__(self, model_adapter=None, sleep=True, recreate_model=False):
-        """Initialize inference job with fields to perform model inference."""
+    def __init__(self, model_adapter=None, sleep=True, recreate_model=False, continuous=False):
+        """Initialize inference job with fields to perform model inference, see SomInferenceJob for continuous."""
         self.model_adapter = model_adapter
         self.sleep = sleep
         self.recreate_model = recreate_model
+        self.continuous = continuous
 
     def execute(self):
         """Execute inference login for LOF with W2V encoding."""
@@ -138,17 +151,24 @@ class LOFInferenceJob(AbstractCommand):
         self.model_adapter.load_lof_model()
         while True:
             then = time.time()
-            data, json_logs = self.model_adapter.preprocess(config_type="infer",
-                                                            recreate_model=self.recreate_model)
-            if not data:     # If it's None
+            loaded = 0
+            for data, json_logs in self.model_adapter.preprocess_batches(config_type="infer",
+                                                                         recreate_model=self.recreate_model):
+                loaded += len(data)
+                results = self.model_adapter.predict(data, json_logs)
+                self.model_adapter.storage_adapter.persist_data(results)
+            # Every loop ends with its results stored, continuous jobs and loops without logs included
+            self.model_adapter.storage_adapter.flush()
+            if self.continuous:
+                # Streaming sources block while waiting for logs, no need to wait in between
+                continue
+            if not loaded:
                 # Sleep 15 seconds if there's no new data
                 time.sleep(15)
                 continue
 
-            logging.info("%d logs loaded from the last %d seconds", len(data),
+            logging.info("%d logs loaded from the last %d seconds", loaded,
                          self.model_adapter.storage_adapter.INFER_TIME_SPAN)
-            results = self.model_adapter.predict(data, json_logs)
-            self.model_adapter.storage_adapter.persist_data(results)
             now = time.time()
 
             if self.sleep:
@@ -1,10 +1,17 @@
-"""Model package."""
+"""Model package.
+
+Model backends (tensorflow, gensim, sompy) are imported by the methods that use them,
+so that a process only loads the backends of the models it actually uses.
+"""
 from anomaly_detector.model.base_model import BaseModel
 from anomaly_detector.model.som_model import SOMModel
 from anomaly_detector.model.sompy_model import SOMPYModel
 from anomaly_detector.model.w2v_model import W2VModel
 from anomaly_detector.model.lof_model import LOFModel
 from anomaly_detector.model.ae_model import AutoEncoderModel
+from anomaly_detector.model.ae_inference import AutoEncoderInference
+from anomaly_detector.model.template_miner import TemplateMiner
+from anomaly_detector.model.aggregator import LogAggregator
 
 __all__ = ['BaseModel',
            'SOMModel',
@@ -12,4 +19,7 @@ __all__ = ['BaseModel',
            'W2VModel',
            "LOFModel",
            "AutoEncoderModel",
+           "AutoEncoderInference",
+           "TemplateMiner",
+           "LogAggregator",
            ]
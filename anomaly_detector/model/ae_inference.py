@@ -0,0 +1,87 @@
+"""AutoEncoder inference - Forward pass of a trained AutoEncoderModel without TensorFlow."""
+import numpy as np
+from anomaly_detector.exception import ModelLoadException, ModelSaveException
+
+# Same clipping value as keras.backend.epsilon() used by the msle loss
+_EPSILON = 1e-7
+# Logs reconstructed at a time, bounds the memory of the forward pass
+DEFAULT_BATCH_SIZE = 4096
+
+
+class AutoEncoderInference:
+    """Score logs with the exported weights of an AutoEncoderModel.
+
+    Dropout is inactive at inference, so the network reduces to dense layers with relu
+    activations and a sigmoid output layer. Inputs are scaled with the parameters of the
+    MinMaxScaler fitted at training time before being reconstructed.
+    """
+
+    def __init__(self, weights, scale, offset, threshold, batch_size=DEFAULT_BATCH_SIZE):
+        """Initialize from kernels and biases in the order returned by AutoEncoderModel.get_weights."""
+        weights = [np.asarray(w, dtype=np.float32) for w in weights]
+        self.layers = list(zip(weights[0::2], weights[1::2]))
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.offset = np.asarray(offset, dtype=np.float32)
+        self.threshold = float(threshold)
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_model(cls, model, scaler, threshold):
+        """Export a trained keras autoencoder together with its fitted MinMaxScaler."""
+        return cls(model.get_weights(), scaler.scale_, scaler.min_, threshold)
+
+    @classmethod
+    def load(cls, source):
+        """Load exported weights from a .npz file."""
+        try:
+            with np.load(source) as data:
+                weights = [data["layer_%d" % i] for i in range(int(data["layers"]))]
+                # Batches are restored too, float32 sums depend on how rows are blocked together
+                batch_size = int(data["batch_size"]) if "batch_size" in data.files else DEFAULT_BATCH_SIZE
+                return cls(weights, data["scale"], data["offset"], data["threshold"], batch_size=batch_size)
+        except (OSError, KeyError, ValueError) as ex:
+            raise ModelLoadException("Could not load autoencoder weights: %s" % ex)
+
+    def save(self, dest):
+        """Export weights, scaler parameters, threshold and batch size to a .npz file."""
+        arrays = {}
+        for i, (kernel, bias) in enumerate(self.layers):
+            arrays["layer_%d" % (2 * i)] = kernel
+            arrays["layer_%d" % (2 * i + 1)] = bias
+        try:
+            with open(dest, "wb") as f:
+                np.savez(f, layers=2 * len(self.layers), scale=self.scale, offset=self.offset,
+                         threshold=self.threshold, batch_size=self.batch_size, **arrays)
+        except OSError as ex:
+            raise ModelSaveException("Could not save autoencoder weights: %s" % ex)
+
+    def transform(self, vectors):
+        """Scale log vectors like the MinMaxScaler fitted at training time."""
+        return np.asarray(vectors, dtype=np.float32) * self.scale + self.offset
+
+    def reconstruct(self, scaled_data):
+        """Run the forward pass on an already scaled batch."""
+        out = np.asarray(scaled_data, dtype=np.float32)
+        last = len(self.layers) - 1
+        for i, (kernel, bias) in enumerate(self.layers):
+            out = out @ kernel
+            out += bias
+            if i < last:
+                np.maximum(out, 0, out=out)
+            else:
+                with np.errstate(over="ignore"):
+                    out = 1 / (1 + np.exp(-out))
+        return out
+
+    def reconstruction_errors(self, vectors):
+        """Provide the mean squared logarithmic reconstruction error of every log vector."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[np.newaxis, :]
+        errors = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), self.batch_size):
+            scaled = self.transform(vectors[start:start + self.batch_size])
+            reconstructed = self.reconstruct(scaled)
+            diff = np.log1p(np.maximum(reconstructed, _EPSILON)) - np.log1p(np.maximum(scaled, _EPSILON))
+            errors[start:start + len(scaled)] = np.mean(diff * diff, axis=1)
+        return errors
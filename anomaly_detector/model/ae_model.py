@@ -1,11 +1,9 @@
 """AutoEncoder model"""
-from tensorflow.keras import Model, Sequential
-from tensorflow.keras.layers import Dense, Dropout
-from tensorflow.keras.losses import msle
 import numpy as np
 import pandas as pd
 
-class AutoEncoderModel(Model):
+
+class AutoEncoderModel:
     """
     Parameters
     ----------
@@ -14,10 +12,13 @@ class AutoEncoderModel(Model):
 
     code_size: int
       Number of units in bottle neck
+
+    TensorFlow is imported when the model is built, so that importing the model package does not load it.
     """
 
     def __init__(self, output_units, code_size=8):
-        super().__init__()
+        from tensorflow.keras import Sequential
+        from tensorflow.keras.layers import Dense, Dropout
         self.encoder = Sequential([
           Dense(64, activation='relu'),
           Dropout(0.1),
@@ -36,17 +37,24 @@ class AutoEncoderModel(Model):
           Dropout(0.1),
           Dense(output_units, activation='sigmoid')
         ])
+        self.model = Sequential([self.encoder, self.decoder])
+
+    def __call__(self, inputs):
+        return self.model(inputs)
+
+    def get_weights(self):
+        # kernels and biases of the encoder then the decoder, as AutoEncoderInference expects them
+        return self.model.get_weights()
 
-    def call(self, inputs):
-        encoded = self.encoder(inputs)
-        decoded = self.decoder(encoded)
-        return decoded
+    def predict(self, scaled_data):
+        return self.model.predict(scaled_data)
 
     def train(self, scaled_data):
-        self.compile(loss='msle', metrics=['mse'], optimizer='adam')
-        self.fit(scaled_data, scaled_data, epochs=20, batch_size=512)
+        self.model.compile(loss='msle', metrics=['mse'], optimizer='adam')
+        self.model.fit(scaled_data, scaled_data, epochs=20, batch_size=512)
 
     def find_threshold(self, scaled_data):
+        from tensorflow.keras.losses import msle
         reconstructions = self.predict(scaled_data)
         # provides losses of individual instances
         reconstruction_errors = msle(reconstructions, scaled_data)
@@ -56,6 +64,7 @@ class AutoEncoderModel(Model):
         return threshold
 
     def get_predictions(self, scaled_data, threshold):
+        from tensorflow.keras.losses import msle
         predictions = self.predict(scaled_data)
         # provides losses of individual instances
         errors = msle(predictions, scaled_data)
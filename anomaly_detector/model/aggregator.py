@@ -0,0 +1,83 @@
+"""Log aggregator - Cluster encoded logs so that only one log per cluster gets scored."""
+import logging
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Aggregation:
+    """Clusters of a batch of logs, each one represented by one of its logs."""
+
+    def __init__(self, representatives, clusters):
+        """Keep the log representing every cluster and the cluster of every log."""
+        self.representatives = representatives
+        self.clusters = clusters
+        self.counts = np.bincount(clusters, minlength=len(representatives))
+
+    def expand(self, values):
+        """Fan the values computed for the representatives out to every log of their cluster."""
+        return [values[cluster] for cluster in self.clusters]
+
+    def label(self, logs):
+        """Store the cluster of every log in cluster_id, and the number of logs a representative stands for."""
+        for log, cluster in zip(logs, self.clusters):
+            log["cluster_id"] = int(cluster)
+        for i, count in zip(self.representatives, self.counts):
+            logs[i]["aggregated_count"] = int(count)
+
+    def collapse(self, results):
+        """Keep one result per cluster, counting the logs it stands for.
+
+        The result of the representative is kept, or the first result of its cluster when the
+        representative was dropped, e.g. as a known false positive.
+        """
+        kept = {}
+        for result in results:
+            cluster = result["cluster_id"]
+            if cluster not in kept or "aggregated_count" in result:
+                kept[cluster] = result
+        collapsed = []
+        for cluster, result in sorted(kept.items()):
+            result["aggregated_count"] = int(self.counts[cluster])
+            collapsed.append(result)
+        return collapsed
+
+
+class LogAggregator:
+    """Group similar logs with DBSCAN, over the vectors the scoring model uses.
+
+    Exact duplicates are merged before clustering, and weigh as many logs towards AGGR_MIN_SAMPLES.
+    Logs DBSCAN leaves as noise are clusters of their own. The log closest to the mean of its
+    cluster represents it.
+    """
+
+    def __init__(self, config):
+        """Initialize with the AGGR_EPS and AGGR_MIN_SAMPLES of config."""
+        self.config = config
+
+    def aggregate(self, vectors):
+        """Cluster logs given as a 2-D array of vectors."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        distinct, first, inverse, weights = np.unique(vectors, axis=0, return_index=True,
+                                                      return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+        labels = DBSCAN(eps=self.config.AGGR_EPS, min_samples=self.config.AGGR_MIN_SAMPLES,
+                        n_jobs=self.config.PARALLELISM).fit_predict(distinct, sample_weight=weights)
+        noise = labels == -1
+        labels[noise] = labels.max() + 1 + np.arange(noise.sum())
+        _, labels = np.unique(labels, return_inverse=True)
+        labels = labels.reshape(-1)
+
+        clusters = labels.max() + 1
+        sums = np.zeros((clusters, distinct.shape[1]), dtype=np.float64)
+        np.add.at(sums, labels, distinct * weights[:, np.newaxis])
+        centers = sums / np.bincount(labels, weights=weights)[:, np.newaxis]
+        distances = np.linalg.norm(distinct - centers[labels], axis=1)
+        # Sorted by cluster, then by distance to the center: the first row of every cluster represents it
+        order = np.lexsort((distances, labels))
+        starts = np.flatnonzero(np.r_[True, np.diff(labels[order]) != 0])
+        representatives = first[order[starts]]
+
+        _LOGGER.info("%d logs aggregated into %d clusters", len(vectors), clusters)
+        return Aggregation(representatives, labels[inverse])
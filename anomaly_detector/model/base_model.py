@@ -12,6 +12,8 @@ class BaseModel:
         self.model = None
         self.metadata = None
         self.config = config
+        # Changes whenever the model is trained, loaded or replaced so derived results can be invalidated
+        self.version = 0
 
     def load(self, source):
         """Load a model from disk."""
@@ -25,6 +27,7 @@ class BaseModel:
 
         self.model = loaded_model["model"]
         self.metadata = loaded_model["metadata"]
+        self.version += 1
 
     def save(self, dest):
         """Save a model to disk."""
@@ -42,6 +45,7 @@ class BaseModel:
     def set(self, model):
         """Set a model."""
         self.model = model
+        self.version += 1
 
     def get_metadata(self):
         """Get model metadata."""
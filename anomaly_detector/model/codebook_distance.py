@@ -0,0 +1,61 @@
+"""Nearest codebook node distances for self organizing maps."""
+import numpy as np
+
+# Megabytes of the temporary (logs, nodes) distance matrix computed at once
+DEFAULT_MEMORY_BUDGET = 256
+
+
+def _flatten(logs, codebook):
+    """Return logs as a 2-D array and the codebook as a (nodes, vector length) array."""
+    logs = np.asarray(logs, dtype=np.float64)
+    if logs.ndim == 1:
+        logs = logs[np.newaxis, :]
+    nodes = np.asarray(codebook, dtype=np.float64).reshape(-1, logs.shape[1])
+    return logs, nodes
+
+
+def _nearest_nodes(logs, nodes, memory_budget):
+    """Yield chunks of logs together with the index of the nearest node of every log.
+
+    Squared distances to all nodes are expanded as ||x||^2 - 2x.c + ||c||^2 so that a chunk
+    of logs is compared against the whole map with one matrix product.
+    """
+    node_norms = np.einsum("ij,ij->i", nodes, nodes)
+    chunk_size = max(1, int(memory_budget * 2 ** 20) // (nodes.itemsize * len(nodes)))
+    for start in range(0, len(logs), chunk_size):
+        chunk = logs[start:start + chunk_size]
+        squared = np.einsum("ij,ij->i", chunk, chunk)[:, np.newaxis] - 2 * chunk @ nodes.T + node_norms
+        yield start, chunk, np.argmin(squared, axis=1)
+
+
+def nearest_codebook_node(logs, codebook, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """Find the best matching unit of every log vector.
+
+    :param logs: log vector or 2-D array of log vectors
+    :param codebook: SOM of shape (map_size, map_size, vector length) or (nodes, vector length)
+    :param memory_budget: megabytes available for the distance matrix of one chunk
+    :return: array with the flat index of the nearest node of every log
+    """
+    logs, nodes = _flatten(logs, codebook)
+    bmu = np.empty(len(logs), dtype=np.int64)
+    for start, chunk, nearest in _nearest_nodes(logs, nodes, memory_budget):
+        bmu[start:start + len(chunk)] = nearest
+    return bmu
+
+
+def min_codebook_distance(logs, codebook, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """Compute the euclidean distance of every log vector to its nearest codebook node.
+
+    The distance to the nearest node is recomputed directly, which avoids the cancellation
+    error of the expanded squared distances used to find it.
+
+    :param logs: log vector or 2-D array of log vectors
+    :param codebook: SOM of shape (map_size, map_size, vector length) or (nodes, vector length)
+    :param memory_budget: megabytes available for the distance matrix of one chunk
+    :return: array with one distance per log
+    """
+    logs, nodes = _flatten(logs, codebook)
+    dist = np.empty(len(logs))
+    for start, chunk, nearest in _nearest_nodes(logs, nodes, memory_budget):
+        dist[start:start + len(chunk)] = np.linalg.norm(chunk - nodes[nearest], axis=1)
+    return dist
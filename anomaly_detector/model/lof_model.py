@@ -3,6 +3,7 @@ from anomaly_detector.model.base_model import BaseModel
 import numpy as np
 import logging
 from sklearn.neighbors import LocalOutlierFactor
+from anomaly_detector.model.neighbors import ApproximateLOF
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -14,15 +15,29 @@ class LOFModel(BaseModel):
         super().__init__(config)
         self.config = config
 
-    def train(self, X, neighbors, metric, parallelism):
-        """Train the LOF model"""
-        lof = LocalOutlierFactor(n_neighbors=neighbors,
-                                 metric=metric,
-                                 novelty=True,
-                                 n_jobs=parallelism
-                                 )
+    def train(self, X, neighbors, metric, parallelism, algorithm="auto", ivf_cells=0, ivf_probes=8):
+        """Train the LOF model
+
+        algorithm is one of sklearn's exact neighbour searches ("auto", "brute", "kd_tree",
+        "ball_tree") or "ivf" for the approximate search of ApproximateLOF.
+        """
+        if algorithm == "ivf":
+            if metric != "euclidean":
+                raise ValueError("Approximate LOF only supports the euclidean metric, got {}".format(metric))
+            lof = ApproximateLOF(n_neighbors=neighbors,
+                                 n_cells=ivf_cells or None,
+                                 n_probes=ivf_probes)
+        else:
+            lof = LocalOutlierFactor(n_neighbors=neighbors,
+                                     metric=metric,
+                                     algorithm=algorithm,
+                                     novelty=True,
+                                     n_jobs=parallelism
+                                     )
+        _LOGGER.info("Training LOF with %s neighbour search on %d logs", algorithm, len(X))
         lof.fit(X)
         self.model = lof
+        self.version += 1
 
     def predict(self, logs):
         """Make inference according new logs"""
@@ -31,3 +46,9 @@ class LOFModel(BaseModel):
         preds = self.model.predict(logs)
         scores = abs(self.model.score_samples(logs))
         return list(zip(preds, scores))
+
+    def training_scores(self):
+        """Predictions and scores of the training logs, taken from the fitted model instead of scoring them again"""
+        factors = self.model.negative_outlier_factor_
+        preds = np.where(factors < self.model.offset_, -1, 1)
+        return list(zip(preds, abs(factors)))
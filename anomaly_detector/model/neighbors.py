@@ -0,0 +1,132 @@
+"""Approximate nearest neighbour search and the Local Outlier Factor built on top of it."""
+import logging
+import numpy as np
+from anomaly_detector.model.codebook_distance import nearest_codebook_node, DEFAULT_MEMORY_BUDGET
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """Inverted file index: vectors are clustered with k-means and only the closest clusters are searched.
+
+    Queries falling into the same cluster share their candidate set, the points of the n_probes
+    clusters closest to it, so each cluster is searched with one matrix product.
+    """
+
+    def __init__(self, n_cells=None, n_probes=8, iterations=10, seed=0, memory_budget=DEFAULT_MEMORY_BUDGET):
+        """Initialize index, n_cells defaults to the square root of the number of vectors."""
+        self.n_cells = n_cells
+        self.n_probes = n_probes
+        self.iterations = iterations
+        self.seed = seed
+        self.memory_budget = memory_budget
+
+    def fit(self, X):
+        """Cluster the vectors and build the inverted lists."""
+        self._fit_X = np.asarray(X, dtype=np.float64)
+        n_cells = min(len(self._fit_X), self.n_cells or max(1, int(np.sqrt(len(self._fit_X)))))
+        rng = np.random.RandomState(self.seed)
+        self.centroids_ = self._fit_X[rng.choice(len(self._fit_X), n_cells, replace=False)]
+        for _ in range(self.iterations):
+            cells = nearest_codebook_node(self._fit_X, self.centroids_, self.memory_budget)
+            counts = np.bincount(cells, minlength=n_cells)
+            sums = np.zeros_like(self.centroids_)
+            np.add.at(sums, cells, self._fit_X)
+            filled = counts > 0
+            self.centroids_[filled] = sums[filled] / counts[filled, np.newaxis]
+        cells = nearest_codebook_node(self._fit_X, self.centroids_, self.memory_budget)
+        self._order = np.argsort(cells, kind="stable")
+        self._starts = np.concatenate(([0], np.cumsum(np.bincount(cells, minlength=n_cells))))
+        # Cells ordered by distance from every cell, the first one being the cell itself
+        gap = self.centroids_[:, np.newaxis, :] - self.centroids_[np.newaxis, :, :]
+        self._probe_order = np.argsort(np.einsum("ijk,ijk->ij", gap, gap), axis=1, kind="stable")
+        return self
+
+    def _candidates(self, cell, needed):
+        """Return ids of the points in the cells probed for queries of the given cell."""
+        probes = self._probe_order[cell]
+        sizes = np.cumsum(self._starts[probes + 1] - self._starts[probes])
+        n_probes = max(min(self.n_probes, len(probes)), int(np.searchsorted(sizes, needed)) + 1)
+        return np.concatenate([self._order[self._starts[p]:self._starts[p + 1]] for p in probes[:n_probes]])
+
+    def kneighbors(self, X=None, n_neighbors=5):
+        """Find approximate neighbours, like sklearn's kneighbors.
+
+        :param X: query vectors, None queries the indexed vectors themselves excluding each point
+        :param n_neighbors: number of neighbours of every query
+        :return: (distances, indices) arrays of shape (queries, n_neighbors) sorted by distance
+        """
+        exclude_self = X is None
+        X = self._fit_X if exclude_self else np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        needed = n_neighbors + int(exclude_self)
+        cells = nearest_codebook_node(X, self.centroids_, self.memory_budget)
+        distances = np.empty((len(X), n_neighbors))
+        indices = np.empty((len(X), n_neighbors), dtype=np.int64)
+        queries_by_cell = np.argsort(cells, kind="stable")
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(cells, minlength=len(self.centroids_)))))
+        for cell in np.flatnonzero(np.diff(bounds)):
+            candidates = self._candidates(cell, needed)
+            points = self._fit_X[candidates]
+            point_norms = np.einsum("ij,ij->i", points, points)
+            row_bytes = 8 * max(len(candidates), n_neighbors * X.shape[1])
+            chunk_size = max(1, int(self.memory_budget * 2 ** 20) // row_bytes)
+            cell_queries = queries_by_cell[bounds[cell]:bounds[cell + 1]]
+            for start in range(0, len(cell_queries), chunk_size):
+                query_ids = cell_queries[start:start + chunk_size]
+                queries = X[query_ids]
+                squared = np.einsum("ij,ij->i", queries, queries)[:, np.newaxis] - 2 * queries @ points.T + point_norms
+                if exclude_self:
+                    squared[candidates[np.newaxis, :] == query_ids[:, np.newaxis]] = np.inf
+                nearest = np.argpartition(squared, n_neighbors - 1, axis=1)[:, :n_neighbors]
+                # Exact distances of the selected neighbours, free of the cancellation error of the expansion
+                dist = np.linalg.norm(queries[:, np.newaxis, :] - points[nearest], axis=2)
+                ranks = np.argsort(dist, axis=1, kind="stable")
+                distances[query_ids] = np.take_along_axis(dist, ranks, axis=1)
+                indices[query_ids] = candidates[np.take_along_axis(nearest, ranks, axis=1)]
+        return distances, indices
+
+
+class ApproximateLOF:
+    """Local Outlier Factor in novelty mode computed on the neighbours found by an IVFIndex.
+
+    Exposes the parts of sklearn's LocalOutlierFactor used by LOFModel, with the same
+    definitions of reachability distance, local reachability density and score.
+    """
+
+    def __init__(self, n_neighbors=20, n_cells=None, n_probes=8, seed=0):
+        """Initialize model, see IVFIndex for the index parameters."""
+        self.n_neighbors = n_neighbors
+        self.index = IVFIndex(n_cells=n_cells, n_probes=n_probes, seed=seed)
+        # Same threshold as sklearn's LocalOutlierFactor with contamination="auto"
+        self.offset_ = -1.5
+
+    def fit(self, X):
+        """Index the training vectors and compute their local outlier factor."""
+        self.index.fit(X)
+        self.n_neighbors_ = max(1, min(self.n_neighbors, len(self.index._fit_X) - 1))
+        distances, neighbors = self.index.kneighbors(None, self.n_neighbors_)
+        self._k_distance = distances[:, -1]
+        self._lrd = self._local_reachability_density(distances, neighbors)
+        self.negative_outlier_factor_ = -np.mean(self._lrd[neighbors], axis=1) / self._lrd
+        return self
+
+    def _local_reachability_density(self, distances, neighbors):
+        """Inverse of the mean reachability distance to the neighbours."""
+        reach = np.maximum(distances, self._k_distance[neighbors])
+        return 1. / (np.mean(reach, axis=1) + 1e-10)
+
+    def score_samples(self, X):
+        """Opposite of the local outlier factor of new vectors, lower is more abnormal."""
+        distances, neighbors = self.index.kneighbors(X, self.n_neighbors_)
+        lrd = self._local_reachability_density(distances, neighbors)
+        return -np.mean(self._lrd[neighbors], axis=1) / lrd
+
+    def decision_function(self, X):
+        """Shifted score, negative values are outliers."""
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        """Label new vectors, -1 for outliers and 1 for inliers."""
+        return np.where(self.decision_function(X) < 0, -1, 1)
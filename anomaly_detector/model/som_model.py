@@ -1,13 +1,11 @@
 """SOM model."""
 
 from anomaly_detector.model.base_model import BaseModel
-from matplotlib import pyplot as plt
+from anomaly_detector.model.codebook_distance import min_codebook_distance, nearest_codebook_node, \
+    DEFAULT_MEMORY_BUDGET
 import os
 import numpy as np
 import logging
-import matplotlib
-
-matplotlib.use("agg")
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -17,46 +15,63 @@ class SOMModel(BaseModel):
 
     def train(self, inp, map_size, iterations, parallelism):
         """Train the SOM model."""
-        if self.model is None:
-            # Generate a 24x24 node feature of color data
+        if self.model is None or self.model.shape[:2] != (map_size, map_size):
+            # Generate a map_size x map_size node feature of color data
             self.model = np.random.rand(map_size, map_size, inp.shape[1])
+        self.version += 1
+
+        inp = np.asarray(inp, dtype=np.float64)
+        nodes = self.model.reshape(-1, inp.shape[1]).astype(np.float64)
+        grid_dist = self._grid_distances(map_size)
+        if self.config is not None and self.config.SOM_TRAIN_MODE == "batch":
+            nodes = self._train_batch(inp, nodes, grid_dist, self.config.SOM_BATCH_EPOCHS, map_size)
+        else:
+            self._train_online(inp, nodes, grid_dist, iterations)
+        self.model = nodes.reshape(map_size, map_size, inp.shape[1])
 
-        for iters in range(iterations):
-            if not iters % int(iterations / 10):
+    @classmethod
+    def _grid_distances(cls, map_size):
+        """Distance on the map between every pair of nodes, nodes are numbered row by row."""
+        coords = np.indices((map_size, map_size)).reshape(2, -1).T
+        return np.linalg.norm(coords[:, np.newaxis, :] - coords[np.newaxis, :, :], axis=2)
+
+    def _train_online(self, inp, nodes, grid_dist, iterations):
+        """Update the whole map towards one random document vector per iteration."""
+        # Neighborhood of every node to every possible BMU, see neihborhood()
+        neighborhood = np.exp(-1.0 * (grid_dist / 2))
+        log_every = max(1, iterations // 10)
+        # Select a Random Document Vector From the training data for every iteration
+        samples = np.random.randint(inp.shape[0], size=iterations)
+        for iters, rand_num in enumerate(samples):
+            if not iters % log_every:
                 _LOGGER.info("SOM training iteration %d/%d" % (iters, iterations))
-            rand_num = np.random.randint(inp.shape[0])
-            # Select a Random Document Vector From the training data
-            current_vector = inp[rand_num, :]
-
-            # Traverse the map and calculating Euclidian Distance
-            # from each node to find best matching unit (BMU)
-            bmu = np.inf
-            bmu_loc = (0, 0)
-
-            for i in range(self.model.shape[0]):
-                for j in range(self.model.shape[1]):
-                    dist = np.linalg.norm(current_vector - self.model[i][j])
-                    if dist < bmu:
-                        bmu = dist
-                        bmu_loc = (i, j)
-
-            # Update BMU and Neighbours in the map:
-            for x in range(-12, 12):
-                for y in range(-12, 12):
-                    current_x = bmu_loc[0] + x
-                    current_y = bmu_loc[1] + y
-                    if 0 <= current_x < 24 and 0 <= current_y < 24:
-                        self.model[current_x][current_y] = self.model[current_x][current_y] + (
-                            self.alph(iterations, iters)
-                        ) * self.neihborhood(np.array(bmu_loc), np.array([current_x, current_y])) * (
-                            current_vector - self.model[current_x][current_y]
-                        )
+            diff = inp[rand_num] - nodes
+            bmu = np.argmin(np.einsum("ij,ij->i", diff, diff))
+            nodes += (self.alph(iterations, iters) * neighborhood[bmu])[:, np.newaxis] * diff
+
+    def _train_batch(self, inp, nodes, grid_dist, epochs, map_size):
+        """Batch SOM, every epoch moves each node to the neighborhood weighted mean of all vectors."""
+        memory_budget = self.config.SCORING_MEMORY_BUDGET
+        radius_start, radius_end = map_size / 2.0, 1.0
+        for epoch in range(epochs):
+            _LOGGER.info("SOM training epoch %d/%d" % (epoch, epochs))
+            # Gaussian neighborhood shrinking exponentially from half the map down to the nearest nodes
+            radius = radius_start * (radius_end / radius_start) ** (epoch / max(1, epochs - 1))
+            neighborhood = np.exp(-grid_dist ** 2 / (2 * radius ** 2))
+            bmu = nearest_codebook_node(inp, nodes, memory_budget)
+            counts = np.bincount(bmu, minlength=len(nodes))
+            sums = np.stack([np.bincount(bmu, weights=inp[:, d], minlength=len(nodes))
+                             for d in range(inp.shape[1])], axis=1)
+            weights = neighborhood @ counts
+            updated = weights > 0
+            nodes[updated] = (neighborhood @ sums)[updated] / weights[updated, np.newaxis]
+        return nodes
 
     def save_visualisation(self, dest):
         """Create and save a png image of the SOM."""
         # Since Data is no longer representable in 2 or 3 dimensions we will display a matrix
         # of distances from adjecent vectors
-        new = np.zeros((24, 24))
+        new = np.zeros(self.model.shape[:2])
 
         for x in range(self.model.shape[0]):
             for y in range(self.model.shape[1]):
@@ -68,6 +83,11 @@ class SOMModel(BaseModel):
                 except IndexError:
                     pass
 
+        # matplotlib is only needed here, so it is not loaded by every SOM job
+        import matplotlib
+        matplotlib.use("agg")
+        from matplotlib import pyplot as plt
+
         fig = plt.figure()
         ax = fig.add_subplot(111)
         cax = ax.matshow(new, interpolation="nearest")
@@ -75,16 +95,12 @@ class SOMModel(BaseModel):
         fig.savefig(os.path.join(dest, "U-map.png"))
 
     def get_anomaly_score(self, log, parallelism):
-        """Compute a distance of a log entry to elements of SOM."""
-        # convert log into vector using same word2vec model (here just going to grab from existing)
-        dist_smallest = np.inf
-        for x in range(self.model.shape[0]):
-            for y in range(self.model.shape[1]):
-                # cosine(som[x][y],log)#np.linalg.norm(som[x][y]-log)
-                dist = np.linalg.norm(self.model[x][y] - log)
-                if dist < dist_smallest:
-                    dist_smallest = dist
-        return dist_smallest
+        """Compute a distance of a log entry, or of every log of a batch, to elements of SOM."""
+        memory_budget = self.config.SCORING_MEMORY_BUDGET if self.config else DEFAULT_MEMORY_BUDGET
+        dist = min_codebook_distance(log, self.model, memory_budget)
+        if np.ndim(log) == 1:
+            return dist[0]
+        return dist
 
     # TODO: make method private
     @classmethod
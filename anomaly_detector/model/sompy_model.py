@@ -1,13 +1,22 @@
 """SOMPY model."""
 from anomaly_detector.model.base_model import BaseModel
 import numpy as np
+import importlib.util
 import logging
-import sompy
-from multiprocessing import Pool
-from scipy.spatial.distance import cosine
+from anomaly_detector.model.codebook_distance import min_codebook_distance, DEFAULT_MEMORY_BUDGET
+from anomaly_detector.model.worker_pool import WorkerPool
 
 _LOGGER = logging.getLogger(__name__)
 
+# Smaller batches are scored in process, shipping them to workers costs more than it saves
+_MIN_PARALLEL_LOGS = 20000
+
+
+def _score_chunk(task):
+    """Score a chunk of logs in a worker against the SOM shared with it."""
+    codebook, logs, memory_budget = task
+    return min_codebook_distance(logs, codebook.get(), memory_budget)
+
 
 class SOMPYModel(BaseModel):
     """SOMPY alternative SOM implementation with parallelization."""
@@ -17,8 +26,14 @@ class SOMPYModel(BaseModel):
         super().__init__(config)
         self.config = config
 
+    @classmethod
+    def is_available(cls):
+        """Check if the sompy package is installed, without importing it."""
+        return importlib.util.find_spec("sompy") is not None
+
     def train(self, inp, map_size, iterations, parallelism):
         """Train the SOM model."""
+        import sompy
         mapsize = [map_size, map_size]
         som = sompy.SOMFactory.build(inp, mapsize, initialization=self.config.SOMPY_INIT)
         if not self.config:
@@ -28,24 +43,19 @@ class SOMPYModel(BaseModel):
                       train_finetune_len=self.config.SOMPY_TRAIN_FINETUNE_LEN)
             # train_rough_len=100,train_finetune_len=5
         self.model = som.codebook.matrix.reshape([map_size, map_size, inp.shape[1]])
+        self.version += 1
 
     def get_anomaly_score(self, logs, parallelism):
-        """Get Anomaly Score."""
-        pool = Pool(parallelism)
-        dist = pool.map(self.calculate_anomaly_score, logs)
-        pool.close()
-        pool.join()
-        return dist
+        """Get Anomaly Score, the distance of every log to its nearest SOM node."""
+        memory_budget = self.config.SCORING_MEMORY_BUDGET if self.config else DEFAULT_MEMORY_BUDGET
+        pool = WorkerPool.get(parallelism)
+        if not pool.parallel or len(logs) < _MIN_PARALLEL_LOGS:
+            return min_codebook_distance(logs, self.model, memory_budget)
+        codebook = pool.share(id(self), self.version, self.model)
+        chunks = np.array_split(np.asarray(logs), parallelism)
+        dist = pool.map(_score_chunk, [(codebook, chunk, memory_budget / parallelism) for chunk in chunks])
+        return np.concatenate(dist)
 
     def calculate_anomaly_score(self, log):
         """Compute a distance of a log entry to elements of SOM."""
-        # convert log into vector using same word2vec model (here just going to grab from existing)
-        dist_smallest = np.inf
-        for x in range(self.model.shape[0]):
-            for y in range(self.model.shape[1]):
-                #if log.shape < self.model[x][y].shape:
-                #    log = np.pad(log, [0, self.model[x][y].shape[0] - log.shape[0]])
-                dist = np.linalg.norm(self.model[x][y] - log)
-                if dist < dist_smallest:
-                    dist_smallest = dist
-        return dist_smallest
+        return min_codebook_distance(log, self.model)[0]
@@ -0,0 +1,144 @@
+"""Template miner - Group log lines into templates online, with a fixed depth parse tree as in Drain."""
+import json
+import logging
+import os
+import re
+from anomaly_detector.storage.storage import field_value
+from anomaly_detector.storage.tokenizer import tokenize
+
+_LOGGER = logging.getLogger(__name__)
+
+# Variable fields replaced before parsing, in this order
+_MASKS = [(re.compile(r"(?<![\w.])\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?(?!\w|\.\d)"), "<IP>"),
+          (re.compile(r"(?<![\w/])(?:/[\w.\-]+)+/?"), "<PATH>"),
+          (re.compile(r"\b(?:0[xX][0-9a-fA-F]+|(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,})\b"),
+           "<HEX>"),
+          (re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?!\w|\.\d)"), "<NUM>")]
+
+WILDCARD = "<*>"
+_DIGIT = re.compile(r"\d")
+# Masked messages remembered with their template, forgotten all at once when full
+_MAX_MEMO = 100000
+
+
+def mask(message):
+    """Replace ips, paths, hex ids and numbers of a message with placeholders."""
+    for pattern, placeholder in _MASKS:
+        message = pattern.sub(placeholder, message)
+    return message
+
+
+class LogTemplate:
+    """Template of a group of log lines, tokens varying between the lines are wildcards."""
+
+    def __init__(self, template_id, tokens):
+        """Create a template from the tokens of its first line."""
+        self.template_id = template_id
+        self.tokens = tokens
+        self.size = 0
+
+    def similarity(self, tokens):
+        """Share of tokens equal to the template, wildcards never match."""
+        same = sum(1 for mine, theirs in zip(self.tokens, tokens) if mine == theirs and mine != WILDCARD)
+        return same / len(tokens) if tokens else 1.0
+
+    def merge(self, tokens):
+        """Turn the tokens differing from a new line into wildcards."""
+        self.tokens = [mine if mine == theirs else WILDCARD for mine, theirs in zip(self.tokens, tokens)]
+        self.size += 1
+
+    def __str__(self):
+        """Template text, as the tokenizer reads it."""
+        return " ".join(self.tokens)
+
+
+class TemplateMiner:
+    """Drain log parser.
+
+    Lines are routed through a tree of TEMPLATE_DEPTH levels: the root, their number of tokens, their first
+    TEMPLATE_DEPTH - 3 tokens and a leaf holding templates. A line joins the most similar template of its
+    leaf when at least TEMPLATE_SIMILARITY of its tokens match, otherwise it starts a new one. Template ids
+    never change, the text of a template gets more general as lines join it.
+    """
+
+    def __init__(self, config):
+        """Create an empty miner."""
+        self.config = config
+        self.templates = []
+        self._tree = {}
+        self._memo = {}
+
+    def _leaf(self, tokens):
+        """Return the templates of the tree leaf a line is routed to, creating the path if needed."""
+        node = self._tree.setdefault(len(tokens), {})
+        for token in tokens[:max(self.config.TEMPLATE_DEPTH - 3, 0)]:
+            # Variable looking tokens would make the tree explode, they all go to the wildcard branch
+            if token not in node and (_DIGIT.search(token) or token.startswith("<")
+                                      or len(node) >= self.config.TEMPLATE_MAX_CHILDREN):
+                token = WILDCARD
+            node = node.setdefault(token, {})
+        return node.setdefault(None, [])
+
+    def add(self, message):
+        """Assign a line to a template, return the template."""
+        masked = mask(message)
+        template_id = self._memo.get(masked)
+        if template_id is not None:
+            template = self.templates[template_id]
+            template.size += 1
+            return template
+        tokens = masked.split()
+        leaf = self._leaf(tokens)
+        best, best_similarity = None, -1.0
+        for template in leaf:
+            similarity = template.similarity(tokens)
+            if similarity > best_similarity:
+                best, best_similarity = template, similarity
+        if best is not None and best_similarity >= self.config.TEMPLATE_SIMILARITY:
+            best.merge(tokens)
+        else:
+            best = LogTemplate(len(self.templates), tokens)
+            best.size = 1
+            self.templates.append(best)
+            leaf.append(best)
+        if len(self._memo) >= _MAX_MEMO:
+            self._memo.clear()
+        self._memo[masked] = best.template_id
+        return best
+
+    def transform(self, logs):
+        """Assign every log to a template and return the tokens of its template, for the encoder.
+
+        The template id is recorded in every log. Logs of the same template share one token array,
+        so the w2v model encodes and scores every template once.
+        """
+        field = self.config.MESSAGE_INDEX or "message"
+        template_ids = []
+        for log in logs:
+            message = field_value(log, field)
+            template_id = self.add("" if message is None else str(message)).template_id
+            log["template_id"] = template_id
+            template_ids.append(template_id)
+        distinct = list(dict.fromkeys(template_ids))
+        tokens = dict(zip(distinct, tokenize([str(self.templates[i]) for i in distinct])))
+        _LOGGER.info("%d logs matched %d templates", len(logs), len(distinct))
+        return [tokens[template_id] for template_id in template_ids]
+
+    def save(self, dest):
+        """Save templates to disk."""
+        with open(dest, "w") as f:
+            json.dump([{"tokens": template.tokens, "size": template.size} for template in self.templates], f)
+
+    def load(self, source):
+        """Load templates from disk, their ids are kept."""
+        if not os.path.isfile(source):
+            return
+        with open(source) as f:
+            saved = json.load(f)
+        self.templates, self._tree, self._memo = [], {}, {}
+        for template_id, entry in enumerate(saved):
+            template = LogTemplate(template_id, entry["tokens"])
+            template.size = entry["size"]
+            self.templates.append(template)
+            self._leaf(template.tokens).append(template)
+        _LOGGER.info("%d log templates loaded from %s", len(self.templates), source)
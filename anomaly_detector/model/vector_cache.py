@@ -0,0 +1,81 @@
+"""Vector cache - Bounded LRU cache of encoded log messages."""
+from collections import OrderedDict
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+VECTOR_CACHE_HITS = Counter("aiops_lad_vector_cache_hits", "count of log lines served from the vector cache")
+VECTOR_CACHE_MISSES = Counter("aiops_lad_vector_cache_misses", "count of log lines encoded by the w2v model")
+VECTOR_CACHE_HIT_RATE = Gauge("aiops_lad_vector_cache_hit_rate", "hit rate of the vector cache")
+
+
+class VectorCache:
+    """Cache pooled vectors, and optionally model scores, keyed by the cleaned tokens of a log message."""
+
+    def __init__(self, max_size):
+        """Initialize an empty cache holding at most max_size distinct messages."""
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(words):
+        """Return the cleaned token sequence of a log message as a hashable key, given as words or word ids.
+
+        The sequence itself is the key, messages whose hashes collide still get their own entries.
+        """
+        if isinstance(words, np.ndarray):
+            return words.tobytes()
+        return tuple(words)
+
+    def get_vector(self, key):
+        """Return the cached vector of a message or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put_vector(self, key, vector):
+        """Cache the vector of a message, evicting the least recently used one when full."""
+        self._entries[key] = [vector, None, None]
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_score(self, key, model_version):
+        """Return the score of a message computed by the given model version or None."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] != model_version:
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def put_score(self, key, model_version, score):
+        """Attach the score computed by the given model version to a cached message."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[1] = model_version
+            entry[2] = score
+
+    def record(self, hits, misses):
+        """Record how many log lines were served from the cache."""
+        self.hits += hits
+        self.misses += misses
+        VECTOR_CACHE_HITS.inc(hits)
+        VECTOR_CACHE_MISSES.inc(misses)
+        VECTOR_CACHE_HIT_RATE.set(self.hit_rate)
+
+    @property
+    def hit_rate(self):
+        """Share of log lines served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def invalidate(self):
+        """Drop all entries, the vectors are stale once the word vectors of the w2v model change."""
+        self._entries.clear()
+
+    def __len__(self):
+        """Number of distinct messages in cache."""
+        return len(self._entries)
@@ -1,11 +1,15 @@
 """Word 2 vector model."""
 import numpy as np
-from gensim.models import Word2Vec
 from anomaly_detector.model.base_model import BaseModel
+from anomaly_detector.model.vector_cache import VectorCache
+from anomaly_detector.storage.tokenizer import VOCABULARY, Sentences, is_tokenized
 import logging
 
 _LOGGER = logging.getLogger(__name__)
 
+# Number of logs mean-pooled per gather from the embedding matrix, bounds the temporary token buffer
+_ENCODE_BATCH_SIZE = 20000
+
 
 class W2VModel(BaseModel):
     """Word2Vec model wrapper."""
@@ -14,10 +18,77 @@ class W2VModel(BaseModel):
         """Construct with configurations for customizations."""
         super().__init__(config)
         self.config = config
+        self._word_index = None
+        self._token_rows = None
+        self._generation = VOCABULARY.generation
+        # Set when the word vectors changed since the model was loaded or saved
+        self.unsaved = False
+        self.cache = None
+        if config is not None and config.W2V_CACHE_SIZE > 0:
+            self.cache = VectorCache(config.W2V_CACHE_SIZE)
+
+    def _model_changed(self):
+        """Drop everything derived from the previous word vectors, only when they actually changed."""
+        self._word_index = None
+        self._token_rows = None
+        self.unsaved = True
+        if self.cache is not None:
+            self.cache.invalidate()
+
+    def _sync_vocabulary(self):
+        """Drop everything keyed by word ids once the shared vocabulary was reset."""
+        if self._generation != VOCABULARY.generation:
+            self._generation = VOCABULARY.generation
+            self._token_rows = None
+            if self.cache is not None:
+                self.cache.invalidate()
+
+    @staticmethod
+    def reset_vocabulary(max_words=0):
+        """Reset the shared vocabulary when it holds more than max_words words, so it does not grow forever.
+
+        Only call it while no tokenized log is in use, their word ids can not be decoded afterwards.
+        """
+        if len(VOCABULARY) > max_words:
+            _LOGGER.info("Resetting vocabulary of %d words", len(VOCABULARY))
+            VOCABULARY.reset()
+
+    def load(self, source):
+        """Load a w2v model from disk."""
+        super().load(source)
+        self._model_changed()
+        self.unsaved = False
+
+    def save(self, dest):
+        """Save a w2v model to disk, the cached vectors stay valid."""
+        super().save(dest)
+        self.unsaved = False
 
-    def update(self, words):
-        """Update existing w2v model."""
-        self.model.build_vocab(words, update=True)
+    @staticmethod
+    def _sentences(words):
+        """Give Word2Vec the words of logs, whether they are lists of words or word id arrays."""
+        if is_tokenized(words):
+            return Sentences(words)
+        return list(words)
+
+    def update(self, words, train=True):
+        """Update existing w2v model, training it on the new logs for W2V_UPDATE_EPOCHS passes.
+
+        With train False, as during inference, only the vocabulary is extended with the new words.
+        """
+        sentences = self._sentences(words)
+        known = len(self.model.wv.vocab)
+        self.model.build_vocab(sentences, update=True)
+        # Vectors of known words are kept when no new word comes in, the cache then carries over
+        changed = len(self.model.wv.vocab) != known
+        epochs = self.config.W2V_UPDATE_EPOCHS if self.config is not None else 1
+        if train and epochs > 0 and len(sentences):
+            # Only the new logs are trained on, the rest of the model starts from its current weights
+            self.model.train(sentences, total_examples=len(sentences), epochs=epochs,
+                             compute_loss=bool(self.config is not None and self.config.W2V_COMPUTE_LOSS))
+            changed = True
+        if changed:
+            self._model_changed()
         _LOGGER.info("Models Updated")
 
     def create(self, words, vector_length, window_size):
@@ -37,16 +108,25 @@ class W2VModel(BaseModel):
             else:
                 _LOGGER.warning("Skipping key %s as it does not exist in 'words'" % col)
         """
+        from gensim.models import Word2Vec
         if not self.config:
-            self.model = Word2Vec(sentences=list(words), size=vector_length, window=window_size)
+            self.model = Word2Vec(sentences=self._sentences(words), size=vector_length, window=window_size)
         else:
-            self.model = Word2Vec(sentences=list(words),
+            self.model = Word2Vec(sentences=self._sentences(words),
                                   size=self.config.TRAIN_VECTOR_LENGTH,
-                                  window=self.config.TRAIN_WINDOW)
+                                  window=self.config.TRAIN_WINDOW,
+                                  min_count=self.config.W2V_MIN_COUNT,
+                                  iter=self.config.W2V_ITER,
+                                  compute_loss=bool(self.config.W2V_COMPUTE_LOSS),
+                                  workers=self.config.W2V_WORKERS,
+                                  seed=self.config.W2V_SEED)
+        self._model_changed()
 
     def get_vectors(self, logs):
         """Return logs as list of vectorized words"""
         vectors = []
+        if is_tokenized(logs):
+            logs = Sentences(logs)
         for x in logs:
             temp = []
             for word in x:
@@ -76,6 +156,131 @@ class W2VModel(BaseModel):
             result.append(self._log_words_to_one_vector(log_words_vector))
         return np.array(result)
 
+    def _get_word_index(self):
+        """Map every word of the vocabulary to its row in the embedding matrix."""
+        if self._word_index is None:
+            self._word_index = {word: i for i, word in enumerate(self.model.wv.index2word)}
+        return self._word_index
+
+    def _get_token_rows(self):
+        """Map every word id of the shared vocabulary to its row in the embedding matrix, -1 if unknown."""
+        self._sync_vocabulary()
+        if self._token_rows is None:
+            self._token_rows = np.zeros(0, dtype=np.int64)
+        known = len(self._token_rows)
+        size = len(VOCABULARY)
+        if known < size:
+            # Only the words added to the vocabulary since the last call are looked up
+            word_index = self._get_word_index()
+            rows = np.fromiter((word_index.get(token, -1) for token in VOCABULARY.tokens[known:size]),
+                               dtype=np.int64, count=size - known)
+            self._token_rows = np.concatenate([self._token_rows, rows])
+        return self._token_rows
+
+    def _embedding_rows(self, logs):
+        """Return the number of words of every log and the embedding rows of all their words, -1 if unknown."""
+        lengths = np.fromiter((len(log) for log in logs), dtype=np.int64, count=len(logs))
+        if is_tokenized(logs):
+            return lengths, self._get_token_rows()[np.concatenate(list(logs))]
+        word_index = self._get_word_index()
+        ids = np.fromiter((word_index.get(word, -1) for log in logs for word in log),
+                          dtype=np.int64, count=int(lengths.sum()))
+        return lengths, ids
+
+    def _encode_matrix(self, logs):
+        """Represent log messages as the mean of their word vectors.
+
+        Words are mapped to rows of the embedding matrix once and pooled with a
+        segment sum, unknown words count as zero vectors like in get_vectors.
+
+        :params logs: list of log messages, represented as list of words or word id arrays
+        :return: float32 array of shape (len(logs), vector length)
+        """
+        embeddings = self.model.wv.vectors
+        result = np.zeros((len(logs), embeddings.shape[1]), dtype=np.float32)
+        for start in range(0, len(logs), _ENCODE_BATCH_SIZE):
+            batch = logs[start:start + _ENCODE_BATCH_SIZE]
+            lengths, ids = self._embedding_rows(batch)
+            rows = np.repeat(np.arange(len(batch)), lengths)
+            known = ids >= 0
+            ids, rows = ids[known], rows[known]
+            if len(ids):
+                # rows are sorted, so the known words of every log form one contiguous segment
+                present, starts = np.unique(rows, return_index=True)
+                result[start + present] = np.add.reduceat(embeddings[ids], starts, axis=0, dtype=np.float64)
+            result[start:start + len(batch)] /= np.maximum(lengths, 1)[:, np.newaxis]
+        return result
+
+    def _encode(self, logs):
+        """Encode a batch of logs with the configured encoder."""
+        if self.config is not None and not self.config.W2V_MATRIX_ENCODER:
+            return self._vectorized_logs_to_single_vectors(self.get_vectors(logs))
+        return self._encode_matrix(logs)
+
+    def _distinct(self, logs):
+        """Group identical logs.
+
+        :return: cache key and first position of every distinct log, and the distinct row of every log
+        """
+        # Keys of tokenized logs are their word ids
+        self._sync_vocabulary()
+        rows = {}
+        keys = []
+        first = []
+        inverse = np.empty(len(logs), dtype=np.int64)
+        for i, log in enumerate(logs):
+            key = self.cache.key(log)
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = len(keys)
+                keys.append(key)
+                first.append(i)
+            inverse[i] = row
+        return keys, first, inverse
+
+    def _encode_distinct(self, logs, keys, first):
+        """Encode every distinct log once, reusing cached vectors."""
+        vectors = [self.cache.get_vector(key) for key in keys]
+        missing = [row for row, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self._encode([logs[first[row]] for row in missing])
+            for row, vector in zip(missing, encoded):
+                vectors[row] = vector
+                self.cache.put_vector(keys[row], vector)
+        return np.array(vectors), missing
+
+    def _encode_cached(self, logs):
+        """Encode logs, paying the encoder only for messages not seen since the model last changed."""
+        keys, first, inverse = self._distinct(logs)
+        vectors, missing = self._encode_distinct(logs, keys, first)
+        encoded_lines = int(np.isin(inverse, missing).sum()) if missing else 0
+        self.cache.record(len(logs) - encoded_lines, encoded_lines)
+        return vectors[inverse]
+
+    def score_messages(self, logs, model_version, score_func):
+        """Score every distinct log once and broadcast the scores to its duplicates.
+
+        :param logs: list of log messages, represented as list of words
+        :param model_version: version of the scoring model, cached scores of other versions are ignored
+        :param score_func: maps a 2-D array of log vectors to a sequence of scores
+        :return: list with one score per log
+        """
+        if self.cache is None:
+            return list(score_func(self._encode(logs)))
+        keys, first, inverse = self._distinct(logs)
+        scores = [self.cache.get_score(key, model_version) for key in keys]
+        missing = [row for row, score in enumerate(scores) if score is None]
+        if missing:
+            missing_logs = [logs[first[row]] for row in missing]
+            missing_keys = [keys[row] for row in missing]
+            vectors, _ = self._encode_distinct(missing_logs, missing_keys, list(range(len(missing))))
+            for row, score in zip(missing, score_func(vectors)):
+                scores[row] = score
+                self.cache.put_score(keys[row], model_version, score)
+        encoded_lines = int(np.isin(inverse, missing).sum()) if missing else 0
+        self.cache.record(len(logs) - encoded_lines, encoded_lines)
+        return [scores[row] for row in inverse]
+
     def one_vector(self, new_D: object) -> object:
         """Create a single vector from model."""
         """
@@ -97,7 +302,10 @@ class W2VModel(BaseModel):
 
         return np.array(new_data, ndmin=2)
         """
-        vectors = self.get_vectors(new_D)
+        if self.cache is not None:
+            vectors = self._encode_cached(new_D)
+        else:
+            vectors = self._encode(new_D)
         if len(new_D) == 1:
-            return self._log_words_to_one_vector(vectors[0])
-        return self._vectorized_logs_to_single_vectors(vectors)
+            return list(map(float, vectors[0]))
+        return vectors
@@ -0,0 +1,135 @@
+"""Worker pool shared by the models of a process across training and inference loops."""
+import atexit
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8 has no shared memory, arrays are then pickled to the workers
+    shared_memory = None
+
+_LOGGER = logging.getLogger(__name__)
+
+# Shared memory blocks attached by a worker process, by block name
+_ATTACHED = OrderedDict()
+_MAX_ATTACHED = 8
+
+
+class SharedArray:
+    """Picklable handle of a read-only numpy array placed in shared memory."""
+
+    def __init__(self, array):
+        """Copy the array into a new shared memory block."""
+        self.shape = array.shape
+        self.dtype = array.dtype.str
+        self.name = None
+        self._block = None
+        self._array = array
+        if shared_memory is not None:
+            self._block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self.name = self._block.name
+            self._array = np.ndarray(array.shape, dtype=array.dtype, buffer=self._block.buf)
+            self._array[...] = array
+
+    def __getstate__(self):
+        """Only send the block name to workers, unless there is no shared memory."""
+        return {"shape": self.shape, "dtype": self.dtype, "name": self.name,
+                "_block": None, "_array": self._array if self.name is None else None}
+
+    def get(self):
+        """Return the array, attaching to the shared memory block in worker processes."""
+        if self._array is None:
+            block = _ATTACHED.get(self.name)
+            if block is None:
+                block = _ATTACHED[self.name] = shared_memory.SharedMemory(name=self.name)
+                if len(_ATTACHED) > _MAX_ATTACHED:
+                    _, stale = _ATTACHED.popitem(last=False)
+                    try:
+                        stale.close()
+                    except BufferError:
+                        pass
+            self._array = np.ndarray(self.shape, dtype=self.dtype, buffer=block.buf)
+        return self._array
+
+    def release(self):
+        """Free the shared memory block."""
+        self._array = None
+        if self._block is not None:
+            self._block.close()
+            self._block.unlink()
+            self._block = None
+
+
+class WorkerPool:
+    """Long-lived pool of worker processes sized from PARALLELISM and reused between loops."""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, processes):
+        """Initialize pool, worker processes are started on first use."""
+        self.processes = processes
+        self._pool = None
+        self._shared = {}
+
+    @classmethod
+    def get(cls, parallelism):
+        """Return the process-wide pool, recreated only when parallelism changes."""
+        with cls._lock:
+            if cls._instance is None or cls._instance.processes != parallelism:
+                if cls._instance is not None:
+                    cls._instance.shutdown()
+                cls._instance = cls(parallelism)
+            return cls._instance
+
+    @property
+    def parallel(self):
+        """Whether work is spread over worker processes, daemonic processes cannot have children."""
+        return self.processes > 1 and not multiprocessing.current_process().daemon
+
+    def map(self, func, iterable):
+        """Apply func to every item, in the worker processes when running in parallel."""
+        if not self.parallel:
+            return list(map(func, iterable))
+        if self._pool is None:
+            _LOGGER.info("Starting worker pool with %d processes", self.processes)
+            # Storage threads may be running by now, forking them could leave their locks held in the workers
+            self._pool = multiprocessing.get_context("spawn").Pool(self.processes)
+        return self._pool.map(func, iterable)
+
+    def share(self, key, version, array):
+        """Place a read-only array in shared memory, once per version of it.
+
+        :param key: identifies the owner of the array, e.g. a model
+        :param version: the array is copied again only when the version changes
+        :param array: numpy array to share with workers
+        :return: SharedArray handle that can be passed to the workers instead of the array
+        """
+        current = self._shared.get(key)
+        if current is not None and current[0] == version:
+            return current[1]
+        if current is not None:
+            current[1].release()
+        shared = SharedArray(np.ascontiguousarray(array))
+        self._shared[key] = (version, shared)
+        return shared
+
+    def shutdown(self):
+        """Stop worker processes and free shared memory."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        for _, shared in self._shared.values():
+            shared.release()
+        self._shared = {}
+
+
+@atexit.register
+def _shutdown_worker_pool():
+    """Release workers and shared memory when the process exits."""
+    if WorkerPool._instance is not None:
+        WorkerPool._instance.shutdown()
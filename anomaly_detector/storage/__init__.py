@@ -1,4 +1,8 @@
-"""Storage package for utilizing source and sinks for ETL pipeline."""
+"""Storage package for utilizing source and sinks for ETL pipeline.
+
+Client libraries (elasticsearch, pymongo, mysql, kafka) are imported by the methods that use them,
+so that only the client libraries of the configured backends get loaded.
+"""
 from anomaly_detector.storage.es_storage import ESStorage
 from anomaly_detector.storage.local_storage import LocalStorageDataSource, LocalStorageDataSink
 from anomaly_detector.storage.local_directory_storage import LocalDirStorage
@@ -0,0 +1,48 @@
+"""Background Writer - Hand items over to a background thread that writes them in order."""
+import queue
+import threading
+
+
+class BackgroundWriter:
+    """Write items in a background thread, through a queue of at most size pending items.
+
+    Submitting blocks while the queue is full, so a slow backend holds up the producer rather than
+    piling up results in memory. Once a write fails, pending items are dropped and the error is raised
+    in the thread that submits or flushes next, items following a failed one are never written.
+    """
+
+    def __init__(self, write, size=1, name="writer"):
+        """Start the thread calling write with every submitted item."""
+        self._write = write
+        self._items = queue.Queue(maxsize=max(1, size))
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._items.get()
+            try:
+                if self._error is None:
+                    self._write(item)
+            except BaseException as ex:
+                self._error = ex
+            finally:
+                self._items.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            # Let the thread drop the items queued after the failed one
+            self._items.join()
+            error, self._error = self._error, None
+            raise error
+
+    def submit(self, item):
+        """Queue item for writing, waiting for room in the queue."""
+        self._raise_error()
+        self._items.put(item)
+
+    def flush(self):
+        """Wait until all submitted items are written."""
+        self._items.join()
+        self._raise_error()
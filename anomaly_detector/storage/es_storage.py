@@ -3,12 +3,12 @@ from anomaly_detector.storage.storage_attribute import ESStorageAttribute
 import datetime
 import pandas
 from pandas.io.json import json_normalize
-from elasticsearch5 import Elasticsearch, helpers
 import json
 import os
 import urllib3
 from anomaly_detector.storage.storage_sink import StorageSink
 from anomaly_detector.storage.storage_source import StorageSource
+from anomaly_detector.storage.prefetch import prefetch
 import logging
 from anomaly_detector.storage.storage import DataCleaner
 
@@ -27,6 +27,7 @@ class ESStorage:
         self._connect()
 
     def _connect(self):
+        from elasticsearch5 import Elasticsearch
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         if len(self.config.ES_CERT_DIR) and os.path.isdir(self.config.ES_CERT_DIR):
             _LOGGER.warning(
@@ -63,38 +64,89 @@ class ESStorage:
         index = prefix + date
         return index
 
+    def _prep_index_names(self, prefix, since):
+        # comma separated dated indices of every day from since until today
+        today = datetime.datetime.now().date()
+        day = min(since.date(), today)
+        indices = [prefix + day.strftime("%Y.%m.%d")]
+        while day < today:
+            day += datetime.timedelta(days=1)
+            indices.append(prefix + day.strftime("%Y.%m.%d"))
+        return ",".join(indices)
+
 
 class ElasticSearchDataSink(StorageSink, DataCleaner, ESStorage):
-    """Local storage data sink implementation."""
+    """ElasticSearch data sink writing results through bulk requests of at most ES_BULK_MAX_BYTES.
+
+    ES_SINK_MODE selects what is written: "document" indexes every result, "anomaly" only the anomalies
+    and "update" adds the prediction fields to the source documents through partial updates.
+    """
 
     NAME = "es.sink"
+    # Metadata of the source documents, it cannot be stored inside a document
+    _METADATA_FIELDS = ("_id", "_index", "_type")
+    # Fields of the predictions written into the source documents in update mode
+    _UPDATE_FIELDS = ("predict_id", "anomaly", "anomaly_score", "template_id")
 
     def __init__(self, configuration):
         """Initialize local storage backend."""
         self.config = configuration
         self._connect()
 
+    def _actions(self, data, index_out):
+        """Generate the bulk actions of the results to write."""
+        mode = self.config.ES_SINK_MODE
+        for entry in data:
+            if mode == "anomaly" and not entry.get("anomaly"):
+                continue
+            if mode == "update" and "_id" in entry:
+                yield {"_op_type": "update", "_index": entry["_index"], "_type": entry.get("_type", "log"),
+                       "_id": entry["_id"], "doc": {k: entry[k] for k in self._UPDATE_FIELDS if k in entry}}
+            else:
+                # Results not read from ElasticSearch have no document to update, they are indexed
+                yield {"_index": index_out, "_type": "log",
+                       "_source": {k: v for k, v in entry.items() if k not in self._METADATA_FIELDS}}
+
     def store_results(self, data):
-        """Store results back to ES."""
+        """Store results back to ES, chunks are sent by ES_BULK_THREADS threads."""
+        from elasticsearch5 import helpers
         index_out = self._prep_index_name(self.config.ES_TARGET_INDEX)
-
-        actions = [{"_index": index_out, "_type": "log", "_source": data[i]} for i in range(len(data))]
-
-        helpers.bulk(self.es, actions, chunk_size=int(len(data) / 4) + 1)
+        actions = self._actions(data, index_out)
+        if self.config.ES_BULK_THREADS > 1:
+            results = helpers.parallel_bulk(self.es, actions,
+                                            thread_count=self.config.ES_BULK_THREADS,
+                                            chunk_size=self.config.ES_BULK_CHUNK_SIZE,
+                                            max_chunk_bytes=self.config.ES_BULK_MAX_BYTES)
+        else:
+            results = helpers.streaming_bulk(self.es, actions,
+                                             chunk_size=self.config.ES_BULK_CHUNK_SIZE,
+                                             max_chunk_bytes=self.config.ES_BULK_MAX_BYTES)
+        # Bulk helpers are lazy, failed actions raise a BulkIndexError while iterating
+        stored = sum(1 for ok, _ in results if ok)
+        _LOGGER.info("%d of %d results written to %s", stored, len(data), index_out)
 
 
 class ElasticSearchDataSource(StorageSource, DataCleaner, ESStorage):
     """Local storage Data source implementation."""
 
     NAME = "es.source"
+    METADATA_FIELDS = ElasticSearchDataSink._METADATA_FIELDS
 
     def __init__(self, configuration):
         """Initialize local storage backend."""
         self.config = configuration
         self._connect()
 
-    def retrieve(self, storage_attribute: ESStorageAttribute):
-        """Retrieve data from ES."""
+    @staticmethod
+    def _record(hit):
+        """Turn a hit into a log record, keeping the metadata needed to update its document."""
+        record = dict(hit["_source"], _id=hit["_id"], _index=hit["_index"])
+        if "_type" in hit:
+            record["_type"] = hit["_type"]
+        return record
+
+    def _search_pages(self, storage_attribute: ESStorageAttribute):
+        """Yield pages of hits, scrolling through the results so they are not limited by max_result_window."""
         index_in = self._prep_index_name(self.config.ES_INPUT_INDEX)
 
         query = {
@@ -116,23 +168,94 @@ class ElasticSearchDataSource(StorageSource, DataCleaner, ESStorage):
             self.config.ES_ENDPOINT,
         )
 
-        query["size"] = storage_attribute.number_of_entries
+        remaining = storage_attribute.number_of_entries
+        query["size"] = min(self.config.ES_PAGE_SIZE, remaining)
         query["query"]["bool"]["must"][1]["range"]["@timestamp"]["gte"] = "now-%ds" % storage_attribute.time_range
         query["query"]["bool"]["must"][0]["query_string"]["query"] = self.config.ES_QUERY
+        fields = [field.strip() for field in self.config.ES_SOURCE_FIELDS.split(",") if field.strip()]
+        if fields:
+            query["_source"] = fields
 
-        es_data = self.es.search(index_in, body=json.dumps(query))
-        if (self.config.ES_VERSION < 7 and es_data["hits"]["total"] == 0) or \
-                (self.config.ES_VERSION >= 7 and es_data["hits"]["total"]["value"] == 0):
-            return pandas.DataFrame(), es_data
+        if storage_attribute.incremental:
+            yield from self._search_after_pages(query, remaining, storage_attribute.time_range)
+        else:
+            yield from self._scroll_pages(index_in, query, remaining)
 
-        # only use _source sub-dict
-        es_data = [x["_source"] for x in es_data["hits"]["hits"]]
-        self.format_log(self.config, es_data)
+    def _scroll_pages(self, index_in, query, remaining):
+        """Yield pages of the newest hits through the scroll api."""
+        page = self.es.search(index_in, body=json.dumps(query), scroll=self.config.ES_SCROLL_TIMEOUT)
+        scroll_id = page.get("_scroll_id")
+        try:
+            while remaining > 0:
+                hits = page["hits"]["hits"][:remaining]
+                if not hits:
+                    break
+                yield hits
+                remaining -= len(hits)
+                if remaining <= 0 or len(hits) < query["size"]:
+                    break
+                page = self.es.scroll(scroll_id=scroll_id, scroll=self.config.ES_SCROLL_TIMEOUT)
+                scroll_id = page.get("_scroll_id", scroll_id)
+        finally:
+            if scroll_id is not None:
+                try:
+                    self.es.clear_scroll(scroll_id=scroll_id)
+                except Exception as ex:
+                    _LOGGER.debug("Failed to clear scroll: %s", ex)
 
-        es_data_normalized = pandas.DataFrame(json_normalize(es_data)["message"])
+    def _search_after_pages(self, query, remaining, time_range):
+        """Yield pages of the hits following the watermark, oldest first, through search_after.
 
-        _LOGGER.info("%d logs loaded in from last %d seconds", len(es_data_normalized), storage_attribute.time_range)
+        Every dated index from the day of the watermark until today is searched, so logs left unread in
+        the index of a previous day are read too.
+        """
+        # _id is only sortable from ES 7, older versions sort on _uid (type#id)
+        tie_breaker = "_uid" if self.config.ES_VERSION < 7 else "_id"
+        query["sort"] = [{"@timestamp": {"order": "asc"}}, {tie_breaker: {"order": "asc"}}]
+        position = self._get_watermark("es-%s" % self.config.ES_INPUT_INDEX).position
+        if position is None:
+            since = datetime.datetime.now() - datetime.timedelta(seconds=time_range)
+        else:
+            # Resume after the last stored log however old it is, instead of a sliding time range
+            query["query"]["bool"]["must"][1]["range"]["@timestamp"] = {"gte": position[0], "format": "epoch_millis"}
+            query["search_after"] = list(position)
+            # Timestamps are UTC, the day before covers indices dated in another time zone
+            since = datetime.datetime.fromtimestamp(position[0] / 1000.0) - datetime.timedelta(days=1)
+        index_in = self._prep_index_names(self.config.ES_INPUT_INDEX, since)
+        while remaining > 0:
+            query["size"] = min(self.config.ES_PAGE_SIZE, remaining)
+            # Days without logs have no index
+            hits = self.es.search(index_in, body=json.dumps(query), ignore_unavailable=True)["hits"]["hits"]
+            if not hits:
+                break
+            yield hits
+            remaining -= len(hits)
+            if len(hits) < query["size"]:
+                break
+            query["search_after"] = hits[-1]["sort"]
 
-        self._preprocess(es_data_normalized)
+    def iter_batches(self, storage_attribute: ESStorageAttribute):
+        """Yield logs page by page, the next page is fetched while the current one is processed."""
+        for hits in prefetch(self._search_pages(storage_attribute), self.config.ES_PREFETCH_PAGES):
+            es_data = [self._record(hit) for hit in hits]
+            self.format_log(self.config, es_data)
+            es_data_normalized = pandas.DataFrame(json_normalize(es_data)["message"])
+            self._preprocess(es_data_normalized)
+            if storage_attribute.incremental:
+                self._get_watermark("es-%s" % self.config.ES_INPUT_INDEX).advance(*hits[-1]["sort"])
+            yield es_data_normalized, es_data
+
+    def retrieve(self, storage_attribute: ESStorageAttribute):
+        """Retrieve data from ES."""
+        frames = []
+        es_data = []
+        for es_data_normalized, page in self.iter_batches(storage_attribute):
+            frames.append(es_data_normalized)
+            es_data.extend(page)
+        if not frames:
+            return pandas.DataFrame(), es_data
+
+        es_data_normalized = pandas.concat(frames, ignore_index=True)
+        _LOGGER.info("%d logs loaded in from last %d seconds", len(es_data_normalized), storage_attribute.time_range)
 
         return es_data_normalized, es_data  # bad solution, this is how Entry objects could come in.
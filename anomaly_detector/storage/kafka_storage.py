@@ -1,34 +1,166 @@
 """Kafka Storage interface."""
 import json
-from kafka import KafkaProducer
+import logging
+import time
+import pandas
+from prometheus_client import Counter, Histogram
+from anomaly_detector.storage.storage import DataCleaner
+from anomaly_detector.storage.storage_attribute import DefaultStorageAttribute
 from anomaly_detector.storage.storage_sink import StorageSink
+from anomaly_detector.storage.storage_source import StorageSource
+
+_LOGGER = logging.getLogger(__name__)
+
+KAFKA_DELIVERY_LATENCY = Histogram("aiops_lad_kafka_delivery_latency_seconds",
+                                   "time from sending results to kafka to their acknowledgement")
+KAFKA_DELIVERY_ERRORS = Counter("aiops_lad_kafka_delivery_errors", "count of results kafka failed to store")
 
 
 class KafkaSink(StorageSink):
-    """Kafka storage backend."""
+    """Kafka storage backend.
+
+    KF_SINK_MODE selects what is sent: "batch" sends the results of a loop as one message,
+    "record" one message per scored log and "anomaly" one message per anomaly. Records are keyed
+    by hostname, so the logs of a host keep their order on one partition.
+    """
 
     NAME = "kafka.sink"
 
     def __init__(self, config):
         """Setup of kafka producer which will send messages to bootstrap server topic."""
+        self.config = config
         self.bootstrap = config.KF_BOOTSTRAP_SERVER
         self.topic = config.KF_TOPIC
         self.cacert = config.KF_CACERT
         self.security_protocol = config.KF_SECURITY_PROTOCOL
+        if config.KF_SINK_MODE not in ("batch", "record", "anomaly"):
+            raise ValueError("Unsupported kafka sink mode {}".format(config.KF_SINK_MODE))
         self.create_client()
 
     def create_client(self):
         """Initialize producer."""
+        from kafka import KafkaProducer
         self.producer = KafkaProducer(bootstrap_servers=self.bootstrap,
                                       api_version_auto_timeout_ms=30000,
                                       security_protocol=self.security_protocol,
-                                      ssl_cafile=self.cacert)
+                                      ssl_cafile=self.cacert,
+                                      linger_ms=self.config.KF_LINGER_MS,
+                                      batch_size=self.config.KF_PRODUCER_BATCH_SIZE,
+                                      compression_type=self.config.KF_COMPRESSION_TYPE or None)
+
+    def _send(self, value, key=None):
+        """Send a message, recording its delivery latency."""
+        sent = time.time()
+        future = self.producer.send(self.topic, value=json.dumps(value, default=str).encode('utf-8'), key=key)
+        future.add_callback(lambda _: KAFKA_DELIVERY_LATENCY.observe(time.time() - sent))
+        future.add_errback(self._delivery_failed)
+
+    @staticmethod
+    def _delivery_failed(error):
+        KAFKA_DELIVERY_ERRORS.inc()
+        _LOGGER.error("Failed to deliver results to kafka: %s", error)
 
     def store_results(self, data):
         """Save data to Kafka."""
-        dataset = json.dumps(data).encode('utf-8')
-        self.producer.send(self.topic, dataset)
+        if self.config.KF_SINK_MODE == "batch":
+            self._send(data)
+        else:
+            for record in data:
+                if self.config.KF_SINK_MODE == "anomaly" and not record.get("anomaly"):
+                    continue
+                hostname = record.get(self.config.HOSTNAME_INDEX) if self.config.HOSTNAME_INDEX else None
+                self._send(record, key=None if hostname is None else str(hostname).encode('utf-8'))
+        # Delivered before the source moves past these logs, one flush per loop keeps the producer batching
+        self.flush()
 
     def flush(self):
         """Important, especially if message size is small."""
         self.producer.flush()
+
+
+class KafkaDataSource(StorageSource, DataCleaner):
+    """Kafka data source consuming log lines from a topic in micro-batches.
+
+    Messages are json objects with a message field, or plain log lines. Offsets are only committed
+    once the results of a micro-batch are stored, so a restarted consumer scores the logs of a failed
+    batch again rather than losing them.
+    """
+
+    NAME = "kafka.source"
+
+    def __init__(self, config):
+        """Subscribe to the input topic."""
+        self.config = config
+        self._pending = {}
+        self.create_client()
+
+    def create_client(self):
+        """Initialize consumer."""
+        from kafka import KafkaConsumer
+        self.consumer = KafkaConsumer(self.config.KF_INPUT_TOPIC,
+                                      bootstrap_servers=self.config.KF_BOOTSTRAP_SERVER,
+                                      group_id=self.config.KF_GROUP_ID,
+                                      enable_auto_commit=False,
+                                      auto_offset_reset=self.config.KF_AUTO_OFFSET_RESET,
+                                      api_version_auto_timeout_ms=self.config.KF_AUTO_TIMEOUT,
+                                      security_protocol=self.config.KF_SECURITY_PROTOCOL,
+                                      ssl_cafile=self.config.KF_CACERT)
+
+    def _poll(self, max_records):
+        """Collect up to max_records messages, for at most KF_BATCH_TIMEOUT seconds."""
+        from kafka.structs import OffsetAndMetadata
+        messages = []
+        deadline = time.monotonic() + self.config.KF_BATCH_TIMEOUT
+        while len(messages) < max_records:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            polled = self.consumer.poll(timeout_ms=int(timeout * 1000), max_records=max_records - len(messages))
+            for partition, records in polled.items():
+                messages.extend(records)
+                self._pending[partition] = OffsetAndMetadata(records[-1].offset + 1, None)
+        return messages
+
+    def _decode(self, value):
+        """Turn a message into a log record."""
+        line = value.decode("utf-8", errors="replace") if isinstance(value, bytes) else str(value)
+        try:
+            log = json.loads(line)
+        except ValueError:
+            log = None
+        if not isinstance(log, dict):
+            log = {"message": line.rstrip("\n")}
+        return log
+
+    def iter_batches(self, storage_attribute: DefaultStorageAttribute):
+        """Yield the next micro-batch, of at most KF_BATCH_SIZE logs."""
+        max_records = min(self.config.KF_BATCH_SIZE, getattr(storage_attribute, "number_of_entries",
+                                                                 self.config.KF_BATCH_SIZE))
+        messages = self._poll(max_records)
+        if not messages:
+            return
+        logs = [self._decode(message.value) for message in messages]
+        self.format_log(self.config, logs)
+        field = self.config.MESSAGE_INDEX or "message"
+        data = pandas.DataFrame({field: [str(log.get(field, "")) for log in logs]})
+        self._preprocess(data)
+        _LOGGER.info("%d logs consumed from %s", len(logs), self.config.KF_INPUT_TOPIC)
+        yield data, logs
+
+    def retrieve(self, storage_attribute: DefaultStorageAttribute):
+        """Retrieve the next micro-batch."""
+        for data, logs in self.iter_batches(storage_attribute):
+            return data, logs
+        return pandas.DataFrame(), []
+
+    def checkpoint(self):
+        """Return the offsets of the logs consumed so far."""
+        return dict(self._pending)
+
+    def commit(self, checkpoint=None):
+        """Commit the offsets of the consumed logs, or of checkpoint, their results are stored."""
+        offsets = self._pending if checkpoint is None else checkpoint
+        if offsets:
+            self.consumer.commit(offsets=offsets)
+            if offsets == self._pending:
+                self._pending = {}
@@ -0,0 +1,148 @@
+"""Line Reader - Stream logs out of json, json lines and common log format files, plain or compressed."""
+import gzip
+import io
+import json
+import multiprocessing
+from itertools import islice
+from pathlib import Path
+from anomaly_detector.exception import FileFormatNotSupported
+
+JSON_SUFFIXES = (".json", ".jsonl", ".ndjson")
+COMMON_LOG_SUFFIXES = (".log",)
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+# Characters read from a json file at a time
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = " \t\r\n"
+
+
+def log_format(path):
+    """Return "json" or "common_log" depending on the suffix of path, ignoring compression, or None."""
+    suffixes = Path(path).suffixes
+    if suffixes and suffixes[-1] in COMPRESSED_SUFFIXES:
+        suffixes = suffixes[:-1]
+    if suffixes and suffixes[-1] in JSON_SUFFIXES:
+        return "json"
+    if suffixes and suffixes[-1] in COMMON_LOG_SUFFIXES:
+        return "common_log"
+    return None
+
+
+def open_text(path):
+    """Open a possibly gzip or zstandard compressed file as buffered text."""
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise FileFormatNotSupported("Reading {} requires the zstandard package.".format(path))
+        raw = open(path, "rb")
+        try:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        except BaseException:
+            raw.close()
+            raise
+        return io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def iter_json(fp, chunk_size=CHUNK_SIZE):
+    """Yield the objects of a json array, of json lines or of concatenated json documents.
+
+    The file is decoded one chunk at a time, so memory does not grow with the file size.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    while True:
+        # Skip the separators between objects: whitespace, commas and the brackets of an array
+        while position < len(buffer) and (buffer[position] in _WHITESPACE or buffer[position] in ",[]"):
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = fp.read(chunk_size), 0
+            eof = not buffer
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+            # A number ending the chunk may go on in the next one
+            complete = eof or end < len(buffer)
+        except ValueError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            # Object cut at the end of the chunk, read on
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        position = end
+        yield value
+
+
+def parse_common_log(line):
+    """Parse common log format, columns [0]= timestamp [1]=severity [2]=msg."""
+    return {"message": " ".join(line.split(" ")[2:]).rstrip("\n")}
+
+
+def iter_logs(path, default_format=None):
+    """Yield the logs of a file as dicts with at least a message.
+
+    :param path: json, json lines or common log file, optionally compressed with gzip or zstandard
+    :param default_format: format of files whose suffix is not recognized, they are rejected when None
+    """
+    file_format = log_format(path) or default_format
+    if file_format is None:
+        raise FileFormatNotSupported(
+            "File format is not supported json and common log format (which ends with '.log') .")
+    with open_text(path) as fp:
+        if file_format == "json":
+            for log in iter_json(fp):
+                yield log if isinstance(log, dict) else {"message": str(log)}
+        else:
+            for line in fp:
+                yield parse_common_log(line)
+
+
+def _read_file(path):
+    """Parse a whole file, in a worker process."""
+    return list(iter_logs(path))
+
+
+def iter_files(paths, parallelism=1):
+    """Yield the logs of several files in order.
+
+    With a parallelism above one, files are parsed by a pool of processes, keeping at most two
+    parsed files per process ahead of the consumer. Otherwise every file is streamed.
+    """
+    paths = list(paths)
+    # Daemonic processes cannot have children
+    if parallelism <= 1 or len(paths) <= 1 or multiprocessing.current_process().daemon:
+        for path in paths:
+            yield from iter_logs(path)
+        return
+    # Files may be read from a prefetch thread, forking it could leave its locks held in the workers
+    with multiprocessing.get_context("spawn").Pool(parallelism) as pool:
+        pending = [pool.apply_async(_read_file, (path,)) for path in paths[:2 * parallelism]]
+        for path in paths[2 * parallelism:] + [None] * len(pending):
+            logs = pending.pop(0).get()
+            if path is not None:
+                pending.append(pool.apply_async(_read_file, (path,)))
+            yield from logs
+
+
+def batched(logs, batch_size):
+    """Group logs into lists of batch_size."""
+    logs = iter(logs)
+    while True:
+        batch = list(islice(logs, batch_size))
+        if not batch:
+            return
+        yield batch
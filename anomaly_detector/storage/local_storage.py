@@ -1,6 +1,10 @@
 """Local Storage."""
+from itertools import chain
+import os
+import pandas
+from pandas.io.json import json_normalize
+from anomaly_detector.storage.line_reader import batched, iter_logs
 from anomaly_detector.storage.storage_attribute import DefaultStorageAttribute
-from pandas import json_normalize
 from anomaly_detector.storage.storage_sink import StorageSink
 from anomaly_detector.storage.storage_source import StorageSource
 from anomaly_detector.storage.storage import DataCleaner
@@ -11,23 +15,48 @@ _LOGGER = logging.getLogger(__name__)
 
 
 class LocalStorageDataSink(StorageSink, DataCleaner):
-    """Local storage data sink implementation."""
+    """Local storage data sink implementation.
+
+    The first results of a loop are written with LS_OUTPUT_RWA_MODE, the results of its following
+    batches are added to the same json array, until flush ends the loop.
+    """
 
     NAME = "local.sink"
 
     def __init__(self, configuration):
         """Initialize local storage backend."""
         self.config = configuration
+        # Number of results in the json array of the current loop, None before its first batch
+        self._stored = None
 
     def store_results(self, data):
         """Store results."""
         if len(self.config.LS_OUTPUT_PATH) > 0:
+            if self._stored is not None and isinstance(data, list):
+                self._extend(data)
+                return
             with open(self.config.LS_OUTPUT_PATH, self.config.LS_OUTPUT_RWA_MODE) as fp:
-                json.dump(data, fp)
+                json.dump(data, fp, default=str)
+            self._stored = len(data) if isinstance(data, list) else None
         else:
             for item in data:
                 _LOGGER.info("Anomaly: %d, Anmaly score: %f" % (item["anomaly"], item["anomaly_score"]))
 
+    def _extend(self, data):
+        """Add results to the json array written last, in place of its closing bracket."""
+        if not data:
+            return
+        # json.dump escapes non ascii characters, the last byte of the file is the closing bracket
+        items = json.dumps(data, default=str)[1:]
+        with open(self.config.LS_OUTPUT_PATH, "rb+") as fp:
+            fp.seek(-1, os.SEEK_END)
+            fp.write(((", " if self._stored else "") + items).encode("ascii"))
+        self._stored += len(data)
+
+    def flush(self):
+        """End the loop, its next results start a new json array."""
+        self._stored = None
+
 
 class LocalStorageDataSource(StorageSource, DataCleaner):
     """Local storage Data source implementation."""
@@ -38,23 +67,32 @@ class LocalStorageDataSource(StorageSource, DataCleaner):
         """Initialize local storage backend."""
         self.config = configuration
 
+    def iter_batches(self, storage_attribute: DefaultStorageAttribute):
+        """Stream logs from the input file in batches of LS_BATCH_SIZE."""
+        _LOGGER.info("Reading from %s" % self.config.LS_INPUT_PATH)
+        # Anything but json is read as common log format
+        yield from self._batches(iter_logs(self.config.LS_INPUT_PATH, default_format="common_log"),
+                                 storage_attribute)
+
     def retrieve(self, storage_attribute: DefaultStorageAttribute):
         """Retrieve data from local storage."""
+        frames = []
         data = []
-        _LOGGER.info("Reading from %s" % self.config.LS_INPUT_PATH)
-
-        with open(self.config.LS_INPUT_PATH, "r") as fp:
-            if self.config.LS_INPUT_PATH.endswith("json"):
-                data = json.load(fp)
-            else:
-                # Here we are loading in data from common log format Columns [0]= timestamp [1]=severity [2]=msg
-                for line in fp:
-                    message_field = " ".join(line.split(" ")[2:])
-                    message_field = message_field.rstrip("\n")
-                    data.append({"message": message_field})
-            if storage_attribute.false_data is not None:
-                data.extend(storage_attribute.false_data)
-        data_set = json_normalize(data)
+        for data_set, batch in self.iter_batches(storage_attribute):
+            frames.append(data_set)
+            data.extend(batch)
+        if not frames:
+            return pandas.DataFrame(), data
+        data_set = pandas.concat(frames, ignore_index=True)
         _LOGGER.info("%d logs loaded", len(data_set))
-        self._preprocess(data_set)
         return data_set, data
+
+    def _batches(self, logs, storage_attribute: DefaultStorageAttribute):
+        """Group logs, followed by the false positives, into batches with their preprocessed messages."""
+        if storage_attribute.false_data is not None:
+            logs = chain(logs, storage_attribute.false_data)
+        for batch in batched(logs, self.config.LS_BATCH_SIZE):
+            # Whole records, embedded fields become dotted columns a MESSAGE_INDEX path can name
+            data_set = json_normalize(batch)
+            self._preprocess(data_set)
+            yield data_set, batch
@@ -1,22 +1,29 @@
 """MongoDB storage interface"""
 import datetime
+import json
+import threading
+from itertools import islice
 import pandas
-from pymongo import MongoClient
 import ssl
 import os
-from dateutil.parser import parse
 import logging
-from bson.json_util import dumps
-from bson.objectid import ObjectId
-from pandas.io.json import json_normalize
-import json
-from anomaly_detector.storage.storage import DataCleaner
+from anomaly_detector.storage.storage import DataCleaner, field_value
 from anomaly_detector.storage.storage_attribute import MGStorageAttribute
 from anomaly_detector.storage.storage_source import StorageSource
 from anomaly_detector.storage.storage_sink import StorageSink
 
 _LOGGER = logging.getLogger(__name__)
 
+# MongoClient is thread safe and pools its connections, one client per server is shared by the process
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _object_id(value):
+    """Return the ObjectId of a record read from MongoDB, or of its extended json form."""
+    from bson.objectid import ObjectId
+    return value if isinstance(value, ObjectId) else ObjectId(value['$oid'])
+
 
 class MongoDBStorage:
     """MongoDB storage backend."""
@@ -42,7 +49,17 @@ class MongoDBStorage:
         self._connect()
 
     def _connect(self):
-        if len(self.config.MG_CA_CERT) and os.path.isfile(self.config.MG_CA_CERT):
+        """Use the process wide client of the server, sources and sinks share its connection pool."""
+        use_tls = bool(len(self.config.MG_CA_CERT) and os.path.isfile(self.config.MG_CA_CERT))
+        key = (self.MG_URI, use_tls, self.config.MG_CA_CERT, self.config.MG_VERIFY_CERT)
+        with _CLIENTS_LOCK:
+            if key not in _CLIENTS:
+                _CLIENTS[key] = self._create_client(use_tls)
+            self.mg = _CLIENTS[key]
+
+    def _create_client(self, use_tls):
+        from pymongo import MongoClient
+        if use_tls:
             _LOGGER.warning(
                 "Connection to MongoDB at %s with SSL/TLS using CA certificate in %s (verify=%s)."
                 % (
@@ -51,19 +68,18 @@ class MongoDBStorage:
                     self.config.MG_VERIFY_CERT
                 )
             )
-            self.mg = MongoClient(
+            return MongoClient(
                 self.MG_URI,
                 tls=True,
                 tlsCAFile=self.config.MG_CA_CERT,
                 tlsAllowInvalidCertificates=self.config.MG_VERIFY_CERT,
-                maxPoolSize=1
-            )
-        else:
-            _LOGGER.warning("Conecting to MongoDB without SSL/TLS encryption.")
-            self.mg = MongoClient(
-                self.MG_URI,
-                maxPoolSize=1
+                maxPoolSize=self.config.MG_MAX_POOL_SIZE
             )
+        _LOGGER.warning("Conecting to MongoDB without SSL/TLS encryption.")
+        return MongoClient(
+            self.MG_URI,
+            maxPoolSize=self.config.MG_MAX_POOL_SIZE
+        )
 
 
 class MongoDBDataStorageSource(StorageSource, DataCleaner, MongoDBStorage):
@@ -77,54 +93,95 @@ class MongoDBDataStorageSource(StorageSource, DataCleaner, MongoDBStorage):
         MongoDBStorage.__init__(self, config)
 
 
-    def retrieve(self, storage_attribute: MGStorageAttribute):
-        """Retrieve data from MongoDB."""
-
+    def _find(self, storage_attribute: MGStorageAttribute):
+        """Return a cursor over the logs to retrieve, projected on the fields used by the pipeline."""
         mg_db = self.mg[self.config.MG_DB]
         now = datetime.datetime.now()
 
         mg_data = mg_db[self.config.MG_COLLECTION]
 
-        if self.config.LOGSOURCE_HOSTNAME != 'localhost':
+        watermark = self._get_watermark("mg-%s" % self.config.MG_COLLECTION)
+        if storage_attribute.incremental and watermark.position is not None:
+            # Resume after the last stored log, (timestamp, _id) order makes the position unique
+            last_time, last_id = watermark.position
             query = {
-                self.config.DATETIME_INDEX:  {
-                    '$gte': now - datetime.timedelta(seconds=storage_attribute.time_range),
-                    #'$gte': now - datetime.timedelta(days=15),
-                    '$lt': now
-                },
-                self.config.HOSTNAME_INDEX: self.config.LOGSOURCE_HOSTNAME
+                '$or': [
+                    {self.config.DATETIME_INDEX: {'$gt': last_time}},
+                    {self.config.DATETIME_INDEX: last_time, '_id': {'$gt': _object_id({'$oid': last_id})}}
+                ]
             }
         else:
             query = {
                 self.config.DATETIME_INDEX:  {
                     '$gte': now - datetime.timedelta(seconds=storage_attribute.time_range),
-                    #'$gte': now - datetime.timedelta(days=30),
+                    #'$gte': now - datetime.timedelta(days=15),
                     '$lt': now
                 }
             }
+        if self.config.LOGSOURCE_HOSTNAME != 'localhost':
+            query[self.config.HOSTNAME_INDEX] = self.config.LOGSOURCE_HOSTNAME
 
-        mg_data = mg_data.find(query).sort(self.config.DATETIME_INDEX, -1).limit(storage_attribute.number_of_entries)
+        if storage_attribute.incremental:
+            sort = [(self.config.DATETIME_INDEX, 1), ('_id', 1)]
+        else:
+            sort = [(self.config.DATETIME_INDEX, -1)]
+        # Empty field names are not valid paths, MongoDB 4.4 rejects them
+        fields = (self._message_field(), self.config.DATETIME_INDEX, self.config.HOSTNAME_INDEX)
+        projection = {field: 1 for field in fields if field}
+        return mg_data.find(query, projection).sort(sort).limit(storage_attribute.number_of_entries) \
+            .batch_size(self.config.MG_BATCH_SIZE)
+
+    def _message_field(self):
+        return self.config.MESSAGE_INDEX or "message"
+
+    def _message(self, log):
+        """Return the message of a log, following dotted paths into embedded documents."""
+        value = field_value(log, self._message_field())
+        return "" if value is None else str(value)
+
+    def iter_batches(self, storage_attribute: MGStorageAttribute):
+        """Yield logs in batches of MG_BATCH_SIZE as the cursor returns them.
+
+        Raw records are the documents in extended json, like {"$oid": ...} ids, that every sink can serialise.
+        """
+        from bson import json_util
+        cursor = self._find(storage_attribute)
+        try:
+            while True:
+                mg_data = list(islice(cursor, self.config.MG_BATCH_SIZE))
+                if not mg_data:
+                    break
+                mg_data_normalized = pandas.DataFrame({self._message_field(): [self._message(log) for log in mg_data]})
+                self._preprocess(mg_data_normalized)
+                if storage_attribute.incremental:
+                    self._get_watermark("mg-%s" % self.config.MG_COLLECTION).advance(
+                        mg_data[-1][self.config.DATETIME_INDEX], str(mg_data[-1]['_id']))
+                yield mg_data_normalized, json.loads(json_util.dumps(mg_data))
+        finally:
+            cursor.close()
+
+    def retrieve(self, storage_attribute: MGStorageAttribute):
+        """Retrieve data from MongoDB."""
+        frames = []
+        mg_data = []
+        for mg_data_normalized, batch in self.iter_batches(storage_attribute):
+            frames.append(mg_data_normalized)
+            mg_data.extend(batch)
         _LOGGER.info(
             "Reading %d log entries in last %d seconds from %s",
-            mg_data.count(True),
+            len(mg_data),
             storage_attribute.time_range,
             self.config.MG_HOST,
         )
 
-        if not mg_data.count():   # if it equials 0:
+        if not frames:
             return pandas.DataFrame(), mg_data
 
-        mg_data = dumps(mg_data, sort_keys=False)
-
-        mg_data_normalized = pandas.DataFrame(pandas.json_normalize(json.loads(mg_data)))
+        mg_data_normalized = pandas.concat(frames, ignore_index=True)
         _LOGGER.info("%d logs loaded in from last %d seconds", len(mg_data_normalized),
                      storage_attribute.time_range)
-        self._preprocess(mg_data_normalized)
-
-        _LOGGER.info("Closing the connection to MongoDB")
-        self.mg.close()
 
-        return mg_data_normalized, json.loads(mg_data)
+        return mg_data_normalized, mg_data
 
 
 class MongoDBDataSink(StorageSink, DataCleaner, MongoDBStorage):
@@ -139,25 +196,18 @@ class MongoDBDataSink(StorageSink, DataCleaner, MongoDBStorage):
 
     def store_results(self, data):
         """Store results back to MongoDB"""
+        from pymongo import UpdateOne
         mg_db = self.mg[self.config.MG_DB]
         mg_col = mg_db[self.config.MG_COLLECTION]
+        requests = []
         for x in data:
+            fields = {'is_anomaly': x['anomaly']}
             if x["anomaly"]:
-                mg_col.update_one({
-                    '_id': ObjectId(x['_id']['$oid'])
-                }, {
-                    "$set": {
-                        'is_anomaly': x['anomaly'],
-                        "anomaly_score": x["anomaly_score"]
-                    }
-                }, upsert=False)
-            else:
-                mg_col.update_one({
-                    '_id': ObjectId(x['_id']['$oid'])
-                }, {
-                    "$set": {
-                        'is_anomaly': x['anomaly'],
-                    }
-                }, upsert=False)
+                fields["anomaly_score"] = x["anomaly_score"]
+            if "template_id" in x:
+                fields["template_id"] = x["template_id"]
+            requests.append(UpdateOne({'_id': _object_id(x['_id'])}, {"$set": fields}, upsert=False))
         _LOGGER.info("Inserting data into MongoDB")
-        self.mg.close()
+        # Unordered bulks let the server apply the updates in parallel, chunks bound the request size
+        for start in range(0, len(requests), self.config.MG_BULK_SIZE):
+            mg_col.bulk_write(requests[start:start + self.config.MG_BULK_SIZE], ordered=False)
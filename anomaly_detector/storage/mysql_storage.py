@@ -1,9 +1,8 @@
 """MySQL storage interface"""
 import datetime
+import threading
 import pandas
-import mysql.connector
 import logging
-import json
 from anomaly_detector.storage.storage import DataCleaner
 from anomaly_detector.storage.storage_source import StorageSource
 from anomaly_detector.storage.stdout_sink import StorageSink
@@ -11,6 +10,11 @@ from anomaly_detector.storage.storage_attribute import MySQLStorageAttribute
 
 _LOGGER = logging.getLogger(__name__)
 
+# Connections are reused across inference loops, one per server and role since they are not thread safe
+_CONNECTIONS = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+
 class MySQLStorage:
     """MySQL storage backend."""
 
@@ -23,30 +27,38 @@ class MySQLStorage:
         self._connect(is_input)
 
     def _connect(self, is_input):
+        import mysql.connector
+        """Use the open connection to the server, reconnecting when it was lost."""
         if is_input:
-            _LOGGER.warning(
-                "Connection to input MySQL server at %s" % (self.config.MYSQL_INPUT_HOST)
-            )
-            self.db = mysql.connector.connect(
-                host=self.config.MYSQL_INPUT_HOST,
-                port=self.config.MYSQL_INPUT_PORT,
-                user=self.config.MYSQL_INPUT_USER,
-                password=self.config.MYSQL_INPUT_PASSWORD,
-                database=self.config.MYSQL_INPUT_DB
-            )
-            self.db.start_transaction(isolation_level='READ COMMITTED')
-            return
-        _LOGGER.warning(
-                "Connection to target MySQL server at %s" % (self.config.MYSQL_TARGET_HOST)
-            )
-        self.db = mysql.connector.connect(
-            host=self.config.MYSQL_TARGET_HOST,
-            port=self.config.MYSQL_TARGET_PORT,
-            user=self.config.MYSQL_TARGET_USER,
-            password=self.config.MYSQL_TARGET_PASSWORD,
-            database=self.config.MYSQL_TARGET_DB
-        )
-        self.db.start_transaction(isolation_level='READ COMMITTED')
+            settings = dict(host=self.config.MYSQL_INPUT_HOST,
+                            port=self.config.MYSQL_INPUT_PORT,
+                            user=self.config.MYSQL_INPUT_USER,
+                            password=self.config.MYSQL_INPUT_PASSWORD,
+                            database=self.config.MYSQL_INPUT_DB)
+        else:
+            settings = dict(host=self.config.MYSQL_TARGET_HOST,
+                            port=self.config.MYSQL_TARGET_PORT,
+                            user=self.config.MYSQL_TARGET_USER,
+                            password=self.config.MYSQL_TARGET_PASSWORD,
+                            database=self.config.MYSQL_TARGET_DB)
+        key = (is_input, settings["host"], settings["port"], settings["user"], settings["database"])
+        with _CONNECTIONS_LOCK:
+            db = _CONNECTIONS.get(key)
+            if db is None:
+                _LOGGER.warning(
+                    "Connection to %s MySQL server at %s" % ("input" if is_input else "target", settings["host"])
+                )
+                # Autocommit, a transaction kept open across loops would pin an old snapshot of the table
+                db = mysql.connector.connect(autocommit=True, consume_results=True, **settings)
+                cursor = db.cursor()
+                cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED")
+                cursor.close()
+                _CONNECTIONS[key] = db
+            elif not db.is_connected():
+                _LOGGER.warning("Reconnecting to MySQL server at %s" % settings["host"])
+                db.reconnect(attempts=3, delay=1)
+            self.db = db
+
 
 class MySQLDataStorageSource(StorageSource, DataCleaner, MySQLStorage):
     """MySQL data source implementation."""
@@ -58,48 +70,120 @@ class MySQLDataStorageSource(StorageSource, DataCleaner, MySQLStorage):
         self.config = config
         MySQLStorage.__init__(self, config)
 
-    def retrieve(self, storage_attribute: MySQLStorageAttribute):
-        """Retrieve data from MySQL"""
-        now = datetime.datetime.now()
-
-        cursor = self.db.cursor()
-
-        if self.config.LOGSOURCE_HOSTNAME:
-            sql = "SELECT %s, %s, %s FROM %s WHERE (%s BETWEEN '%s' AND '%s') AND %s = '%s' ORDER BY %s DESC LIMIT %d" % (
-                self.config.MESSAGE_INDEX,
-                self.config.DATETIME_INDEX,
-                self.config.HOSTNAME_INDEX,
-                self.config.MYSQL_INPUT_TABLE,
-                self.config.DATETIME_INDEX,
-                (now - datetime.timedelta(seconds=storage_attribute.time_range)).strftime("%Y-%m-%d %H:%M:%S"),
-                now.strftime("%Y-%m-%d %H:%M:%S"),
-                self.config.HOSTNAME_INDEX,
-                self.config.LOGSOURCE_HOSTNAME,
-                self.config.DATETIME_INDEX,
-                storage_attribute.number_of_entries
-            )
+    def _after(self, operator):
+        """Condition selecting rows after a (datetime, id) position in the given direction."""
+        return "(%s %s %%s OR (%s = %%s AND %s %s %%s))" % (self.config.DATETIME_INDEX, operator,
+                                                         self.config.DATETIME_INDEX,
+                                                         self.config.MYSQL_ID_INDEX, operator)
+
+    def _has_id_column(self):
+        """Whether the input table has the MYSQL_ID_INDEX column, tables of older setups may not."""
+        import mysql.connector
+        if getattr(self, "_id_column", None) is None:
+            self._id_column = False
+            if self.config.MYSQL_ID_INDEX:
+                cursor = self.db.cursor()
+                try:
+                    cursor.execute("SELECT %s FROM %s LIMIT 0" % (self.config.MYSQL_ID_INDEX,
+                                                                  self.config.MYSQL_INPUT_TABLE))
+                    cursor.fetchall()
+                    self._id_column = True
+                except mysql.connector.Error as ex:
+                    _LOGGER.warning("Column %s not found in %s, rows are read with a single query: %s",
+                                    self.config.MYSQL_ID_INDEX, self.config.MYSQL_INPUT_TABLE, ex)
+                finally:
+                    cursor.close()
+        return self._id_column
+
+    def _window(self, storage_attribute: MySQLStorageAttribute, has_id):
+        """Conditions and parameters selecting the rows to retrieve.
+
+        These are the last time_range seconds, or in incremental mode the rows following the watermark.
+        """
+        position = None
+        if storage_attribute.incremental:
+            position = self._get_watermark("mysql-%s" % self.config.MYSQL_INPUT_TABLE).position
+        if position is not None and has_id:
+            conditions = [self._after(">")]
+            params = [position[0], position[0], position[1]]
+        elif position is not None:
+            conditions = ["%s > %%s" % self.config.DATETIME_INDEX]
+            params = [position[0]]
         else:
-            sql = "SELECT %s, %s FROM %s WHERE %s BETWEEN %s AND %s ORDER BY %s DESC LIMIT %d" % (
-                self.config.MESSAGE_INDEX,
-                self.config.DATETIME_INDEX,
+            now = datetime.datetime.now()
+            conditions = ["%s BETWEEN %%s AND %%s" % self.config.DATETIME_INDEX]
+            params = [now - datetime.timedelta(seconds=storage_attribute.time_range), now]
+        if self.config.LOGSOURCE_HOSTNAME:
+            conditions.append("%s = %%s" % self.config.HOSTNAME_INDEX)
+            params.append(self.config.LOGSOURCE_HOSTNAME)
+        return conditions, params
+
+    def _pages(self, storage_attribute: MySQLStorageAttribute):
+        """Yield pages of MYSQL_BATCH_SIZE rows, newest first or oldest first in incremental mode.
+
+        Every page is a short query continuing after the (datetime, id) of the last row of the previous
+        one, so no result set stays open on the server while a page is processed. Tables without the id
+        column cannot be paged exactly, their rows are read with a single query.
+        """
+        order, operator = ("ASC", ">") if storage_attribute.incremental else ("DESC", "<")
+        has_id = self._has_id_column()
+        conditions, params = self._window(storage_attribute, has_id)
+        columns = [self.config.MESSAGE_INDEX, self.config.DATETIME_INDEX, self.config.HOSTNAME_INDEX]
+        sort = ["%s %s" % (self.config.DATETIME_INDEX, order)]
+        if has_id:
+            columns.append(self.config.MYSQL_ID_INDEX)
+            sort.append("%s %s" % (self.config.MYSQL_ID_INDEX, order))
+        remaining = storage_attribute.number_of_entries
+        last = None
+        while remaining > 0:
+            size = min(self.config.MYSQL_BATCH_SIZE, remaining) if has_id else remaining
+            page_conditions, page_params = list(conditions), list(params)
+            if last is not None:
+                page_conditions.append(self._after(operator))
+                page_params += [last[1], last[1], last[3]]
+            sql = "SELECT %s FROM %s WHERE %s ORDER BY %s LIMIT %d" % (
+                ", ".join(columns),
                 self.config.MYSQL_INPUT_TABLE,
-                self.config.DATETIME_INDEX,
-                (now - datetime.timedelta(seconds=storage_attribute.time_range)).strftime("%Y-%m-%d %H:%M:%S"),
-                now.strftime("%Y-%m-%d %H:%M:%S"),
-                self.config.DATETIME_INDEX,
-                storage_attribute.number_of_entries
+                " AND ".join(page_conditions),
+                ", ".join(sort),
+                size
             )
+            cursor = self.db.cursor()
+            try:
+                cursor.execute(sql, tuple(page_params))
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+            if not rows:
+                break
+            yield rows
+            remaining -= len(rows)
+            if len(rows) < size or not has_id:
+                break
+            last = rows[-1]
+
+    def iter_batches(self, storage_attribute: MySQLStorageAttribute):
+        """Yield logs page by page, memory use does not grow with the time range."""
+        for rows in self._pages(storage_attribute):
+            json_data = [{self.config.MESSAGE_INDEX: row[0],
+                          self.config.DATETIME_INDEX: row[1],
+                          self.config.HOSTNAME_INDEX: row[2]} for row in rows]
+            json_data_normalized = pandas.DataFrame({self.config.MESSAGE_INDEX: ["" if row[0] is None else row[0]
+                                                                                  for row in rows]})
+            self._preprocess(json_data_normalized)
+            if storage_attribute.incremental:
+                last = rows[-1]
+                self._get_watermark("mysql-%s" % self.config.MYSQL_INPUT_TABLE).advance(
+                    last[1], last[3] if len(last) > 3 else None)
+            yield json_data_normalized, json_data
 
-        cursor.execute(sql)
-        data = cursor.fetchall()
+    def retrieve(self, storage_attribute: MySQLStorageAttribute):
+        """Retrieve data from MySQL"""
+        frames = []
         json_data = []
-        for x in data:
-            tmp = {}
-            tmp[self.config.MESSAGE_INDEX] = x[0]
-            tmp[self.config.DATETIME_INDEX] = x[1]
-            tmp[self.config.HOSTNAME_INDEX] = x[2]
-            json_data.append(tmp)
-
+        for json_data_normalized, batch in self.iter_batches(storage_attribute):
+            frames.append(json_data_normalized)
+            json_data.extend(batch)
 
         _LOGGER.info(
             "Reading %d log entries in last %d seconds from %s",
@@ -108,20 +192,17 @@ class MySQLDataStorageSource(StorageSource, DataCleaner, MySQLStorage):
             self.config.MYSQL_INPUT_HOST,
         )
 
-        if not len(json_data):
+        if not frames:
             return pandas.DataFrame(), json_data
 
-        json_data_normalized = pandas.DataFrame(pandas.json_normalize(json_data))
+        json_data_normalized = pandas.concat(frames, ignore_index=True)
 
         _LOGGER.info("%d logs loaded in from last %d seconds", len(json_data_normalized),
                      storage_attribute.time_range)
 
-        self._preprocess(json_data_normalized)
-
-        cursor.close()
-
         return json_data_normalized, json_data
 
+
 class MySQLDataSink(StorageSink, DataCleaner, MySQLStorage):
     """MySQL data sink implementation."""
 
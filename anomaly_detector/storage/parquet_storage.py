@@ -0,0 +1,119 @@
+"""Parquet storage interface."""
+import logging
+import os
+import uuid
+import pandas
+import pyarrow
+import pyarrow.dataset
+import pyarrow.parquet
+from anomaly_detector.storage.storage import DataCleaner
+from anomaly_detector.storage.storage_attribute import DefaultStorageAttribute
+from anomaly_detector.storage.storage_sink import StorageSink
+from anomaly_detector.storage.storage_source import StorageSource
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ParquetDataSource(StorageSource, DataCleaner):
+    """Parquet data source reading a file or a directory of files column-wise.
+
+    Only the message and PQ_COLUMNS are read, and the hostname and PQ_START_TIME/PQ_END_TIME
+    filters are pushed down to skip row groups whose statistics rule them out.
+    """
+
+    NAME = "parquet.source"
+
+    def __init__(self, config):
+        """Initialize parquet storage backend."""
+        self.config = config
+
+    def _bound(self, field_type, value):
+        """Convert a configured time to the type of the datetime column."""
+        if pyarrow.types.is_timestamp(field_type):
+            return pyarrow.scalar(pandas.Timestamp(value).to_pydatetime(), type=field_type)
+        return value
+
+    def _filter(self, schema):
+        """Build the predicate selecting the logs to read, None to read them all."""
+        conditions = []
+        names = set(schema.names)
+        if self.config.LOGSOURCE_HOSTNAME != 'localhost' and self.config.HOSTNAME_INDEX in names:
+            conditions.append(pyarrow.dataset.field(self.config.HOSTNAME_INDEX) == self.config.LOGSOURCE_HOSTNAME)
+        if self.config.DATETIME_INDEX in names:
+            field = pyarrow.dataset.field(self.config.DATETIME_INDEX)
+            field_type = schema.field(self.config.DATETIME_INDEX).type
+            if self.config.PQ_START_TIME:
+                conditions.append(field >= self._bound(field_type, self.config.PQ_START_TIME))
+            if self.config.PQ_END_TIME:
+                conditions.append(field < self._bound(field_type, self.config.PQ_END_TIME))
+        predicate = None
+        for condition in conditions:
+            predicate = condition if predicate is None else predicate & condition
+        return predicate
+
+    def iter_batches(self, storage_attribute: DefaultStorageAttribute):
+        """Yield logs in batches of at most PQ_BATCH_SIZE rows."""
+        _LOGGER.info("Reading from %s" % self.config.PQ_INPUT_PATH)
+        dataset = pyarrow.dataset.dataset(self.config.PQ_INPUT_PATH, format="parquet")
+        field = self.config.MESSAGE_INDEX or "message"
+        columns = [field] + [column.strip() for column in self.config.PQ_COLUMNS.split(",")
+                             if column.strip() and column.strip() != field]
+        remaining = getattr(storage_attribute, "number_of_entries", None)
+        for batch in dataset.to_batches(columns=columns, filter=self._filter(dataset.schema),
+                                        batch_size=self.config.PQ_BATCH_SIZE):
+            if remaining is not None:
+                if remaining <= 0:
+                    break
+                batch = batch.slice(0, remaining)
+                remaining -= batch.num_rows
+            if not batch.num_rows:
+                continue
+            # RecordBatch.to_pylist needs pyarrow 7, rows are built from the columns
+            values = batch.to_pydict()
+            data = pandas.DataFrame({field: ["" if message is None else message for message in values[field]]})
+            self._preprocess(data)
+            yield data, [dict(zip(values, row)) for row in zip(*values.values())]
+
+    def retrieve(self, storage_attribute: DefaultStorageAttribute):
+        """Retrieve data from parquet files."""
+        frames = []
+        logs = []
+        for data, batch in self.iter_batches(storage_attribute):
+            frames.append(data)
+            logs.extend(batch)
+        if not frames:
+            return pandas.DataFrame(), logs
+        data = pandas.concat(frames, ignore_index=True)
+        _LOGGER.info("%d logs loaded", len(data))
+        return data, logs
+
+
+class ParquetDataSink(StorageSink):
+    """Parquet data sink writing every stored batch of results to a new file of PQ_OUTPUT_PATH."""
+
+    NAME = "parquet.sink"
+
+    def __init__(self, config):
+        """Initialize parquet storage backend."""
+        self.config = config
+        self._prefix = uuid.uuid4().hex[:8]
+        self._parts = 0
+        if config.PQ_OUTPUT_PATH:
+            os.makedirs(config.PQ_OUTPUT_PATH, exist_ok=True)
+
+    def store_results(self, data):
+        """Write results column-wise, with anomaly as bool and anomaly_score as float32."""
+        if not data:
+            return
+        columns = {}
+        for name in (self.config.MESSAGE_INDEX or "message", self.config.DATETIME_INDEX, self.config.HOSTNAME_INDEX):
+            if name and name not in columns and name in data[0]:
+                columns[name] = pyarrow.array([x.get(name) for x in data])
+        columns["anomaly"] = pyarrow.array([bool(x.get("anomaly")) for x in data], type=pyarrow.bool_())
+        columns["anomaly_score"] = pyarrow.array([x.get("anomaly_score") for x in data], type=pyarrow.float32())
+        if "template_id" in data[0]:
+            columns["template_id"] = pyarrow.array([x.get("template_id") for x in data], type=pyarrow.int32())
+        path = os.path.join(self.config.PQ_OUTPUT_PATH, "%s-%05d.parquet" % (self._prefix, self._parts))
+        pyarrow.parquet.write_table(pyarrow.table(columns), path, compression=self.config.PQ_COMPRESSION)
+        self._parts += 1
+        _LOGGER.info("%d results written to %s", len(data), path)
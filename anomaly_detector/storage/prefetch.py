@@ -0,0 +1,60 @@
+"""Prefetch - Produce the items of an iterator in a background thread."""
+import queue
+import threading
+
+_DONE = object()
+
+
+class _Failure:
+    """Exception raised by the producer, re-raised in the consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, size=1):
+    """Iterate over iterable in a background thread, keeping at most size items ready ahead of the consumer.
+
+    Waiting on the network or the disk for the next item then overlaps with the processing of the
+    current one. Errors of the producer are raised in the consumer, and closing the returned
+    generator early stops the producer, which also closes the iterable.
+    """
+    items = queue.Queue(maxsize=max(1, size))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    break
+            put(_DONE)
+        except BaseException as ex:
+            put(_Failure(ex))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, name="prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
@@ -1,7 +1,15 @@
 """Storage abstract class."""
 from abc import ABCMeta, abstractmethod
-import re
 import logging
+from anomaly_detector.storage.tokenizer import TOKEN_PATTERN, tokenize
+
+
+def field_value(log, path):
+    """Return the value of a log at a field path, dotted paths lead into embedded documents. None if missing."""
+    value = log
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
 
 
 class Storage(metaclass=ABCMeta):
@@ -28,8 +36,7 @@ class DataCleaner:
     @classmethod
     def _clean_message(cls, line):
         """Remove all none alphabetical characters from message strings."""
-        words = list(re.findall("[a-zA-Z]+", line))
-        return words
+        return TOKEN_PATTERN.findall(line)
 
     @classmethod
     def _preprocess(cls, data):
@@ -41,7 +48,8 @@ class DataCleaner:
 
         for col in data.columns:
             if col == "message":
-                data[col] = data[col].apply(cls._clean_message)
+                # Messages become arrays of word ids, interned in the vocabulary shared with the w2v model
+                data[col] = tokenize(data[col])
             else:
                 data[col] = data[col].apply(to_str)
 
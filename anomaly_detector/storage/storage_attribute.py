@@ -4,9 +4,20 @@
 class DefaultStorageAttribute:
     """Local Storage Attribute only requires false_positive data which is optional."""
 
-    def __init__(self, false_data=None):
+    def __init__(self, false_data=None, incremental=False):
         """Local Storage only takes an optional field of false_positive."""
         self._false_data = false_data
+        self._incremental = incremental
+
+    @property
+    def incremental(self):
+        """Resume after the last stored log instead of querying a sliding time range."""
+        return self._incremental
+
+    @incremental.setter
+    def incremental(self, x):
+        """Resume after the last stored log instead of querying a sliding time range."""
+        self._incremental = x
 
     @property
     def false_data(self):
@@ -22,9 +33,9 @@ class DefaultStorageAttribute:
 class ESStorageAttribute(DefaultStorageAttribute):
     """Elastic Search Attributes require false positive data and time_range and number of entries to pull."""
 
-    def __init__(self, time_range: int, number_of_entries: int, false_data=None):
+    def __init__(self, time_range: int, number_of_entries: int, false_data=None, incremental=False):
         """Set initial properties for required fields when fetching data from ES."""
-        super().__init__(false_data)
+        super().__init__(false_data, incremental)
         self.__time_range = time_range
         self.__number_of_entries = number_of_entries
         self.false_data = false_data
@@ -53,7 +64,8 @@ class ESStorageAttribute(DefaultStorageAttribute):
 class MGStorageAttribute(DefaultStorageAttribute):
     """MongoDB Attributes require false positive data and time_range and number of entries to pull"""
 
-    def __init__(self, time_range: int, number_of_entries: int, false_data=None):
+    def __init__(self, time_range: int, number_of_entries: int, false_data=None, incremental=False):
+        self.incremental = incremental
         self.__time_range = time_range
         self.__number_of_entries = number_of_entries
         self.false_data = false_data
@@ -81,7 +93,8 @@ class MGStorageAttribute(DefaultStorageAttribute):
 class MySQLStorageAttribute(DefaultStorageAttribute):
     """MySQL Attributes"""
 
-    def __init__(self, time_range: int, number_of_entries: int):
+    def __init__(self, time_range: int, number_of_entries: int, incremental=False):
+        self.incremental = incremental
         self.__time_range = time_range
         self.__number_of_entries = number_of_entries
 
@@ -1,16 +1,13 @@
 """Storage Catalog class."""
-from anomaly_detector.storage.kafka_storage import KafkaSink
-from anomaly_detector.storage.local_storage import LocalStorageDataSource, LocalStorageDataSink
-from anomaly_detector.storage.local_directory_storage import LocalDirectoryStorageDataSource
-from anomaly_detector.storage.stdout_sink import StdoutSink
-from anomaly_detector.storage.es_storage import ElasticSearchDataSink, ElasticSearchDataSource
-from anomaly_detector.storage.mongodb_storage import MongoDBDataStorageSource, MongoDBDataSink
-from anomaly_detector.storage.mysql_storage import MySQLDataStorageSource, MySQLDataSink
 import logging
 
 
 class StorageCatalog(object):
-    """Internal api and client should use storage proxy for data access.."""
+    """Internal api and client should use storage proxy for data access..
+
+    Implementations are imported inside their factory methods, so only the client
+    library of the configured backend gets loaded.
+    """
 
     def __init__(self, config, storage_api):
         """Storage initialization logic."""
@@ -24,81 +21,124 @@ class StorageCatalog(object):
     def _localdir_datasource_api(cls, config):
         """Local file storage api datasource construction."""
         logging.info("fetching localdir datasource")
+        from anomaly_detector.storage.local_directory_storage import LocalDirectoryStorageDataSource
         return LocalDirectoryStorageDataSource(configuration=config)
 
     @classmethod
     def _localfile_datasource_api(cls, config):
         """Local file storage api datasource construction."""
         logging.info("fetching localfile datasource")
+        from anomaly_detector.storage.local_storage import LocalStorageDataSource
         return LocalStorageDataSource(configuration=config)
 
     @classmethod
     def _localfile_datasink_api(cls, config):
         """Local file storage api datasink construction."""
         logging.info("save to localfile datasink")
+        from anomaly_detector.storage.local_storage import LocalStorageDataSink
         return LocalStorageDataSink(configuration=config)
 
     @classmethod
     def _elasticsearch_datasource_api(cls, config):
         """Local file storage api datasource construction."""
         logging.info("fetching elasticsearch datasource")
+        from anomaly_detector.storage.es_storage import ElasticSearchDataSource
         return ElasticSearchDataSource(configuration=config)
 
     @classmethod
     def _elasticsearch_datasink_api(cls, config):
         """Local file storage api datasink construction."""
         logging.info("save to elasticsearch datasink")
+        from anomaly_detector.storage.es_storage import ElasticSearchDataSink
         return ElasticSearchDataSink(configuration=config)
 
     @classmethod
     def _kafka_datasink_api(cls, config):
         """Kafka data sink."""
         logging.info("save kafka datasink")
+        from anomaly_detector.storage.kafka_storage import KafkaSink
         return KafkaSink(config=config)
 
+    @classmethod
+    def _kafka_datasource_api(cls, config):
+        """Kafka data source."""
+        logging.info("fetching kafka datasource")
+        from anomaly_detector.storage.kafka_storage import KafkaDataSource
+        return KafkaDataSource(config=config)
+
     @classmethod
     def _stdout_datasink_api(cls, config):
         """Stdout data sink."""
         logging.info("save stdout datasink")
+        from anomaly_detector.storage.stdout_sink import StdoutSink
         return StdoutSink(config=config)
 
     @classmethod
     def _mongodb_datasource_api(cls, config):
         """MongoDB data source API"""
         logging.info("fetching mongodb datasource")
+        from anomaly_detector.storage.mongodb_storage import MongoDBDataStorageSource
         return MongoDBDataStorageSource(config=config)
 
     @classmethod
     def _mongodb_datasink_api(cls, config):
         """MongoDB data sink API"""
         logging.info("fetching mongodb datasink")
+        from anomaly_detector.storage.mongodb_storage import MongoDBDataSink
         return MongoDBDataSink(config=config)
 
     @classmethod
     def _mysql_datasource_api(cls, config):
         """MongoDB data source API"""
         logging.info("fetching MySQL datasource")
+        from anomaly_detector.storage.mysql_storage import MySQLDataStorageSource
         return MySQLDataStorageSource(config=config)
 
     @classmethod
     def _mysql_datasink_api(cls, config):
         """MongoDB data sink API"""
         logging.info("fetching MySQL datasink")
+        from anomaly_detector.storage.mysql_storage import MySQLDataSink
         return MySQLDataSink(config=config)
 
+    @classmethod
+    def _parquet_datasource_api(cls, config):
+        """Parquet data source API"""
+        logging.info("fetching parquet datasource")
+        from anomaly_detector.storage.parquet_storage import ParquetDataSource
+        return ParquetDataSource(config=config)
+
+    @classmethod
+    def _parquet_datasink_api(cls, config):
+        """Parquet data sink API"""
+        logging.info("fetching parquet datasink")
+        from anomaly_detector.storage.parquet_storage import ParquetDataSink
+        return ParquetDataSink(config=config)
+
     _class_method_choices = {'local.sink': _localfile_datasink_api,
                              'local.source': _localfile_datasource_api,
                              'es.sink': _elasticsearch_datasink_api,
                              'es.source': _elasticsearch_datasource_api,
                              'kafka.sink': _kafka_datasink_api,
+                             'kafka.source': _kafka_datasource_api,
                              'localdir.source': _localdir_datasource_api,
                              'stdout.sink': _stdout_datasink_api,
                              'mg.source': _mongodb_datasource_api,
                              'mg.sink': _mongodb_datasink_api,
                              "mysql.source": _mysql_datasource_api,
-                             "mysql.sink": _mysql_datasink_api
+                             "mysql.sink": _mysql_datasink_api,
+                             "parquet.source": _parquet_datasource_api,
+                             "parquet.sink": _parquet_datasink_api
                              }
 
+    # Sources delivering logs as they are produced, inference over them runs continuously
+    _streaming_sources = {'kafka.source'}
+
+    @classmethod
+    def is_streaming(cls, storage_api):
+        """Check whether a source streams logs, instead of being polled for a time range."""
+        return storage_api in cls._streaming_sources
+
     def get_storage_api(self):
         """Storage api."""
         return self._class_method_choices[self.storage_api].__get__(None, self.__class__)(self.config)
@@ -1,12 +1,23 @@
 """Storage Proxy."""
+import logging
+from collections import deque
 from anomaly_detector.config import Configuration
+from anomaly_detector.storage.background_writer import BackgroundWriter
+from anomaly_detector.storage.prefetch import prefetch
 from anomaly_detector.storage.storage_catalog import StorageCatalog
 from anomaly_detector.storage.storage_source import StorageSource
 from anomaly_detector.storage.storage_sink import StorageSink
 
+_LOGGER = logging.getLogger(__name__)
+
 
 class StorageProxy(StorageSource, StorageSink):
-    """Storage Proxy for facilitating communication with backend."""
+    """Storage Proxy for facilitating communication with backend.
+
+    With STORAGE_PIPELINE, the next batch is retrieved and the results of the previous ones are stored in
+    background threads while the current batch is scored. Each source position is committed only once
+    the results of its batch are stored, and a new retrieval waits for the pending stores to be done.
+    """
 
     SUFFIX_SOURCE = ".source"
     SUFFIX_SINK = ".sink"
@@ -14,15 +25,65 @@ class StorageProxy(StorageSource, StorageSink):
     def __init__(self, config: Configuration):
         """Create storage data source and sinks to talk to storage backend."""
         super().__init__(config)
-        self.source = StorageCatalog(config=config,
-                                     storage_api=config.STORAGE_DATASOURCE + self.SUFFIX_SOURCE).get_storage_api()
+        source_api = config.STORAGE_DATASOURCE + self.SUFFIX_SOURCE
+        self.source = StorageCatalog(config=config, storage_api=source_api).get_storage_api()
         self.sink = StorageCatalog(config=config,
                                    storage_api=config.STORAGE_DATASINK + self.SUFFIX_SINK).get_storage_api()
+        # The ElasticSearch sink updates source documents through their metadata, other sinks never see it
+        self._metadata = ()
+        if config.STORAGE_DATASINK != config.STORAGE_DATASOURCE:
+            self._metadata = self.source.METADATA_FIELDS
+        self._writer = None
+        self._checkpoints = deque()
+        if config.STORAGE_PIPELINE:
+            if StorageCatalog.is_streaming(source_api):
+                # Consumers of streaming sources are not thread safe and already score as logs come
+                _LOGGER.warning("STORAGE_PIPELINE is ignored for streaming source %s", source_api)
+            else:
+                self._writer = BackgroundWriter(self._store, config.STORAGE_PIPELINE_DEPTH, name="storage-writer")
 
     def retrieve(self, storage_attribute):
         """Retrieve data from backend storage."""
+        self.flush()
         return self.source.retrieve(storage_attribute)
 
+    def iter_batches(self, storage_attribute):
+        """Retrieve data from backend storage batch by batch."""
+        if self._writer is None:
+            yield from self.source.iter_batches(storage_attribute)
+            return
+        # Incremental sources query from the committed position, all previous results must be stored
+        self.flush()
+        self._checkpoints.clear()
+        batches = ((data, raw, self.source.checkpoint())
+                   for data, raw in self.source.iter_batches(storage_attribute))
+        for data, raw, checkpoint in prefetch(batches, self.config.STORAGE_PIPELINE_DEPTH):
+            self._checkpoints.append(checkpoint)
+            yield data, raw
+
     def store_results(self, entries):
-        """Store data into backend storage."""
+        """Store data into backend storage, then let the source move past the stored logs."""
+        if self._metadata:
+            for entry in entries:
+                for field in self._metadata:
+                    entry.pop(field, None)
+        if self._writer is None:
+            self.sink.store_results(entries)
+            self.source.commit()
+            return
+        # Results are stored in the order their batches were retrieved
+        checkpoint = self._checkpoints.popleft() if self._checkpoints else self.source.checkpoint()
+        self._writer.submit((entries, checkpoint))
+
+    def _store(self, item):
+        """Store the results of a batch and commit the position of the source up to that batch."""
+        entries, checkpoint = item
         self.sink.store_results(entries)
+        if checkpoint is not None:
+            self.source.commit(checkpoint)
+
+    def flush(self):
+        """Wait until the results handed over to store_results are stored, then let the sink end the loop."""
+        if self._writer is not None:
+            self._writer.flush()
+        self.sink.flush()
@@ -13,3 +13,7 @@ class StorageSink(metaclass=ABCMeta):
     def store_results(self, entries):
         """Store results back to storage backend."""
         raise NotImplementedError("Please implement the <store_results method>")
+
+    def flush(self):
+        """End the results of the current loop, sinks holding results back write them out."""
+        pass
@@ -1,10 +1,15 @@
 """Storage Data Source."""
+import os
 from abc import ABCMeta, abstractmethod
+from anomaly_detector.storage.watermark import Watermark
 
 
 class StorageSource(metaclass=ABCMeta):
     """Base class for storage implementations."""
 
+    # Fields a source adds to raw records for its own sink, they are removed before other sinks get them
+    METADATA_FIELDS = ()
+
     def __init__(self, configuration):
         """Initialize storage."""
         self.config = configuration
@@ -13,3 +18,34 @@ class StorageSource(metaclass=ABCMeta):
     def retrieve(self, storage_attribute):
         """Retrieve data from storage and return them as a pandas dataframe."""
         raise NotImplementedError("Please implement the <retrieve method>")
+
+    def iter_batches(self, storage_attribute):
+        """Retrieve data in batches of (dataframe, raw records) as they arrive from storage.
+
+        Sources that can stream override this, by default all data is retrieved as one batch.
+        """
+        data, raw = self.retrieve(storage_attribute)
+        if len(data):
+            yield data, raw
+
+    def checkpoint(self):
+        """Return the position of the logs retrieved so far, for commit to confirm only those later on."""
+        watermark = getattr(self, "_watermark", None)
+        if watermark is not None:
+            return watermark.pending
+        return None
+
+    def commit(self, checkpoint=None):
+        """Confirm the logs retrieved last, or up to checkpoint, were stored.
+
+        Incremental retrieval resumes after them.
+        """
+        watermark = getattr(self, "_watermark", None)
+        if watermark is not None:
+            watermark.commit(checkpoint)
+
+    def _get_watermark(self, name):
+        """Return the watermark of this source, kept in the model directory."""
+        if getattr(self, "_watermark", None) is None:
+            self._watermark = Watermark(os.path.join(self.config.MODEL_DIR, "%s.watermark" % name))
+        return self._watermark
@@ -0,0 +1,111 @@
+"""Tokenizer - Split log messages into words interned as integer ids."""
+import re
+import threading
+from array import array
+import numpy as np
+
+# Words of a log message, everything else is dropped
+TOKEN_PATTERN = re.compile("[a-zA-Z]+")
+
+
+class Vocabulary:
+    """Interned words, every word is stored once and tokenized logs refer to it by id.
+
+    Ids are only meaningful within a process and a generation, models keep the words themselves.
+    """
+
+    def __init__(self):
+        """Create an empty vocabulary."""
+        self.tokens = []
+        self._ids = {}
+        self._lock = threading.Lock()
+        # Changes whenever the vocabulary is reset, so that everything derived from the ids can be dropped
+        self.generation = 0
+
+    def __len__(self):
+        """Number of distinct words."""
+        return len(self.tokens)
+
+    def _add(self, token):
+        """Give an id to a new word, sources may tokenize in background threads."""
+        with self._lock:
+            token_id = self._ids.get(token)
+            if token_id is None:
+                token_id = len(self.tokens)
+                # The word is listed before its id is handed out, every id can be decoded
+                self.tokens.append(token)
+                self._ids[token] = token_id
+            return token_id
+
+    def tokenize(self, messages):
+        """Tokenize messages into the ids of all their words and the number of words of every message.
+
+        :return: int32 array of word ids and int64 array of lengths
+        """
+        ids = array("i")
+        lengths = array("q")
+        findall = TOKEN_PATTERN.findall
+        get = self._ids.get
+        for message in messages:
+            row = [get(token) for token in findall(message)]
+            if None in row:
+                row = [self._add(token) if token_id is None else token_id
+                       for token, token_id in zip(findall(message), row)]
+            ids.extend(row)
+            lengths.append(len(row))
+        # numpy versions differ on views of empty buffers
+        return (np.frombuffer(ids, dtype=np.int32) if ids else np.zeros(0, dtype=np.int32),
+                np.frombuffer(lengths, dtype=np.int64) if lengths else np.zeros(0, dtype=np.int64))
+
+    def reset(self):
+        """Forget all words, the ids of logs tokenized before can not be decoded any more."""
+        with self._lock:
+            self.tokens = []
+            self._ids = {}
+            self.generation += 1
+
+    def decode(self, ids):
+        """Return the words of a tokenized log."""
+        tokens = self.tokens
+        return [tokens[token_id] for token_id in ids.tolist()]
+
+
+# Vocabulary shared by all sources and models of the process
+VOCABULARY = Vocabulary()
+
+
+def tokenize(messages, vocabulary=VOCABULARY):
+    """Tokenize a column of log messages.
+
+    :return: object array holding, for every message, an int32 view of one buffer of word ids
+    """
+    ids, lengths = vocabulary.tokenize(messages)
+    rows = np.empty(len(lengths), dtype=object)
+    if len(lengths):
+        # Assigned one by one, numpy would otherwise stack views of equal length into a matrix
+        for i, row in enumerate(np.split(ids, np.cumsum(lengths[:-1]))):
+            rows[i] = row
+    return rows
+
+
+def is_tokenized(logs):
+    """Check whether logs are word id arrays rather than lists of words or vectors."""
+    return len(logs) > 0 and isinstance(logs[0], np.ndarray) and logs[0].dtype.kind == "i"
+
+
+class Sentences:
+    """Words of tokenized logs, re-iterable for Word2Vec to go through them in every epoch."""
+
+    def __init__(self, logs, vocabulary=VOCABULARY):
+        """Wrap logs given as word id arrays."""
+        self.logs = logs
+        self.vocabulary = vocabulary
+
+    def __iter__(self):
+        """Yield the words of every log."""
+        for ids in self.logs:
+            yield self.vocabulary.decode(ids)
+
+    def __len__(self):
+        """Number of logs."""
+        return len(self.logs)
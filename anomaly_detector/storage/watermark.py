@@ -0,0 +1,71 @@
+"""Watermark - Persisted position of the last log read from a data source."""
+import datetime
+import json
+import logging
+import os
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# Microseconds are always written, datetime.fromisoformat is only available from Python 3.7
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def _encode(value):
+    """Make datetimes json serializable, with their UTC offset when they have one."""
+    if isinstance(value, datetime.datetime):
+        return {"$date": value.strftime(_DATE_FORMAT) + value.strftime("%z")}
+    return value
+
+
+def _decode(value):
+    """Restore datetimes encoded by _encode."""
+    if isinstance(value, dict) and "$date" in value:
+        date = value["$date"]
+        if len(date) > 5 and date[-5] in "+-":
+            return datetime.datetime.strptime(date, _DATE_FORMAT + "%z")
+        return datetime.datetime.strptime(date, _DATE_FORMAT)
+    return value
+
+class Watermark:
+    """Timestamp of the last log read from a source and an id breaking ties between logs with equal timestamps.
+
+    Sources read logs in (timestamp, id) order starting after the committed position and advance
+    the watermark to the last log they return. The new position is only committed once the results
+    are stored, so logs are read and scored exactly once even when a loop fails in between.
+    """
+
+    def __init__(self, path):
+        """Load the committed position from path, if any."""
+        self.path = path
+        self.position = None
+        self._pending = None
+        if os.path.isfile(path):
+            try:
+                with open(path) as f:
+                    self.position = tuple(_decode(value) for value in json.load(f))
+            except (OSError, ValueError) as ex:
+                _LOGGER.warning("Ignoring unreadable watermark %s: %s", path, ex)
+
+    def advance(self, timestamp, tie_breaker):
+        """Move the position to the last log read, it takes effect on commit."""
+        self._pending = (timestamp, tie_breaker)
+
+    @property
+    def pending(self):
+        """Position of the last log read, not committed yet."""
+        return self._pending
+
+    def commit(self, position=None):
+        """Persist the position of the last log read, or an earlier pending position."""
+        if position is None:
+            position = self._pending
+        if position is None:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump([_encode(value) for value in position], f)
+        os.replace(tmp_path, self.path)
+        self.position = position
+        if self._pending == position:
+            self._pending = None
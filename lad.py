@@ -4,9 +4,10 @@ from anomaly_detector.config import Configuration
 from anomaly_detector.facade import Facade
 import click
 import os
+import sys
 import yaml
 
-from multiprocessing import Pool, Process
+from multiprocessing import Process
 
 CONFIGURATION_PREFIX = "LAD"
 
@@ -106,11 +107,18 @@ def run(job_type: str, config_yaml: str, single_run: bool, tracing_enabled: bool
         detectors.append(Facade(config=config, tracing_enabled=tracing_enabled))
 
     click.echo("Created jobtype {}".format(job_type))
-    pool = Pool(len(detectors))
+    # One non-daemonic process per detector, so each detector can keep its own model worker pool
+    processes = [Process(target=anomaly_run, args=(detector,)) for detector in detectors]
     click.echo("Perform training and inference in loop...")
-    pool.map(anomaly_run, detectors)
-    pool.close()
-    pool.join()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    # A detector that crashed must fail the run, as it did when detectors ran in a pool
+    failed = [process.name for process in processes if process.exitcode != 0]
+    if failed:
+        click.echo("Detectors failed: {}".format(", ".join(failed)), err=True)
+        sys.exit(1)
 
 if __name__ == "__main__":
     cli(auto_envvar_prefix="LAD")
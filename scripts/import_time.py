@@ -0,0 +1,78 @@
+"""Measure cold start import time of log anomaly detector.
+
+Runs ``python -X importtime`` for ``lad.py --help`` and for a single SOM training
+run on a local data file, then reports the total import time and the heaviest
+top level imports of each, e.g.:
+
+    python scripts/import_time.py --output import_time.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SOM_RUN = """
+from anomaly_detector.config import Configuration
+from anomaly_detector.core import DetectorPipelineCatalog
+config = Configuration(config_dict={{"STORAGE_DATASOURCE": "local", "STORAGE_DATASINK": "stdout",
+                                     "LS_INPUT_PATH": {input_path!r}, "MODEL_DIR": {model_dir!r},
+                                     "SOMPY_NODE_MAP": 2, "TRAIN_ITERATIONS": 100}})
+DetectorPipelineCatalog(config=config, feedback_strategy=None, job="sompy.train").get_pipeline().execute_steps()
+"""
+
+
+def parse_importtime(stderr):
+    """Return (module, self us, cumulative us, depth) of every import reported by -X importtime."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def measure(name, args, top):
+    """Run a command with import time tracing and summarize the imports."""
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    imports = parse_importtime(result.stderr)
+    top_level = sorted((i for i in imports if i[3] == 0), key=lambda i: i[2], reverse=True)
+    return {"name": name,
+            "returncode": result.returncode,
+            "modules": len(imports),
+            "total_ms": sum(i[2] for i in top_level) / 1000,
+            "heaviest": [{"module": m, "cumulative_ms": c / 1000} for m, _, c, _ in top_level[:top]]}
+
+
+def main():
+    """Run the benchmarks and print or save the results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=os.path.join(ROOT, "validation_data", "Hadoop_2k.json"),
+                        help="local log file used for the SOM run")
+    parser.add_argument("--top", type=int, default=10, help="number of heaviest imports to report")
+    parser.add_argument("--output", help="write results as json to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        results = [measure("lad --help", ["lad.py", "--help"], args.top),
+                   measure("local SOM train", ["-c", SOM_RUN.format(input_path=args.input, model_dir=model_dir)],
+                           args.top)]
+
+    for result in results:
+        print("%s: %.1f ms, %d modules (exit code %d)"
+              % (result["name"], result["total_ms"], result["modules"], result["returncode"]))
+        for heavy in result["heaviest"]:
+            print("    %8.1f ms  %s" % (heavy["cumulative_ms"], heavy["module"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
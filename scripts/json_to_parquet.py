@@ -0,0 +1,43 @@
+"""Convert json or common log files to parquet for the parquet source.
+
+Logs are streamed from the input files, which may be gzip or zstandard compressed,
+and written one row group per batch so files larger than memory can be converted:
+
+    python scripts/json_to_parquet.py validation_data/Hadoop_2k.json Hadoop_2k.parquet
+"""
+import argparse
+import pyarrow
+import pyarrow.parquet
+from anomaly_detector.storage.line_reader import batched, iter_files
+
+
+def main():
+    """Convert the files."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="json, json lines or common log files")
+    parser.add_argument("output", help="parquet file to write")
+    parser.add_argument("--columns", default="message", help="comma separated fields to keep")
+    parser.add_argument("--row-group-size", type=int, default=65536)
+    parser.add_argument("--compression", default="snappy")
+    args = parser.parse_args()
+
+    columns = [column.strip() for column in args.columns.split(",") if column.strip()]
+    writer = None
+    rows = 0
+    try:
+        for batch in batched(iter_files(args.files), args.row_group_size):
+            table = pyarrow.table({column: pyarrow.array([None if log.get(column) is None else str(log.get(column))
+                                                          for log in batch], type=pyarrow.string())
+                                   for column in columns})
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(args.output, table.schema, compression=args.compression)
+            writer.write_table(table)
+            rows += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    print("%d logs written to %s" % (rows, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compare LOF neighbour search backends against exact LOF on the validation data.
+
+For every validation_data json file the messages are encoded with a freshly trained
+W2V model. LOF is then trained with every LOF_ALGORITHM and each one reports its
+training and scoring time, the recall of the exact nearest neighbours, the share of
+exact LOF anomalies it flags too and the correlation of its scores with exact LOF:
+
+    python scripts/lof_recall.py --neighbors 100 --probes 4 8 16
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from anomaly_detector.config import Configuration
+from anomaly_detector.model import LOFModel, W2VModel
+from anomaly_detector.storage.storage import DataCleaner
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def encode(path):
+    """Encode the messages of a validation data file into log vectors."""
+    with open(path) as f:
+        messages = [DataCleaner._clean_message(str(log["message"])) for log in json.load(f)]
+    config = Configuration()
+    w2v = W2VModel(config=config)
+    w2v.create(messages, config.TRAIN_VECTOR_LENGTH, config.TRAIN_WINDOW)
+    return np.asarray(w2v.one_vector(messages), dtype=np.float64)
+
+
+def evaluate(vectors, neighbors, algorithm, probes, exact):
+    """Train and score with one backend and compare it with exact LOF."""
+    model = LOFModel()
+    start = time.time()
+    model.train(vectors, neighbors, "euclidean", 1, algorithm=algorithm, ivf_probes=probes or 8)
+    train_time = time.time() - start
+    start = time.time()
+    scores = np.array([score for _, score in model.predict(vectors)])
+    score_time = time.time() - start
+    anomalies = scores > 1
+    result = {"algorithm": algorithm if probes is None else "%s(probes=%d)" % (algorithm, probes),
+              "train_s": train_time,
+              "score_s": score_time,
+              "neighbor_recall": 1.0,
+              "anomaly_recall": 1.0,
+              "score_corr": 1.0}
+    if exact is not None:
+        exact_distances, exact_scores = exact
+        if algorithm == "ivf":
+            found, _ = model.model.index.kneighbors(vectors, exact_distances.shape[1])
+            # Compared by distance, logs often have many identical vectors
+            result["neighbor_recall"] = float(np.mean(found <= exact_distances[:, -1:] + 1e-9))
+        exact_anomalies = exact_scores > 1
+        if exact_anomalies.any():
+            result["anomaly_recall"] = float(np.mean(anomalies[exact_anomalies]))
+        result["score_corr"] = float(np.corrcoef(scores, exact_scores)[0, 1])
+    return result, scores
+
+
+def main():
+    """Run the comparison and print or save the results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="validation data files, all of validation_data by default")
+    parser.add_argument("--neighbors", type=int, default=Configuration.LOF_NEIGHBORS)
+    parser.add_argument("--probes", type=int, nargs="+", default=[4, 8, 16], help="ivf probes to evaluate")
+    parser.add_argument("--output", help="write results as json to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for path in args.files or sorted(glob.glob(os.path.join(ROOT, "validation_data", "*.json"))):
+        vectors = encode(path)
+        neighbors = min(args.neighbors, len(vectors) - 1)
+        exact_distances, _ = NearestNeighbors(n_neighbors=neighbors, algorithm="brute").fit(vectors).kneighbors(vectors)
+        brute, exact_scores = evaluate(vectors, neighbors, "brute", None, None)
+        rows = [brute]
+        for algorithm in ("kd_tree", "ball_tree"):
+            rows.append(evaluate(vectors, neighbors, algorithm, None, (exact_distances, exact_scores))[0])
+        for probes in args.probes:
+            rows.append(evaluate(vectors, neighbors, "ivf", probes, (exact_distances, exact_scores))[0])
+        name = os.path.basename(path)
+        results[name] = rows
+        print("%s: %d logs, %d neighbours" % (name, len(vectors), neighbors))
+        for row in rows:
+            print("    %-16s train %7.2fs score %7.2fs neighbour recall %.3f anomaly recall %.3f score corr %.3f"
+                  % (row["algorithm"], row["train_s"], row["score_s"], row["neighbor_recall"],
+                     row["anomaly_recall"], row["score_corr"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
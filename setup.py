@@ -34,6 +34,7 @@ REQUIRED_PKG = [
     "tornado==5.1.1",
     "pymongo==3.12.1",
     "mysql-connector-python==8.0.27",
+    "pyarrow==6.0.1",
 ]
 
 setup(
@@ -0,0 +1,64 @@
+"""Test the NumPy forward pass of the autoencoder used for LOF inference."""
+import numpy as np
+import pytest
+from anomaly_detector.model.ae_inference import AutoEncoderInference
+
+UNITS = [25, 64, 32, 16, 8, 16, 32, 64, 25]
+
+
+def random_engine(seed=0):
+    """Create an engine with random weights shaped like AutoEncoderModel."""
+    rng = np.random.RandomState(seed)
+    weights = []
+    for n_in, n_out in zip(UNITS[:-1], UNITS[1:]):
+        weights.append(rng.normal(scale=0.3, size=(n_in, n_out)))
+        weights.append(rng.normal(scale=0.1, size=n_out))
+    return AutoEncoderInference(weights, scale=np.full(UNITS[0], 0.5), offset=np.full(UNITS[0], 0.25),
+                                threshold=0.01, batch_size=7)
+
+
+@pytest.mark.core
+@pytest.mark.lof_model
+def test_exported_weights_round_trip(tmpdir):
+    """Check an engine loaded from .npz scores exactly like the exported one."""
+    engine = random_engine()
+    path = str(tmpdir.join("AE.npz"))
+    engine.save(path)
+    loaded = AutoEncoderInference.load(path)
+    vectors = np.random.RandomState(1).rand(30, UNITS[0])
+    assert loaded.threshold == pytest.approx(engine.threshold)
+    assert loaded.batch_size == engine.batch_size
+    np.testing.assert_array_equal(loaded.reconstruction_errors(vectors), engine.reconstruction_errors(vectors))
+
+
+@pytest.mark.core
+@pytest.mark.lof_model
+def test_reconstruction_errors_are_per_row_msle():
+    """Check batched errors match a row by row mean squared logarithmic error."""
+    engine = random_engine()
+    vectors = np.random.RandomState(2).rand(30, UNITS[0]).astype(np.float32)
+    scaled = engine.transform(vectors)
+    expected = []
+    for row in scaled:
+        reconstructed = engine.reconstruct(row[np.newaxis, :])[0]
+        expected.append(np.mean((np.log(np.maximum(reconstructed, 1e-7) + 1) - np.log(np.maximum(row, 1e-7) + 1)) ** 2))
+    errors = engine.reconstruction_errors(vectors)
+    assert errors.dtype == np.float32
+    np.testing.assert_allclose(errors, expected, rtol=1e-5)
+
+
+@pytest.mark.core
+@pytest.mark.lof_model
+def test_matches_keras_autoencoder():
+    """Check the NumPy forward pass reproduces the keras model it was exported from."""
+    pytest.importorskip("tensorflow")
+    from sklearn.preprocessing import MinMaxScaler
+    from tensorflow.keras.losses import msle
+    from anomaly_detector.model.ae_model import AutoEncoderModel
+    vectors = np.random.RandomState(3).rand(64, UNITS[0]).astype(np.float32)
+    scaler = MinMaxScaler().fit(vectors)
+    model = AutoEncoderModel(output_units=UNITS[0])
+    scaled = scaler.transform(vectors).astype(np.float32)
+    expected = msle(model(scaled), scaled).numpy()
+    engine = AutoEncoderInference.from_model(model, scaler, threshold=0.0)
+    np.testing.assert_allclose(engine.reconstruction_errors(vectors), expected, rtol=1e-4, atol=1e-7)
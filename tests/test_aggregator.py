@@ -0,0 +1,86 @@
+"""Test aggregating similar logs before scoring them."""
+import numpy as np
+import pytest
+from anomaly_detector.config import Configuration
+from anomaly_detector.model.aggregator import Aggregation, LogAggregator
+
+
+@pytest.fixture
+def aggregator():
+    """Create an aggregator clustering logs closer than 0.5."""
+    config = Configuration()
+    config.AGGR_EPS = 0.5
+    config.AGGR_MIN_SAMPLES = 3
+    return LogAggregator(config)
+
+
+@pytest.mark.core
+@pytest.mark.aggregation
+def test_duplicates_count_towards_clusters(aggregator):
+    """Check exact duplicates make a cluster dense enough, and outliers stay on their own."""
+    vectors = np.array([[0.0, 0.0], [0.0, 0.0], [0.1, 0.0], [5.0, 5.0], [0.0, 0.0], [9.0, 0.0]])
+    aggregation = aggregator.aggregate(vectors)
+
+    assert len(aggregation.representatives) == 3
+    assert len(set(aggregation.clusters[[0, 1, 2, 4]])) == 1
+    assert len(set(aggregation.clusters)) == 3
+    assert sorted(aggregation.counts) == [1, 1, 4]
+    # The duplicated vector is the closest to the center of its cluster
+    assert aggregation.representatives[aggregation.clusters[2]] == 0
+
+
+@pytest.mark.core
+@pytest.mark.aggregation
+def test_scores_fan_out_and_results_collapse(aggregator):
+    """Check every log gets the score of its representative and only representatives are stored."""
+    aggregation = aggregator.aggregate(np.array([[0.0, 0.0]] * 3 + [[5.0, 5.0]]))
+    scores = {cluster: float(cluster) for cluster in range(len(aggregation.representatives))}
+    expanded = aggregation.expand(scores)
+    assert expanded[0] == expanded[1] == expanded[2] != expanded[3]
+
+    logs = [{"message": "log %d" % i} for i in range(4)]
+    aggregation.label(logs)
+    assert logs[0]["cluster_id"] == logs[1]["cluster_id"] == logs[2]["cluster_id"] != logs[3]["cluster_id"]
+    # Results copied by a later stage still collapse, the labels travel with them
+    collapsed = aggregation.collapse([dict(log) for log in logs])
+    assert sorted(result["aggregated_count"] for result in collapsed) == [1, 3]
+
+
+@pytest.mark.core
+@pytest.mark.aggregation
+def test_collapse_keeps_a_cluster_whose_representative_was_dropped():
+    """Check another log of the cluster stands for it when the result of its representative is missing."""
+    aggregation = Aggregation(np.array([0, 3]), np.array([0, 0, 0, 1]))
+    logs = [{"message": "log %d" % i} for i in range(4)]
+    aggregation.label(logs)
+    collapsed = aggregation.collapse(logs[1:])
+    assert [(result["message"], result["aggregated_count"]) for result in collapsed] == [("log 1", 3), ("log 3", 1)]
+
+
+@pytest.mark.core
+@pytest.mark.aggregation
+def test_every_document_is_labelled_by_default():
+    """Check every log of a cluster gets the flag of its representative, for sinks updating each document."""
+    from anomaly_detector.adapters.lof_model_adapter import LOFModelAdapter
+
+    class FakeAggregator:
+        def aggregate(self, vectors):
+            return Aggregation(np.array([0, 3]), np.array([0, 0, 0, 1]))
+
+    class FakeW2V:
+        def one_vector(self, data):
+            return data
+
+    class FakeAutoEncoder:
+        threshold = 0.5
+
+    adapter = LOFModelAdapter.__new__(LOFModelAdapter)
+    adapter.storage_adapter = Configuration()
+    adapter.aggregator = FakeAggregator()
+    adapter.w2v_model = FakeW2V()
+    adapter.ae_model = FakeAutoEncoder()
+    adapter.process_scores = lambda representatives: [(-1, 2.0, 1.0), (1, 0.5, 0.1)]
+    json_logs = [{"message": "log %d" % i} for i in range(4)]
+    results = adapter.predict([[0.0], [0.0], [0.0], [5.0]], json_logs)
+    assert [result["anomaly"] for result in results] == [1, 1, 1, 0]
+    assert len({result["cluster_id"] for result in results[:3]}) == 1
@@ -0,0 +1,72 @@
+"""Test the bulk actions written by the ElasticSearch sink."""
+import pytest
+from elasticsearch5 import helpers
+from anomaly_detector.config import Configuration
+from anomaly_detector.storage.es_storage import ElasticSearchDataSink
+
+RESULTS = [{"message": "disk full", "_id": "a1", "_index": "logs-2021.10.01", "predict_id": "p1",
+            "anomaly": 1, "anomaly_score": 3.5},
+           {"message": "user logged in", "_id": "a2", "_index": "logs-2021.10.01", "predict_id": "p2",
+            "anomaly": 0, "anomaly_score": 0.2},
+           {"message": "cron started", "predict_id": "p3", "anomaly": 1, "anomaly_score": 2.5}]
+
+
+def create_sink(mode, threads=4):
+    """Create an ElasticSearch sink without connecting it."""
+    config = Configuration()
+    config.ES_TARGET_INDEX = "results-"
+    config.ES_SINK_MODE = mode
+    config.ES_BULK_THREADS = threads
+    sink = ElasticSearchDataSink.__new__(ElasticSearchDataSink)
+    sink.config = config
+    sink.es = None
+    return sink
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_document_mode_indexes_results_without_metadata():
+    """Check every result is indexed, without the metadata of its source document."""
+    actions = list(create_sink("document")._actions(RESULTS, "results-2021.10.01"))
+    assert len(actions) == 3
+    assert actions[0] == {"_index": "results-2021.10.01", "_type": "log",
+                          "_source": {"message": "disk full", "predict_id": "p1", "anomaly": 1, "anomaly_score": 3.5}}
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_anomaly_mode_skips_normal_logs():
+    """Check only anomalies are indexed."""
+    actions = list(create_sink("anomaly")._actions(RESULTS, "results-2021.10.01"))
+    assert [action["_source"]["predict_id"] for action in actions] == ["p1", "p3"]
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_update_mode_sends_partial_updates():
+    """Check source documents only get the prediction fields, other results are indexed."""
+    actions = list(create_sink("update")._actions(RESULTS, "results-2021.10.01"))
+    assert actions[1] == {"_op_type": "update", "_index": "logs-2021.10.01", "_type": "log", "_id": "a2",
+                          "doc": {"predict_id": "p2", "anomaly": 0, "anomaly_score": 0.2}}
+    assert actions[2]["_index"] == "results-2021.10.01"
+
+
+@pytest.mark.core
+@pytest.mark.storage
+@pytest.mark.parametrize("threads,helper", [(4, "parallel_bulk"), (1, "streaming_bulk")])
+def test_store_results_sends_bounded_chunks(monkeypatch, threads, helper):
+    """Check results go through the bulk helper with size bounded chunks."""
+    calls = []
+
+    def bulk(client, actions, **kwargs):
+        calls.append(kwargs)
+        for action in actions:
+            yield True, action
+
+    monkeypatch.setattr(helpers, helper, bulk)
+    sink = create_sink("document", threads)
+    sink.store_results(RESULTS)
+    assert len(calls) == 1
+    assert calls[0]["chunk_size"] == sink.config.ES_BULK_CHUNK_SIZE
+    assert calls[0]["max_chunk_bytes"] == sink.config.ES_BULK_MAX_BYTES
+    assert calls[0].get("thread_count", 1) == threads
@@ -0,0 +1,86 @@
+"""Test streaming retrieval of logs from ElasticSearch."""
+import json
+import pytest
+from anomaly_detector.config import Configuration
+from anomaly_detector.storage.es_storage import ElasticSearchDataSource
+from anomaly_detector.storage.prefetch import prefetch
+from anomaly_detector.storage.storage_attribute import ESStorageAttribute
+from anomaly_detector.storage.tokenizer import VOCABULARY
+
+
+class FakeElasticsearch:
+    """Serve hits through the search and scroll api."""
+
+    def __init__(self, total):
+        self.hits = [{"_id": str(i), "_index": "logs", "_source": {"message": "log line %d" % i}}
+                     for i in range(total)]
+        self.size = None
+        self.source = None
+        self.offset = 0
+        self.cleared = []
+
+    def _page(self):
+        page = self.hits[self.offset:self.offset + self.size]
+        self.offset += len(page)
+        return {"_scroll_id": "scroll", "hits": {"hits": page}}
+
+    def search(self, index, body, scroll):
+        query = json.loads(body)
+        self.size = query["size"]
+        self.source = query.get("_source")
+        return self._page()
+
+    def scroll(self, scroll_id, scroll):
+        return self._page()
+
+    def clear_scroll(self, scroll_id):
+        self.cleared.append(scroll_id)
+
+
+@pytest.fixture
+def source():
+    """Create ES source connected to a fake cluster."""
+    config = Configuration()
+    config.ES_INPUT_INDEX = "logs-"
+    config.ES_PAGE_SIZE = 4
+    source = ElasticSearchDataSource.__new__(ElasticSearchDataSource)
+    source.config = config
+    source.es = FakeElasticsearch(total=10)
+    return source
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_pages_are_streamed_beyond_one_search(source):
+    """Check all entries are read page by page, as whole documents by default."""
+    batches = list(source.iter_batches(ESStorageAttribute(time_range=60, number_of_entries=9)))
+    assert [len(data) for data, _ in batches] == [4, 4, 1]
+    assert batches[0][1][0] == {"message": "log line 0", "_id": "0", "_index": "logs"}
+    assert VOCABULARY.decode(batches[0][0].message[0]) == ["log", "line"]
+    assert source.es.source is None
+    assert source.es.cleared == ["scroll"]
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_retrieve_joins_pages(source):
+    """Check retrieve still returns one dataframe and all raw records."""
+    data, raw = source.retrieve(ESStorageAttribute(time_range=60, number_of_entries=100))
+    assert len(data) == len(raw) == 10
+    assert list(data.index) == list(range(10))
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_prefetch_forwards_items_and_errors():
+    """Check prefetch keeps order and raises the producer's errors in the consumer."""
+    def produce():
+        yield 1
+        yield 2
+        raise ValueError("connection lost")
+
+    items = []
+    with pytest.raises(ValueError):
+        for item in prefetch(produce(), size=1):
+            items.append(item)
+    assert items == [1, 2]
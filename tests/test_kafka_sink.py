@@ -0,0 +1,73 @@
+"""Test the messages the kafka sink sends for every mode."""
+import json
+import pytest
+from prometheus_client import REGISTRY
+from anomaly_detector.config import Configuration
+from anomaly_detector.storage.kafka_storage import KafkaSink
+
+
+class DeliveredFuture:
+    """Future of a message the broker acknowledged at once."""
+
+    def add_callback(self, callback):
+        callback(None)
+        return self
+
+    def add_errback(self, errback):
+        return self
+
+
+class FakeProducer:
+    """Record the messages sent and the flushes."""
+
+    def __init__(self):
+        self.sent = []
+        self.flushes = 0
+
+    def send(self, topic, value, key=None):
+        self.sent.append((key, json.loads(value)))
+        return DeliveredFuture()
+
+    def flush(self):
+        self.flushes += 1
+
+
+RESULTS = [{"message": "disk full", "hostname": "db", "anomaly": 1, "anomaly_score": 3.5},
+           {"message": "user logged in", "hostname": "web", "anomaly": 0, "anomaly_score": 0.2}]
+
+
+def create_sink(mode):
+    """Create a kafka sink with a fake producer."""
+    config = Configuration()
+    config.KF_SINK_MODE = mode
+    config.HOSTNAME_INDEX = "hostname"
+    sink = KafkaSink.__new__(KafkaSink)
+    sink.config = config
+    sink.topic = "anomalies"
+    sink.producer = FakeProducer()
+    return sink
+
+
+@pytest.mark.core
+@pytest.mark.storage
+@pytest.mark.parametrize("mode,expected", [("batch", [(None, RESULTS)]),
+                                           ("record", [(b"db", RESULTS[0]), (b"web", RESULTS[1])]),
+                                           ("anomaly", [(b"db", RESULTS[0])])])
+def test_sink_modes(mode, expected):
+    """Check what each mode sends, and that results are flushed once per store."""
+    sink = create_sink(mode)
+    delivered = REGISTRY.get_sample_value("aiops_lad_kafka_delivery_latency_seconds_count")
+    sink.store_results(RESULTS)
+    assert sink.producer.sent == expected
+    assert sink.producer.flushes == 1
+    assert REGISTRY.get_sample_value("aiops_lad_kafka_delivery_latency_seconds_count") == delivered + len(expected)
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_unknown_mode_is_rejected():
+    """Check a misspelled mode fails before connecting."""
+    config = Configuration()
+    config.KF_SINK_MODE = "records"
+    with pytest.raises(ValueError):
+        KafkaSink(config)
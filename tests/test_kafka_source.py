@@ -0,0 +1,67 @@
+"""Test micro-batch consumption of logs from Kafka."""
+import json
+from collections import namedtuple
+import pytest
+from kafka.structs import TopicPartition
+from anomaly_detector.config import Configuration
+from anomaly_detector.storage.kafka_storage import KafkaDataSource
+from anomaly_detector.storage.storage_attribute import ESStorageAttribute
+from anomaly_detector.storage.storage_catalog import StorageCatalog
+from anomaly_detector.storage.tokenizer import VOCABULARY
+
+Record = namedtuple("Record", ["offset", "value"])
+
+
+class FakeConsumer:
+    """In-process stand-in for a broker serving one partition."""
+
+    def __init__(self, values):
+        self.partition = TopicPartition("logs", 0)
+        self.records = [Record(offset, value) for offset, value in enumerate(values)]
+        self.position = 0
+        self.committed = None
+
+    def poll(self, timeout_ms, max_records):
+        records = self.records[self.position:self.position + max_records]
+        self.position += len(records)
+        return {self.partition: records} if records else {}
+
+    def commit(self, offsets):
+        self.committed = {partition: meta.offset for partition, meta in offsets.items()}
+
+
+@pytest.fixture
+def source():
+    """Create a kafka source consuming 5 logs in micro-batches of 2."""
+    config = Configuration()
+    config.KF_INPUT_TOPIC = "logs"
+    config.KF_BATCH_SIZE = 2
+    config.KF_BATCH_TIMEOUT = 0.1
+    source = KafkaDataSource.__new__(KafkaDataSource)
+    source.config = config
+    source._pending = {}
+    values = [json.dumps({"message": "disk %d is full" % i, "hostname": "db"}).encode() for i in range(3)]
+    values += [b"connection refused by peer\n", b"[1, 2]"]
+    source.consumer = FakeConsumer(values)
+    return source
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_micro_batches_commit_after_store(source):
+    """Check offsets are committed once per stored micro-batch and json or plain lines are accepted."""
+    attribute = ESStorageAttribute(60, 100)
+    data, logs = source.retrieve(attribute)
+    assert logs[0] == {"message": "disk 0 is full", "hostname": "db"}
+    assert VOCABULARY.decode(data.message[1]) == ["disk", "is", "full"]
+    assert source.consumer.committed is None
+    source.commit()
+    assert source.consumer.committed == {source.consumer.partition: 2}
+
+    batches = [logs for _ in range(3) for _, logs in source.iter_batches(attribute)]
+    assert [[log["message"] for log in logs] for logs in batches] == [["disk 2 is full", "connection refused by peer"],
+                                                                      ["[1, 2]"]]
+    source.commit()
+    assert source.consumer.committed == {source.consumer.partition: 5}
+    assert StorageCatalog.is_streaming("kafka.source")
+    assert not StorageCatalog.is_streaming("es.source")
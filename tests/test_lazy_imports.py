@@ -0,0 +1,35 @@
+"""Test that model and storage backends are only imported when used."""
+import subprocess
+import sys
+import pytest
+
+CHECK = """
+import sys
+import anomaly_detector.model, anomaly_detector.storage
+from anomaly_detector.storage import StorageCatalog
+from anomaly_detector.core import DetectorPipelineCatalog
+print(",".join(m for m in {} if m in sys.modules))
+"""
+
+
+@pytest.mark.core
+def test_backends_are_not_imported_eagerly():
+    """Check importing the packages and catalogs does not load heavy backends."""
+    backends = ["tensorflow", "gensim", "sompy", "matplotlib", "elasticsearch5", "pymongo", "mysql", "kafka"]
+    result = subprocess.run([sys.executable, "-c", CHECK.format(backends)],
+                            stdout=subprocess.PIPE, check=True, universal_newlines=True)
+    assert result.stdout.strip() == ""
+
+
+@pytest.mark.core
+def test_package_exports():
+    """Check every class listed by the packages is importable from them."""
+    import anomaly_detector.adapters as adapters
+    import anomaly_detector.model as model
+    import anomaly_detector.storage as storage
+    from anomaly_detector.model import SOMModel
+    from anomaly_detector.model.som_model import SOMModel as som_model
+    assert SOMModel is som_model
+    for package in (adapters, model, storage):
+        for name in package.__all__:
+            assert getattr(package, name) is not None
@@ -0,0 +1,61 @@
+"""Test streaming logs out of local files."""
+import gzip
+import io
+import json
+import pytest
+from anomaly_detector.config import Configuration
+from anomaly_detector.storage.line_reader import iter_json, iter_logs
+from anomaly_detector.storage.local_directory_storage import LocalDirectoryStorageDataSource
+from anomaly_detector.storage.local_storage import LocalStorageDataSource
+from anomaly_detector.storage.storage_attribute import DefaultStorageAttribute
+from anomaly_detector.storage.tokenizer import VOCABULARY
+
+LOGS = [{"message": "user %d logged in" % i, "hostname": "web"} for i in range(7)]
+
+
+@pytest.mark.core
+@pytest.mark.storage
+@pytest.mark.parametrize("text", [json.dumps(LOGS, indent=2),
+                                  "\n".join(json.dumps(log) for log in LOGS) + "\n"])
+def test_json_is_decoded_across_chunks(text):
+    """Check json arrays and json lines are read whole even when objects span chunks."""
+    assert list(iter_json(io.StringIO(text), chunk_size=7)) == LOGS
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_compressed_and_common_log_files(tmpdir):
+    """Check compressed json and common log format files."""
+    path = str(tmpdir.join("logs.json.gz"))
+    with gzip.open(path, "wt") as f:
+        json.dump(LOGS, f)
+    assert list(iter_logs(path)) == LOGS
+    path = tmpdir.join("logs.log")
+    path.write("2021-11-02 INFO disk is full\n2021-11-02 WARN disk is gone\n")
+    assert list(iter_logs(str(path))) == [{"message": "disk is full"}, {"message": "disk is gone"}]
+
+
+@pytest.mark.core
+@pytest.mark.storage
+@pytest.mark.parametrize("parallelism", [1, 2])
+def test_sources_stream_batches(tmpdir, parallelism):
+    """Check local sources yield batches of LS_BATCH_SIZE and retrieve joins them."""
+    for i in range(3):
+        tmpdir.join("day%d.log" % i).write("".join("2021-11-02 INFO %s\n" % log["message"] for log in LOGS))
+    # Only common log files are read from a directory
+    tmpdir.join("day.jsonl").write("\n".join(json.dumps(log) for log in LOGS))
+    tmpdir.join("README.md").write("not logs")
+    config = Configuration()
+    config.LS_INPUT_PATH = str(tmpdir)
+    config.LS_BATCH_SIZE = 5
+    config.PARALLELISM = parallelism
+    source = LocalDirectoryStorageDataSource(config)
+    batches = list(source.iter_batches(DefaultStorageAttribute(false_data=[{"message": "noise"}])))
+    assert [len(data) for data, _ in batches] == [5, 5, 5, 5, 2]
+    assert batches[-1][1][-1] == {"message": "noise"}
+    assert VOCABULARY.decode(batches[0][0].message[0]) == ["user", "logged", "in"]
+
+    config.LS_INPUT_PATH = str(tmpdir.join("day.jsonl"))
+    data, logs = LocalStorageDataSource(config).retrieve(DefaultStorageAttribute())
+    assert logs == LOGS
+    assert list(data.index) == list(range(7))
@@ -0,0 +1,37 @@
+"""Test the LOF model."""
+import numpy as np
+import pytest
+from sklearn.neighbors import LocalOutlierFactor
+from anomaly_detector.model.lof_model import LOFModel
+
+
+@pytest.mark.core
+@pytest.mark.lof_model
+@pytest.mark.parametrize("algorithm", ["auto", "ivf"])
+def test_training_scores_match_fit_predict(algorithm):
+    """Check training scores taken from the fitted model match an outlier detection run on the training logs."""
+    rng = np.random.RandomState(0)
+    vectors = np.vstack([rng.normal(size=(300, 25)), rng.uniform(-8, 8, size=(10, 25))])
+    model = LOFModel()
+    model.train(vectors, 20, "euclidean", 1, algorithm=algorithm, ivf_probes=100)
+    preds, scores = zip(*model.training_scores())
+    exact = LocalOutlierFactor(n_neighbors=20)
+    np.testing.assert_array_equal(preds, exact.fit_predict(vectors))
+    np.testing.assert_allclose(scores, -exact.negative_outlier_factor_)
+
+
+@pytest.mark.core
+@pytest.mark.lof_model
+def test_messages_starting_with_an_empty_log_are_encoded():
+    """Check a batch whose first log has no words is scored as messages, not as vectors."""
+    from anomaly_detector.adapters.lof_model_adapter import LOFModelAdapter
+
+    class FakeW2V:
+        def score_messages(self, logs, model_version, score_func):
+            return ["encoded"] * len(logs)
+
+    adapter = LOFModelAdapter.__new__(LOFModelAdapter)
+    adapter.w2v_model = FakeW2V()
+    adapter.model = LOFModel()
+    assert adapter.process_scores([[], ["disk", "full"]]) == ["encoded", "encoded"]
+    assert adapter.process_scores([[], []]) == ["encoded", "encoded"]
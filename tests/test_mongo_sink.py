@@ -0,0 +1,144 @@
+"""Test MongoDB storage without a server."""
+import datetime
+import json
+import pytest
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from anomaly_detector.config import Configuration
+from anomaly_detector.storage.mongodb_storage import MongoDBDataSink, MongoDBDataStorageSource
+from anomaly_detector.storage.storage_attribute import MGStorageAttribute
+from anomaly_detector.storage.tokenizer import VOCABULARY
+
+
+class FakeCursor:
+    """Iterate over documents like a pymongo cursor."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.iterator = None
+        self.closed = False
+
+    def sort(self, sort):
+        self.sort_spec = sort
+        return self
+
+    def limit(self, limit):
+        self.docs = self.docs[:limit]
+        return self
+
+    def batch_size(self, batch_size):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.iterator is None:
+            self.iterator = iter(self.docs)
+        return next(self.iterator)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCollection:
+    """Serve documents and record the bulk writes sent to the collection."""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.bulks = []
+
+    def find(self, query, projection):
+        self.projection = projection
+        self.cursor = FakeCursor([{key: doc[key] for key in list(projection) + ["_id"]} for doc in self.docs])
+        return self.cursor
+
+    def bulk_write(self, requests, ordered=True):
+        self.bulks.append((requests, ordered))
+
+
+@pytest.fixture
+def config():
+    """Configure a MongoDB server that is never contacted."""
+    cfg = Configuration()
+    cfg.MG_HOST = "mongo.invalid"
+    cfg.MG_DB = "logs"
+    cfg.MG_COLLECTION = "web_logs"
+    cfg.HOSTNAME_INDEX = "hostname"
+    cfg.DATETIME_INDEX = "timestamp"
+    cfg.MG_BULK_SIZE = 2
+    cfg.MG_BATCH_SIZE = 4
+    return cfg
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_source_and_sink_share_client(config):
+    """Check one pooled client serves every source and sink of a server."""
+    source = MongoDBDataStorageSource(config)
+    sink = MongoDBDataSink(config)
+    assert source.mg is sink.mg
+    assert sink.mg.max_pool_size == config.MG_MAX_POOL_SIZE
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_results_are_written_in_unordered_bulks(config):
+    """Check results are sent as chunks of unordered updates."""
+    collection = FakeCollection()
+    sink = MongoDBDataSink.__new__(MongoDBDataSink)
+    sink.config = config
+    sink.mg = {"logs": {"web_logs": collection}}
+    # Records read from MongoDB keep their ObjectId, records that went through json have the extended form
+    sink.store_results([{"_id": ObjectId("615700ac5f1b2c6f7a7b8e0%d" % i) if i % 2 else
+                         {"$oid": "615700ac5f1b2c6f7a7b8e0%d" % i}, "anomaly": i == 1,
+                         "anomaly_score": 0.5 * i} for i in range(5)])
+    assert [len(requests) for requests, _ in collection.bulks] == [2, 2, 1]
+    assert not any(ordered for _, ordered in collection.bulks)
+    normal, anomaly = collection.bulks[0][0]
+    assert normal == UpdateOne({"_id": ObjectId("615700ac5f1b2c6f7a7b8e00")}, {"$set": {"is_anomaly": False}})
+    assert anomaly == UpdateOne({"_id": ObjectId("615700ac5f1b2c6f7a7b8e01")},
+                                {"$set": {"is_anomaly": True, "anomaly_score": 0.5}})
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_logs_are_read_in_batches_with_their_object_ids(config, tmpdir):
+    """Check only the needed fields are read and documents are returned in extended json."""
+    config.MODEL_DIR = str(tmpdir)
+    now = datetime.datetime.now()
+    docs = [{"_id": ObjectId("615700ac5f1b2c6f7a7b8e%02d" % i), "message": "GET /index.html %d" % i,
+             "timestamp": now, "hostname": "web", "headers": "x" * 100} for i in range(10)]
+    collection = FakeCollection(docs)
+    source = MongoDBDataStorageSource.__new__(MongoDBDataStorageSource)
+    source.config = config
+    source.mg = {"logs": {"web_logs": collection}}
+
+    batches = list(source.iter_batches(MGStorageAttribute(60, 9)))
+    assert [len(data) for data, _ in batches] == [4, 4, 1]
+    assert collection.projection == {"message": 1, "timestamp": 1, "hostname": 1}
+    assert VOCABULARY.decode(batches[0][0].message[1]) == ["GET", "index", "html"]
+    assert batches[0][1][1]["_id"] == {"$oid": str(docs[1]["_id"])}
+    assert json.loads(json.dumps(batches[0][1])) == batches[0][1]
+    assert collection.cursor.closed
+
+    data, raw = source.retrieve(MGStorageAttribute(60, 100))
+    assert len(data) == len(raw) == 10
+    assert list(data.index) == list(range(10))
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_empty_field_names_are_not_projected(config, tmpdir):
+    """Check an unset HOSTNAME_INDEX does not end up as an empty field path."""
+    config.MODEL_DIR = str(tmpdir)
+    config.HOSTNAME_INDEX = ""
+    docs = [{"_id": ObjectId("615700ac5f1b2c6f7a7b8e00"), "message": "GET /index.html",
+             "timestamp": datetime.datetime.now()}]
+    collection = FakeCollection(docs)
+    source = MongoDBDataStorageSource.__new__(MongoDBDataStorageSource)
+    source.config = config
+    source.mg = {"logs": {"web_logs": collection}}
+
+    list(source.iter_batches(MGStorageAttribute(60, 9)))
+    assert collection.projection == {"message": 1, "timestamp": 1}
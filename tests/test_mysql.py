@@ -0,0 +1,106 @@
+"""Test paging through MySQL logs, on an sqlite table standing in for the server."""
+import datetime
+import sqlite3
+import mysql.connector
+import pytest
+from anomaly_detector.config import Configuration
+from anomaly_detector.storage.mysql_storage import MySQLDataStorageSource
+from anomaly_detector.storage.storage_attribute import MySQLStorageAttribute
+from anomaly_detector.storage.tokenizer import VOCABULARY
+
+
+class SqliteCursor:
+    """Run queries written for mysql.connector on sqlite."""
+
+    def __init__(self, db, queries):
+        self.cursor = db.cursor()
+        self.queries = queries
+
+    def execute(self, sql, params=()):
+        self.queries.append(sql)
+        try:
+            self.cursor.execute(sql.replace("%s", "?"), [str(p) if isinstance(p, datetime.datetime) else p
+                                                         for p in params])
+        except sqlite3.OperationalError as ex:
+            raise mysql.connector.errors.ProgrammingError(msg=str(ex))
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def close(self):
+        self.cursor.close()
+
+
+class SqliteConnection:
+    """Hand out cursors over an sqlite database."""
+
+    def __init__(self, db):
+        self.db = db
+        self.queries = []
+
+    def cursor(self):
+        return SqliteCursor(self.db, self.queries)
+
+
+@pytest.fixture
+def source(tmpdir):
+    """Create a MySQL source reading a table of 10 logs, 3 of which share their timestamp."""
+    now = datetime.datetime.now().replace(microsecond=0)
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE logs (id INTEGER, message TEXT, datetime TEXT, hostname TEXT)")
+    for i in range(10):
+        timestamp = now - datetime.timedelta(seconds=30 - min(i, 5))
+        db.execute("INSERT INTO logs VALUES (?, ?, ?, ?)", (i, "user %d logged in" % i, str(timestamp), "web"))
+    config = Configuration()
+    config.MODEL_DIR = str(tmpdir)
+    config.MYSQL_INPUT_TABLE = "logs"
+    config.MESSAGE_INDEX = "message"
+    config.DATETIME_INDEX = "datetime"
+    config.HOSTNAME_INDEX = "hostname"
+    config.LOGSOURCE_HOSTNAME = "web"
+    config.MYSQL_BATCH_SIZE = 4
+    source = MySQLDataStorageSource.__new__(MySQLDataStorageSource)
+    source.config = config
+    source.db = SqliteConnection(db)
+    return source
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_pages_continue_after_last_row(source):
+    """Check every row is read once across pages, even when a page ends among equal timestamps."""
+    batches = list(source.iter_batches(MySQLStorageAttribute(60, 100)))
+    assert [len(data) for data, _ in batches] == [4, 4, 2]
+    messages = [log["message"] for _, raw in batches for log in raw]
+    assert messages == ["user %d logged in" % i for i in (9, 8, 7, 6, 5, 4, 3, 2, 1, 0)]
+    assert VOCABULARY.decode(batches[0][0].message[0]) == ["user", "logged", "in"]
+    assert "LIMIT 4" in source.db.queries[-1]
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_incremental_retrieval_resumes_after_watermark(source):
+    """Check the next loop starts after the last committed row."""
+    data, raw = source.retrieve(MySQLStorageAttribute(60, 6, incremental=True))
+    assert [log["message"] for log in raw][-1] == "user 5 logged in"
+    source.commit()
+    data, raw = source.retrieve(MySQLStorageAttribute(60, 100, incremental=True))
+    assert [log["message"] for log in raw] == ["user %d logged in" % i for i in (6, 7, 8, 9)]
+    assert len(data) == 4
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_table_without_id_column_is_read_with_one_query(source):
+    """Check tables without the tie breaking id column are still read, as before keyset paging."""
+    source.db.db.execute("CREATE TABLE old_logs (message TEXT, datetime TEXT, hostname TEXT)")
+    source.db.db.execute("INSERT INTO old_logs SELECT message, datetime, hostname FROM logs")
+    source.config.MYSQL_INPUT_TABLE = "old_logs"
+    batches = list(source.iter_batches(MySQLStorageAttribute(60, 100)))
+    assert [len(data) for data, _ in batches] == [10]
+    assert "id" not in source.db.queries[-1]
+    data, raw = source.retrieve(MySQLStorageAttribute(60, 100, incremental=True))
+    assert len(raw) == 10
+    source.commit()
+    data, raw = source.retrieve(MySQLStorageAttribute(60, 100, incremental=True))
+    assert raw == []
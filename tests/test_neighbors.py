@@ -0,0 +1,36 @@
+"""Test the approximate neighbour search backend of LOF."""
+import numpy as np
+import pytest
+from sklearn.neighbors import LocalOutlierFactor
+from anomaly_detector.model.neighbors import ApproximateLOF, IVFIndex
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    """Two clusters of log vectors and a few outliers."""
+    rng = np.random.RandomState(0)
+    return np.vstack([rng.normal(size=(500, 25)), rng.normal(size=(500, 25)) * 0.3 + 3,
+                      rng.uniform(-6, 6, size=(20, 25))])
+
+
+@pytest.mark.core
+@pytest.mark.lof_model
+def test_ivf_probing_all_cells_is_exact(vectors):
+    """Check LOF on an index searching every cell matches sklearn's exact LOF."""
+    exact = LocalOutlierFactor(n_neighbors=10, novelty=True).fit(vectors)
+    approximate = ApproximateLOF(n_neighbors=10, n_cells=6, n_probes=6).fit(vectors)
+    queries = np.random.RandomState(1).normal(size=(50, 25)) * 2
+    np.testing.assert_allclose(approximate.negative_outlier_factor_, exact.negative_outlier_factor_)
+    np.testing.assert_allclose(approximate.score_samples(queries), exact.score_samples(queries))
+    np.testing.assert_array_equal(approximate.predict(queries), exact.predict(queries))
+
+
+@pytest.mark.core
+@pytest.mark.lof_model
+def test_ivf_neighbours_exclude_the_query_itself(vectors):
+    """Check neighbours of indexed vectors are sorted and never the vector itself."""
+    index = IVFIndex(n_probes=2).fit(vectors)
+    distances, indices = index.kneighbors(None, 5)
+    assert distances.shape == indices.shape == (len(vectors), 5)
+    assert not np.any(indices == np.arange(len(vectors))[:, np.newaxis])
+    assert np.all(np.diff(distances, axis=1) >= 0)
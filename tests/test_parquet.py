@@ -0,0 +1,63 @@
+"""Test storing results to and reading logs from parquet."""
+import datetime
+import pyarrow
+import pyarrow.parquet
+import pytest
+from anomaly_detector.config import Configuration
+from anomaly_detector.storage.parquet_storage import ParquetDataSink, ParquetDataSource
+from anomaly_detector.storage.storage_attribute import ESStorageAttribute
+from anomaly_detector.storage.tokenizer import VOCABULARY
+
+
+@pytest.fixture
+def config(tmpdir):
+    """Configure parquet source and sink on a temporary directory."""
+    config = Configuration()
+    config.PQ_INPUT_PATH = str(tmpdir.join("results"))
+    config.PQ_OUTPUT_PATH = str(tmpdir.join("results"))
+    config.DATETIME_INDEX = "timestamp"
+    config.HOSTNAME_INDEX = "hostname"
+    config.PQ_COLUMNS = "timestamp,hostname"
+    config.PQ_BATCH_SIZE = 3
+    return config
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_results_round_trip_with_pushdown(config):
+    """Check results are written column-wise and read back filtered by hostname and time."""
+    start = datetime.datetime(2021, 11, 2)
+    sink = ParquetDataSink(config)
+    for day in range(2):
+        sink.store_results([{"message": "user %d logged in" % i, "hostname": "web" if i % 2 else "db",
+                             "timestamp": start + datetime.timedelta(days=day, hours=i),
+                             "anomaly": i == 3, "anomaly_score": 0.5 * i, "e_message": "dropped"}
+                            for i in range(6)])
+
+    table = pyarrow.parquet.read_table(config.PQ_OUTPUT_PATH)
+    assert table.schema.field("anomaly_score").type == pyarrow.float32()
+    assert "e_message" not in table.schema.names
+
+    config.LOGSOURCE_HOSTNAME = "web"
+    config.PQ_START_TIME = "2021-11-02T02:00:00"
+    config.PQ_END_TIME = "2021-11-03"
+    config.PQ_COLUMNS = "hostname"
+    data, logs = ParquetDataSource(config).retrieve(ESStorageAttribute(60, 100))
+    assert logs == [{"message": "user %d logged in" % i, "hostname": "web"} for i in (3, 5)]
+    assert VOCABULARY.decode(data.message[0]) == ["user", "logged", "in"]
+
+    config.LOGSOURCE_HOSTNAME = "localhost"
+    config.PQ_START_TIME = config.PQ_END_TIME = ""
+    batches = list(ParquetDataSource(config).iter_batches(ESStorageAttribute(60, 8)))
+    assert sum(len(data) for data, _ in batches) == 8
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_results_are_written_to_working_directory_by_default(tmpdir, monkeypatch):
+    """Check an empty PQ_OUTPUT_PATH writes into the working directory instead of failing."""
+    monkeypatch.chdir(tmpdir)
+    config = Configuration()
+    sink = ParquetDataSink(config)
+    sink.store_results([{"message": "disk is full", "anomaly": True, "anomaly_score": 1.5}])
+    assert len(tmpdir.listdir(lambda path: path.ext == ".parquet")) == 1
@@ -3,7 +3,10 @@ from anomaly_detector.adapters.som_model_adapter import SomModelAdapter
 from anomaly_detector.adapters.som_storage_adapter import SomStorageAdapter
 from anomaly_detector.core.job import SomTrainJob, SomInferenceJob
 from anomaly_detector.config import Configuration
+from anomaly_detector.model import SOMModel
+from anomaly_detector.model.codebook_distance import min_codebook_distance
 
+import numpy as np
 import pytest
 import random
 
@@ -43,3 +46,33 @@ def test_model_shape(cnf_hadoop_2k):
     tc = SomTrainJob(node_map=2, model_adapter=model_adapter)
     result, dist = tc.execute()
     assert model_adapter.model.model.shape[0:2] == (2, 2)
+
+
+@pytest.mark.core
+@pytest.mark.som_model
+def test_batched_distance_matches_node_loop():
+    """Test that batched codebook scoring gives the distance to the nearest node of the map."""
+    rng = np.random.RandomState(55)
+    som = rng.rand(4, 4, 25)
+    logs = rng.rand(300, 25).astype(np.float32)
+    expected = [min(np.linalg.norm(som[x][y] - log) for x in range(4) for y in range(4)) for log in logs]
+    # A tiny memory budget forces the logs to be scored in several chunks
+    dist = min_codebook_distance(logs, som, memory_budget=0.001)
+    assert np.allclose(dist, expected, rtol=0, atol=1e-12)
+
+
+@pytest.mark.core
+@pytest.mark.som_model
+@pytest.mark.parametrize("train_mode", ["online", "batch"])
+def test_numpy_som_training(train_mode):
+    """Test that the numpy SOM trains a map of the configured size that fits the data."""
+    config = Configuration()
+    config.SOM_TRAIN_MODE = train_mode
+    config.SOM_BATCH_EPOCHS = 5
+    rng = np.random.RandomState(55)
+    logs = rng.rand(500, 25)
+    model = SOMModel(config=config)
+    model.train(logs, 5, 2000, 1)
+    assert model.model.shape == (5, 5, 25)
+    random_map = rng.rand(5, 5, 25)
+    assert np.mean(model.get_anomaly_score(logs, 1)) < np.mean(min_codebook_distance(logs, random_map))
@@ -1,7 +1,9 @@
 """Test storage catalog ability to read and write data."""
 import pytest
+from anomaly_detector.config import Configuration
 from anomaly_detector.storage.local_storage import DefaultStorageAttribute
 from anomaly_detector.storage.storage_catalog import StorageCatalog
+from anomaly_detector.storage.storage_proxy import StorageProxy
 from anomaly_detector.storage.storage_source import StorageSource
 from anomaly_detector.storage.storage_sink import StorageSink
 import json
@@ -33,3 +35,41 @@ def test_storage_catalog_local_file_save_data(cnf_local_500):
         data = json.load(json_file)
         print(data)
     assert data == sample_output
+
+
+@pytest.mark.storage
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_local_sink_keeps_every_batch_of_a_loop(tmpdir, pipeline):
+    """Check results of an input longer than LS_BATCH_SIZE are all written, and the next loop replaces them."""
+    input_path = tmpdir.join("input.log")
+    input_path.write("".join("2021-10-01 INFO log line %d\n" % i for i in range(25)))
+    config = Configuration()
+    config.STORAGE_DATASOURCE = "local"
+    config.STORAGE_DATASINK = "local"
+    config.STORAGE_PIPELINE = pipeline
+    config.LS_INPUT_PATH = str(input_path)
+    config.LS_OUTPUT_PATH = str(tmpdir.join("results.json"))
+    config.LS_BATCH_SIZE = 10
+    proxy = StorageProxy(config)
+    for _ in range(2):
+        for data, raw in proxy.iter_batches(DefaultStorageAttribute()):
+            proxy.store_results(raw)
+        proxy.flush()
+        with open(config.LS_OUTPUT_PATH) as json_file:
+            results = json.load(json_file)
+        assert [result["message"] for result in results] == ["log line %d" % i for i in range(25)]
+
+
+@pytest.mark.storage
+def test_local_source_keeps_whole_records(tmpdir):
+    """Check every field of the logs is loaded, embedded ones under their dotted path."""
+    input_path = tmpdir.join("input.json")
+    input_path.write(json.dumps([{"log": {"msg": "disk full"}, "hostname": "node1"}]))
+    config = Configuration()
+    config.LS_INPUT_PATH = str(input_path)
+    config.MESSAGE_INDEX = "log.msg"
+    storage = StorageCatalog(config=config, storage_api="local.source").get_storage_api()
+    data, raw = storage.retrieve(DefaultStorageAttribute())
+    assert list(data["log.msg"]) == ["disk full"]
+    assert list(data["hostname"]) == ["node1"]
+    assert raw == [{"log": {"msg": "disk full"}, "hostname": "node1"}]
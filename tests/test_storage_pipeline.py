@@ -0,0 +1,120 @@
+"""Test pipelined retrieval and storage of StorageProxy."""
+import threading
+import pandas
+import pytest
+from anomaly_detector.config import Configuration
+from anomaly_detector.storage.background_writer import BackgroundWriter
+from anomaly_detector.storage.storage_attribute import DefaultStorageAttribute
+from anomaly_detector.storage.storage_proxy import StorageProxy
+
+
+class FakeSource:
+    """Serve batches of logs, advancing a position with every batch."""
+
+    def __init__(self, batches):
+        self.batches = batches
+        self.pending = None
+        self.committed = []
+
+    def iter_batches(self, storage_attribute):
+        for i in range(self.batches):
+            self.pending = i
+            yield pandas.DataFrame({"message": ["log %d" % i]}), [{"message": "log %d" % i}]
+
+    def checkpoint(self):
+        return self.pending
+
+    def commit(self, checkpoint=None):
+        self.committed.append(self.pending if checkpoint is None else checkpoint)
+
+
+class SlowSink:
+    """Record stored results, once released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.stored = []
+
+    def store_results(self, entries):
+        self.release.wait()
+        self.stored.append(entries)
+
+    def flush(self):
+        pass
+
+
+@pytest.fixture
+def proxy():
+    """Create a pipelined storage proxy over a fake source and sink."""
+    config = Configuration()
+    config.LS_INPUT_PATH = "validation_data/Hadoop_2k.json"
+    config.STORAGE_DATASINK = "stdout"
+    config.STORAGE_PIPELINE = True
+    proxy = StorageProxy(config)
+    proxy.source = FakeSource(batches=5)
+    proxy.sink = SlowSink()
+    return proxy
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_results_are_stored_in_background(proxy):
+    """Check scoring goes on while results are stored, and positions are committed batch by batch."""
+    for data, raw in proxy.iter_batches(DefaultStorageAttribute(60, 100)):
+        proxy.store_results(raw)
+        if raw[0]["message"] == "log 1":
+            # Two results fit in the queue, the sink has stored nothing yet
+            assert proxy.sink.stored == []
+            proxy.sink.release.set()
+    proxy.flush()
+    assert [entries[0]["message"] for entries in proxy.sink.stored] == ["log %d" % i for i in range(5)]
+    assert proxy.source.committed == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_failed_store_is_raised_and_not_committed(proxy):
+    """Check a sink failure reaches the caller and the positions after it stay uncommitted."""
+    def fail(entries):
+        raise IOError("sink is down")
+
+    proxy.sink.store_results = fail
+    with pytest.raises(IOError):
+        for data, raw in proxy.iter_batches(DefaultStorageAttribute(60, 100)):
+            proxy.store_results(raw)
+        proxy.flush()
+    assert proxy.source.committed == []
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_background_writer_applies_backpressure():
+    """Check submit blocks while the queue is full."""
+    release = threading.Event()
+    written = []
+    writer = BackgroundWriter(lambda item: (release.wait(), written.append(item)), size=1)
+    writer.submit(1)
+    writer.submit(2)
+    blocked = threading.Thread(target=writer.submit, args=(3,))
+    blocked.start()
+    blocked.join(timeout=0.2)
+    assert blocked.is_alive()
+    release.set()
+    blocked.join()
+    writer.flush()
+    assert written == [1, 2, 3]
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_es_metadata_is_not_handed_to_other_sinks():
+    """Check the metadata ElasticSearch records carry for its own sink is removed for other sinks."""
+    config = Configuration()
+    config.STORAGE_DATASOURCE = "es"
+    config.STORAGE_DATASINK = "stdout"
+    proxy = StorageProxy(config)
+    proxy.source = FakeSource(batches=1)
+    proxy.sink = SlowSink()
+    proxy.sink.release.set()
+    proxy.store_results([{"message": "disk full", "_id": "a1", "_index": "logs-2021.10.01", "anomaly": 1}])
+    assert proxy.sink.stored == [[{"message": "disk full", "anomaly": 1}]]
@@ -0,0 +1,48 @@
+"""Test mining log templates before encoding."""
+import pytest
+from anomaly_detector.config import Configuration
+from anomaly_detector.model.template_miner import TemplateMiner, mask
+from anomaly_detector.storage.tokenizer import VOCABULARY
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_variable_fields_are_masked():
+    """Check ips, paths, hex ids and numbers are replaced with placeholders."""
+    assert mask("Accepted 10.1.2.3:5000 for /var/log/app.log in 3.5 s, id 0x1f3a, blk_-160899968") == \
+        "Accepted <IP> for <PATH> in <NUM> s, id <HEX>, blk_-<NUM>"
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_lines_of_one_template_share_tokens(tmpdir):
+    """Check lines differing in variable fields get one template, encoded from its text."""
+    miner = TemplateMiner(Configuration())
+    logs = [{"message": "user %s logged in from 10.0.0.%d" % (user, i)}
+            for i, user in enumerate(["alice", "bob", "carol"])] + [{"message": "disk /dev/sda1 full"}]
+    tokens = miner.transform(logs)
+
+    assert [log["template_id"] for log in logs] == [0, 0, 0, 1]
+    assert str(miner.templates[0]) == "user <*> logged in from <IP>"
+    assert tokens[0] is tokens[2]
+    assert VOCABULARY.decode(tokens[0]) == ["user", "logged", "in", "from", "IP"]
+
+    path = str(tmpdir.join("templates.json"))
+    miner.save(path)
+    restored = TemplateMiner(Configuration())
+    restored.load(path)
+    assert restored.add("user dave logged in from 10.0.0.9").template_id == 0
+    assert restored.add("disk /dev/sdb2 full").template_id == 1
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_messages_are_found_at_dotted_paths():
+    """Check a MESSAGE_INDEX leading into embedded documents, as MongoDB sources read it."""
+    config = Configuration()
+    config.MESSAGE_INDEX = "message.text"
+    miner = TemplateMiner(config)
+    logs = [{"message": {"text": "disk %d is full" % i}} for i in range(2)] + [{"hostname": "web"}]
+    miner.transform(logs)
+    assert [log["template_id"] for log in logs] == [0, 0, 1]
+    assert str(miner.templates[0]) == "disk <NUM> is full"
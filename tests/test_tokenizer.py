@@ -0,0 +1,63 @@
+"""Test the tokenizer interning log words as integer ids."""
+import numpy as np
+import pandas
+import pytest
+from anomaly_detector.model.vector_cache import VectorCache
+from anomaly_detector.storage.storage import DataCleaner
+from anomaly_detector.storage.tokenizer import Sentences, Vocabulary, is_tokenized, tokenize
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_words_are_interned_as_ids():
+    """Check every word gets one id and messages are views of a single id buffer."""
+    vocabulary = Vocabulary()
+    rows = tokenize(["Connection to 10.0.0.1 refused", "", "connection refused, retry"], vocabulary)
+    assert vocabulary.tokens == ["Connection", "to", "refused", "connection", "retry"]
+    assert [row.tolist() for row in rows] == [[0, 1, 2], [], [3, 2, 4]]
+    assert rows[0].dtype == np.int32
+    assert rows[0].base is rows[2].base
+    assert vocabulary.decode(rows[2]) == ["connection", "refused", "retry"]
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_messages_of_equal_length_stay_one_per_row():
+    """Check messages with the same number of words are not stacked into a matrix."""
+    rows = tokenize(["disk full", "disk ok"], Vocabulary())
+    assert rows.shape == (2,)
+    assert is_tokenized(rows)
+    assert not is_tokenized([["disk", "full"]])
+    assert not is_tokenized(np.zeros((2, 3)))
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_sentences_can_be_iterated_every_epoch():
+    """Check Word2Vec gets the words of the logs on every pass."""
+    vocabulary = Vocabulary()
+    sentences = Sentences(tokenize(["user logged in", "user logged out"], vocabulary), vocabulary)
+    assert list(sentences) == list(sentences) == [["user", "logged", "in"], ["user", "logged", "out"]]
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_preprocess_tokenizes_message_column():
+    """Check sources hand word id arrays to the models, equal messages having equal cache keys."""
+    data = pandas.DataFrame({"message": ["job 1 failed", "job 2 failed"], "hostname": ["web", "db"]})
+    DataCleaner._preprocess(data)
+    assert is_tokenized(list(data.message))
+    assert VectorCache.key(data.message[0]) == VectorCache.key(data.message[1])
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_reset_vocabulary_starts_over():
+    """Check a reset forgets all words and moves to a new generation of ids."""
+    vocabulary = Vocabulary()
+    tokenize(["disk full"], vocabulary)
+    generation = vocabulary.generation
+    vocabulary.reset()
+    assert len(vocabulary) == 0
+    assert vocabulary.generation == generation + 1
+    assert tokenize(["user logged"], vocabulary)[0].tolist() == [0, 1]
@@ -0,0 +1,51 @@
+"""Test the vector cache placed in front of the w2v encoder."""
+import numpy as np
+import pytest
+from anomaly_detector.model.vector_cache import VectorCache
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_least_recently_used_message_is_evicted():
+    """Check the cache stays bounded and keeps the messages used last."""
+    cache = VectorCache(max_size=2)
+    keys = [VectorCache.key(words) for words in (["a"], ["b"], ["c"])]
+    cache.put_vector(keys[0], [0.0])
+    cache.put_vector(keys[1], [1.0])
+    assert cache.get_vector(keys[0]) == [0.0]
+    cache.put_vector(keys[2], [2.0])
+    assert len(cache) == 2
+    assert cache.get_vector(keys[1]) is None
+    assert cache.get_vector(keys[0]) == [0.0]
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_scores_are_kept_per_model_version():
+    """Check a score computed by an older model is not served."""
+    cache = VectorCache(max_size=10)
+    key = VectorCache.key(["connection", "refused"])
+    cache.put_vector(key, [0.5])
+    cache.put_score(key, 1, 0.25)
+    assert cache.get_score(key, 1) == 0.25
+    assert cache.get_score(key, 2) is None
+    cache.invalidate()
+    assert cache.get_vector(key) is None
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_hit_rate():
+    """Check hit rate counts log lines served from cache."""
+    cache = VectorCache(max_size=10)
+    cache.record(hits=3, misses=1)
+    assert cache.hit_rate == 0.75
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_messages_are_keyed_by_their_tokens():
+    """Check keys are the token sequences themselves, so messages with colliding hashes never share an entry."""
+    assert VectorCache.key(["disk", "full"]) == ("disk", "full")
+    assert VectorCache.key(np.array([3, 7], dtype=np.int32)) == np.array([3, 7], dtype=np.int32).tobytes()
+    assert VectorCache.key(["disk", "full"]) != VectorCache.key(["full", "disk"])
@@ -3,6 +3,11 @@ from anomaly_detector.adapters.som_model_adapter import SomModelAdapter
 from anomaly_detector.adapters.som_storage_adapter import SomStorageAdapter
 from anomaly_detector.core.job import SomTrainJob
 import logging
+import numpy as np
+from gensim.models import Word2Vec
+from anomaly_detector.config import Configuration
+from anomaly_detector.model.w2v_model import W2VModel
+from anomaly_detector.storage.tokenizer import VOCABULARY, tokenize
 
 import pytest
 
@@ -54,3 +59,94 @@ def test_loss_value(cnf_hadoop2k_w2v_params):
     logging.info(model_adapter.w2v_model.model["message"].get_latest_training_loss())
     tl = model_adapter.w2v_model.model["message"].get_latest_training_loss()
     assert tl < 320000.0
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_matrix_encoder_matches_word_lookup(cnf_hadoop_2k):
+    """Check the embedding matrix encoder gives the same vectors as per word lookups."""
+    storage_adapter = SomStorageAdapter(config=cnf_hadoop_2k, feedback_strategy=None)
+    model_adapter = SomModelAdapter(storage_adapter=storage_adapter)
+    data, _ = model_adapter.preprocess(config_type="train", recreate_model=True)
+    w2v_model = model_adapter.w2v_model
+
+    vectors = w2v_model._encode_matrix(data)
+    expected = w2v_model._vectorized_logs_to_single_vectors(w2v_model.get_vectors(data))
+
+    assert vectors.shape == (len(data), cnf_hadoop_2k.TRAIN_VECTOR_LENGTH)
+    assert vectors.dtype == np.float32
+    assert np.allclose(vectors, expected.astype(np.float64), atol=1e-5)
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_update_trains_on_new_logs():
+    """Check updating the model trains the vectors of new words instead of leaving them random."""
+    old_logs = [["user", "logged", "in"], ["user", "logged", "out"]] * 20
+    new_logs = [["disk", "quota", "exceeded", "for", "user"]] * 20
+    config = Configuration()
+    config.W2V_WORKERS = 1
+    w2v = W2VModel(config=config)
+    # Without downsampling, frequent words of such a small corpus would skip every update
+    w2v.model = Word2Vec(old_logs, size=config.TRAIN_VECTOR_LENGTH, window=config.TRAIN_WINDOW, min_count=1,
+                         sample=0, workers=1, seed=config.W2V_SEED)
+    w2v.update(new_logs, train=False)
+    initial = w2v.model.wv["quota"].copy()
+    w2v.update(new_logs)
+    assert not np.allclose(w2v.model.wv["quota"], initial)
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_update_without_training_only_extends_vocabulary(tmp_path):
+    """Check inference updates leave the vectors of known words untouched and need no save without new words."""
+    logs = [["user", "logged", "in"], ["user", "logged", "out"]] * 20
+    config = Configuration()
+    config.W2V_WORKERS = 1
+    w2v = W2VModel(config=config)
+    w2v.create(logs, config.TRAIN_VECTOR_LENGTH, config.TRAIN_WINDOW)
+    w2v.save(str(tmp_path / "W2V.model"))
+    before = w2v.model.wv["user"].copy()
+    w2v.update(logs, train=False)
+    assert not w2v.unsaved
+    w2v.update([["disk", "quota", "exceeded", "for", "user"]] * 20, train=False)
+    assert "quota" in w2v.model.wv
+    assert np.array_equal(w2v.model.wv["user"], before)
+    assert w2v.unsaved
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_cache_survives_save_and_update_without_new_words(tmp_path):
+    """Check cached vectors are only dropped when the word vectors change."""
+    logs = [["user", "logged", "in"], ["user", "logged", "out"]]
+    config = Configuration()
+    config.W2V_WORKERS = 1
+    config.W2V_UPDATE_EPOCHS = 0
+    w2v = W2VModel(config=config)
+    w2v.create(logs, config.TRAIN_VECTOR_LENGTH, config.TRAIN_WINDOW)
+    w2v.one_vector(logs)
+    w2v.save(str(tmp_path / "W2V.model"))
+    w2v.update(logs)
+    assert len(w2v.cache) == 2
+    w2v.update([["disk", "full"]])
+    assert len(w2v.cache) == 0
+
+
+@pytest.mark.core
+@pytest.mark.w2v_model
+def test_vocabulary_reset_drops_vectors_cached_by_word_ids():
+    """Check logs tokenized after a vocabulary reset are not served the vectors of the old ids."""
+    config = Configuration()
+    config.W2V_WORKERS = 1
+    w2v = W2VModel(config=config)
+    logs = tokenize(["user logged in", "user logged out"])
+    w2v.create(logs, config.TRAIN_VECTOR_LENGTH, config.TRAIN_WINDOW)
+    w2v.one_vector(logs)
+    w2v.reset_vocabulary(max_words=len(VOCABULARY))
+    assert len(w2v.cache) == 2
+    w2v.reset_vocabulary()
+    assert len(VOCABULARY) == 0
+    vectors = w2v.one_vector(tokenize(["user logged out", "user logged in"]))
+    expected = w2v._encode_matrix([["user", "logged", "out"], ["user", "logged", "in"]])
+    assert np.allclose(vectors, expected)
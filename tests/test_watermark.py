@@ -0,0 +1,121 @@
+"""Test incremental retrieval of logs after a persisted watermark."""
+import datetime
+import json
+import pytest
+from anomaly_detector.config import Configuration
+from anomaly_detector.storage.es_storage import ElasticSearchDataSource
+from anomaly_detector.storage.storage_attribute import ESStorageAttribute
+from anomaly_detector.storage.watermark import Watermark
+
+
+class FakeElasticsearch:
+    """Serve hits sorted by (@timestamp, _id) through search_after."""
+
+    def __init__(self, total):
+        self.hits = [{"_id": "%03d" % i, "_index": "logs", "_source": {"message": "log line %d" % i},
+                      "sort": [1000 + i // 2, "%03d" % i]} for i in range(total)]
+        self.queries = []
+        self.indices = []
+
+    def search(self, index, body, ignore_unavailable=False):
+        query = json.loads(body)
+        self.queries.append(query)
+        self.indices.append(index)
+        after = query.get("search_after")
+        hits = [hit for hit in self.hits if after is None or hit["sort"] > after]
+        return {"hits": {"hits": hits[:query["size"]]}}
+
+
+@pytest.fixture
+def source(tmpdir):
+    """Create ES source connected to a fake cluster, keeping its watermark in a temporary directory."""
+    config = Configuration()
+    config.MODEL_DIR = str(tmpdir)
+    config.ES_INPUT_INDEX = "logs-"
+    config.ES_PAGE_SIZE = 4
+    source = ElasticSearchDataSource.__new__(ElasticSearchDataSource)
+    source.config = config
+    source.es = FakeElasticsearch(total=10)
+    return source
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_watermark_is_persisted_on_commit(tmpdir):
+    """Check the position survives a restart only once committed."""
+    path = str(tmpdir.join("mg-logs.watermark"))
+    timestamp = datetime.datetime(2021, 10, 1, 12, 30, 15, 250000)
+    watermark = Watermark(path)
+    assert watermark.position is None
+    watermark.advance(timestamp, "615700ac5f1b2c6f7a7b8e01")
+    assert Watermark(path).position is None
+    watermark.commit()
+    assert Watermark(path).position == (timestamp, "615700ac5f1b2c6f7a7b8e01")
+
+
+@pytest.mark.core
+@pytest.mark.storage
+@pytest.mark.parametrize("timestamp", [datetime.datetime(2021, 10, 1, 12, 30, 15),
+                                       datetime.datetime(2021, 10, 1, 12, 30, 15,
+                                                         tzinfo=datetime.timezone(datetime.timedelta(hours=2)))])
+def test_watermark_dates_round_trip(tmpdir, timestamp):
+    """Check datetimes without microseconds or with a UTC offset are restored as they were."""
+    path = str(tmpdir.join("mysql-logs.watermark"))
+    watermark = Watermark(path)
+    watermark.advance(timestamp, 42)
+    watermark.commit()
+    assert Watermark(path).position == (timestamp, 42)
+    assert Watermark(path).position[0].utcoffset() == timestamp.utcoffset()
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_watermark_commits_earlier_position(tmpdir):
+    """Check committing the position of an earlier batch keeps the later one pending."""
+    path = str(tmpdir.join("es-logs.watermark"))
+    watermark = Watermark(path)
+    watermark.advance(1000, "004")
+    checkpoint = watermark.pending
+    watermark.advance(1002, "009")
+    watermark.commit(checkpoint)
+    assert Watermark(path).position == (1000, "004")
+    assert watermark.pending == (1002, "009")
+    watermark.commit()
+    assert Watermark(path).position == (1002, "009")
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_incremental_retrieval_resumes_after_stored_logs(source):
+    """Check logs are read exactly once across runs, even with equal timestamps at the page boundary."""
+    first = ESStorageAttribute(time_range=60, number_of_entries=5, incremental=True)
+    _, raw = source.retrieve(first)
+    assert [log["_id"] for log in raw] == ["000", "001", "002", "003", "004"]
+    assert "search_after" not in source.es.queries[0]
+
+    # Not committed, the sink failed: the same logs are read again
+    source._watermark = None
+    _, raw = source.retrieve(first)
+    assert raw[0]["_id"] == "000"
+    source.commit()
+
+    source._watermark = None
+    _, raw = source.retrieve(ESStorageAttribute(time_range=60, number_of_entries=100, incremental=True))
+    assert [log["_id"] for log in raw] == ["005", "006", "007", "008", "009"]
+    assert source.es.queries[-2]["search_after"] == [1002, "004"]
+    assert source.es.queries[-2]["query"]["bool"]["must"][1]["range"]["@timestamp"]["gte"] == 1002
+
+
+@pytest.mark.core
+@pytest.mark.storage
+def test_incremental_retrieval_reads_indices_since_watermark(source):
+    """Check logs left in the indices of previous days are read, not only today's index."""
+    today = datetime.datetime.now()
+    watermark = source._get_watermark("es-logs-")
+    watermark.advance(int((today - datetime.timedelta(days=2)).timestamp() * 1000), "000")
+    watermark.commit()
+    source.retrieve(ESStorageAttribute(time_range=60, number_of_entries=100, incremental=True))
+    indices = source.es.indices[0].split(",")
+    assert indices[-1] == "logs-" + today.strftime("%Y.%m.%d")
+    assert "logs-" + (today - datetime.timedelta(days=2)).strftime("%Y.%m.%d") in indices
+    assert len(indices) == 4